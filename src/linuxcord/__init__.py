@@ -3,9 +3,13 @@
 __all__ = [
     "DEFAULT_DISCORD_TGZ_URL",
     "DEFAULT_UPDATES_URL",
+    "DEFAULT_VERSION_URL_TEMPLATE",
 ]
 
 DEFAULT_DISCORD_TGZ_URL = (
     "https://discord.com/api/download?platform=linux&format=tar.gz"
 )
 DEFAULT_UPDATES_URL = "https://discord.com/api/updates/stable?platform=linux"
+DEFAULT_VERSION_URL_TEMPLATE = (
+    "https://dl.discordapp.net/apps/linux/{version}/discord-{version}.tar.gz"
+)
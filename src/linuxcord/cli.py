@@ -2,34 +2,220 @@ from __future__ import annotations
 
 import logging
 import os
+import signal
 import sys
+import time
+from pathlib import Path
 
 import click
+from packaging.version import InvalidVersion
 
-from linuxcord import DEFAULT_DISCORD_TGZ_URL, DEFAULT_UPDATES_URL
+from linuxcord import (
+    DEFAULT_DISCORD_TGZ_URL,
+    DEFAULT_UPDATES_URL,
+    DEFAULT_VERSION_URL_TEMPLATE,
+)
 from linuxcord import linuxcord
+from linuxcord.installer import RetentionPolicy, StoreInstallError
+from linuxcord.launcher import LAUNCH_MODES, LaunchMode
+from linuxcord.limits import ResourceLimits
+from linuxcord.locking import LockTimeout
 from linuxcord.logging_config import configure_logging
+from linuxcord.paths import HomeXDG
+from linuxcord.prewarm import DEFAULT_PREWARM_PATTERNS
+from linuxcord.types import DiscordVersion
 
 logger = logging.getLogger(__name__)
+DEFAULT_LOCK_TIMEOUT = 10.0
+DEFAULT_CHECK_TIMEOUT = 5.0
 
 
 class Context:
     discord_tgz_url: str
     updates_url: str
+    version_url_template: str
+    store_dir: Path | None
+    versions_root: Path | None
+    durable: bool
 
-    def __init__(self, discord_tgz_url: str, updates_url: str):
+    def __init__(
+        self,
+        discord_tgz_url: str,
+        updates_url: str,
+        version_url_template: str = DEFAULT_VERSION_URL_TEMPLATE,
+        store_dir: Path | None = None,
+        versions_root: Path | None = None,
+        durable: bool = False,
+    ):
         self.discord_tgz_url = discord_tgz_url
         self.updates_url = updates_url
+        self.version_url_template = version_url_template
+        self.store_dir = store_dir
+        self.versions_root = versions_root
+        self.durable = durable
 
 
-def _resolve_urls(discord_tgz_url: str | None, updates_url: str | None) -> Context:
+def _resolve_urls(
+    discord_tgz_url: str | None,
+    updates_url: str | None,
+    version_url_template: str | None = None,
+) -> Context:
     env_discord = os.environ.get("LINUXCORD_DISCORD_TGZ_URL")
     env_updates = os.environ.get("LINUXCORD_UPDATES_URL")
+    env_template = os.environ.get("LINUXCORD_VERSION_URL_TEMPLATE")
 
     resolved_discord = discord_tgz_url or env_discord or DEFAULT_DISCORD_TGZ_URL
     resolved_updates = updates_url or env_updates or DEFAULT_UPDATES_URL
+    resolved_template = (
+        version_url_template or env_template or DEFAULT_VERSION_URL_TEMPLATE
+    )
+    if "{version}" not in resolved_template:
+        raise click.BadParameter(
+            f"version URL template {resolved_template!r} has no {{version}} field"
+        )
+
+    return Context(resolved_discord, resolved_updates, resolved_template)
+
+
+def _resolve_store(store_dir: Path | None) -> Path | None:
+    if store_dir is not None:
+        return store_dir
+    env_store = os.environ.get("LINUXCORD_STORE")
+    return Path(env_store) if env_store else None
+
+
+def _resolve_versions_root(versions_root: Path | None) -> Path | None:
+    if versions_root is not None:
+        return versions_root
+    env_root = os.environ.get("LINUXCORD_VERSIONS_ROOT")
+    return Path(env_root) if env_root else None
+
+
+def _resolve_keep_locales(keep_locales: str | None) -> tuple[str, ...] | None:
+    value = keep_locales or os.environ.get("LINUXCORD_KEEP_LOCALES")
+    if not value:
+        return None
+    if value.strip().lower() == "all":
+        return ()
+    return tuple(locale.strip() for locale in value.split(",") if locale.strip())
+
+
+def _env_seconds(name: str, default: float) -> float:
+    env_timeout = os.environ.get(name)
+    if not env_timeout:
+        return default
+    try:
+        return max(0.0, float(env_timeout))
+    except ValueError:
+        raise click.BadParameter(f"invalid {name} {env_timeout!r}") from None
+
+
+def _resolve_lock_timeout(lock_timeout: float | None) -> float:
+    if lock_timeout is not None:
+        return lock_timeout
+    return _env_seconds("LINUXCORD_LOCK_TIMEOUT", DEFAULT_LOCK_TIMEOUT)
+
+
+def _resolve_check_timeout(check_timeout: float | None) -> float:
+    if check_timeout is not None:
+        return check_timeout
+    return _env_seconds("LINUXCORD_CHECK_TIMEOUT", DEFAULT_CHECK_TIMEOUT)
+
+
+def _resolve_prewarm_patterns() -> tuple[str, ...]:
+    env_files = os.environ.get("LINUXCORD_PREWARM_FILES")
+    if not env_files:
+        return DEFAULT_PREWARM_PATTERNS
+    return tuple(p.strip() for p in env_files.split(",") if p.strip())
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").lower() in ("1", "true", "yes")
+
+
+def _resolve_prewarm(prewarm: bool) -> tuple[str, ...] | None:
+    if prewarm or _env_flag("LINUXCORD_PREWARM"):
+        return _resolve_prewarm_patterns()
+    return None
+
+
+def _resolve_limits(limits: tuple[str, ...]) -> ResourceLimits | None:
+    # Settings from the environment first, so the options override them.
+    env_limits = os.environ.get("LINUXCORD_LIMITS", "")
+    settings = [s for s in env_limits.split(",") if s.strip()] + list(limits)
+    if not settings:
+        return None
+    try:
+        return ResourceLimits.parse(settings)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--limit") from None
+
+
+_DURATION_UNITS = {
+    "s": 1,
+    "m": 60,
+    "h": 60 * 60,
+    "d": 24 * 60 * 60,
+    "w": 7 * 24 * 60 * 60,
+}
+
+
+def _parse_duration(value: str) -> float:
+    value = value.strip().lower()
+    unit = _DURATION_UNITS.get(value[-1:])
+    number = value[:-1] if unit else value
+    seconds = float(number) * (unit or 1)
+    if seconds < 0:
+        raise ValueError(f"negative duration {value!r}")
+    return seconds
+
+
+def _resolve_retention(keep: int | None, keep_within: str | None) -> RetentionPolicy:
+    policy = RetentionPolicy()
+    env_keep = os.environ.get("LINUXCORD_KEEP_VERSIONS")
+    keep_within = keep_within or os.environ.get("LINUXCORD_KEEP_WITHIN")
+    try:
+        if keep is None and env_keep:
+            keep = max(0, int(env_keep))
+        return RetentionPolicy(
+            policy.keep if keep is None else keep,
+            _parse_duration(keep_within) if keep_within else policy.keep_within,
+        )
+    except ValueError as e:
+        raise click.BadParameter(f"invalid retention policy: {e}") from None
+
+
+def _parse_version(version: str | None) -> DiscordVersion | None:
+    if version is None:
+        return None
+    try:
+        return DiscordVersion(version)
+    except InvalidVersion:
+        raise click.BadParameter(f"invalid Discord version {version!r}") from None
+
+
+_keep_option = click.option(
+    "--keep",
+    "keep",
+    type=click.IntRange(min=0),
+    default=None,
+    help=f"Previous installs to keep (default: {RetentionPolicy().keep})",
+)
+_keep_within_option = click.option(
+    "--keep-within",
+    "keep_within",
+    default=None,
+    metavar="DURATION",
+    help="Also keep installs newer than this, e.g. 36h or 7d",
+)
 
-    return Context(resolved_discord, resolved_updates)
+_lock_timeout_option = click.option(
+    "--lock-timeout",
+    "lock_timeout",
+    type=click.FloatRange(min=0),
+    default=None,
+    help=f"Seconds to wait for another linuxcord update (default: {DEFAULT_LOCK_TIMEOUT:g})",
+)
 
 
 @click.group()
@@ -46,15 +232,50 @@ def _resolve_urls(discord_tgz_url: str | None, updates_url: str | None) -> Conte
     default=None,
     help=f"Updates API URL (default: {DEFAULT_UPDATES_URL})",
 )
+@click.option(
+    "--version-url-template",
+    "version_url_template",
+    default=None,
+    help=f"Tarball URL template for exact versions (default: {DEFAULT_VERSION_URL_TEMPLATE})",
+)
+@click.option(
+    "--store",
+    "store_dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=None,
+    help="Shared directory to install Discord versions into for all users",
+)
+@click.option(
+    "--versions-root",
+    "versions_root",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=None,
+    help="Private directory, e.g. on a local disk, to install Discord versions into",
+)
+@click.option(
+    "--durable",
+    "durable",
+    is_flag=True,
+    help="Flush new installs to disk before switching to them",
+)
 @click.pass_context
 def cli(
     ctx: click.Context,
     verbose: bool,
     discord_tgz_url: str | None,
     updates_url: str | None,
+    version_url_template: str | None,
+    store_dir: Path | None,
+    versions_root: Path | None,
+    durable: bool,
 ) -> None:
     configure_logging(verbose)
-    context = _resolve_urls(discord_tgz_url, updates_url)
+    context = _resolve_urls(discord_tgz_url, updates_url, version_url_template)
+    context.store_dir = _resolve_store(store_dir)
+    context.versions_root = _resolve_versions_root(versions_root)
+    context.durable = durable or _env_flag("LINUXCORD_DURABLE")
+    if context.store_dir is not None and context.versions_root is not None:
+        raise click.UsageError("--store and --versions-root cannot be combined")
     ctx.obj = context
     if verbose:
         logger.debug(
@@ -75,14 +296,126 @@ def _print_status(result: linuxcord.UpdateResult) -> None:
 
 @cli.command()
 @click.option("--force", is_flag=True, help="Force reinstall even if up to date")
+@click.option(
+    "--version",
+    "version",
+    default=None,
+    help="Install exactly this version from its CDN URL instead of the latest",
+)
+@click.option("--pin", is_flag=True, help="Pin the installed version afterwards")
+@click.option(
+    "--keep-locales",
+    "keep_locales",
+    default=None,
+    help='Comma-separated locales to extract from now on (en-US is always kept), or "all"',
+)
+@_lock_timeout_option
+@_keep_option
+@_keep_within_option
+@click.pass_obj
+def update(
+    ctx: Context,
+    force: bool,
+    version: str | None,
+    pin: bool,
+    keep_locales: str | None,
+    lock_timeout: float | None,
+    keep: int | None,
+    keep_within: str | None,
+) -> None:
+    try:
+        result = linuxcord.update(
+            store_dir=ctx.store_dir,
+            versions_root=ctx.versions_root,
+            discord_tgz_url=ctx.discord_tgz_url,
+            discord_updates_url=ctx.updates_url,
+            force=force,
+            lock_timeout=_resolve_lock_timeout(lock_timeout),
+            retention=_resolve_retention(keep, keep_within),
+            version=_parse_version(version),
+            version_url_template=ctx.version_url_template,
+            pin=pin,
+            durable=ctx.durable,
+            keep_locales=_resolve_keep_locales(keep_locales),
+        )
+    except LockTimeout:
+        click.echo("Another linuxcord update is already in progress")
+        return
+    except StoreInstallError as e:
+        raise click.ClickException(str(e)) from e
+    _print_status(result)
+
+
+def _read_homes(homes_file: Path) -> list[Path]:
+    homes: list[Path] = []
+    for line in homes_file.read_text().splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            homes.append(Path(line).expanduser())
+    return homes
+
+
+@cli.command("fleet-update")
+@click.option(
+    "--homes",
+    "homes_file",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="File listing one home directory per line",
+)
+@click.option(
+    "--version",
+    "version",
+    default=None,
+    help="Install exactly this version instead of the latest",
+)
+@click.option("--pin", is_flag=True, help="Pin every profile to the version")
+@click.option(
+    "--jobs",
+    "jobs",
+    type=click.IntRange(min=1),
+    default=linuxcord.FLEET_WORKERS,
+    show_default=True,
+    help="Profiles to set up at once",
+)
+@_lock_timeout_option
+@_keep_option
+@_keep_within_option
 @click.pass_obj
-def update(ctx: Context, force: bool) -> None:
-    result = linuxcord.update(
+def fleet_update(
+    ctx: Context,
+    homes_file: Path,
+    version: str | None,
+    pin: bool,
+    jobs: int,
+    lock_timeout: float | None,
+    keep: int | None,
+    keep_within: str | None,
+) -> None:
+    """Update Discord for many home directories, downloading it once."""
+
+    homes = _read_homes(homes_file)
+    results = linuxcord.fleet_update(
+        [HomeXDG(home) for home in homes],
         discord_tgz_url=ctx.discord_tgz_url,
         discord_updates_url=ctx.updates_url,
-        force=force,
+        version=_parse_version(version),
+        version_url_template=ctx.version_url_template,
+        pin=pin,
+        lock_timeout=_resolve_lock_timeout(lock_timeout),
+        retention=_resolve_retention(keep, keep_within),
+        max_workers=jobs,
+        durable=ctx.durable,
     )
-    _print_status(result)
+    for home, result in zip(homes, results):
+        if result.error is not None:
+            click.echo(f"{home}: failed: {result.error}")
+        elif result.result is not None:
+            installed = result.result.installed_version
+            state = "updated" if result.result.updated else "unchanged"
+            click.echo(f"{home}: {state} ({installed.string if installed else 'none'})")
+    if not all(result.ok for result in results):
+        raise SystemExit(1)
 
 
 @cli.command()
@@ -91,31 +424,265 @@ def update(ctx: Context, force: bool) -> None:
     is_flag=True,
     help="Skip update check before launching (default: check and update if needed)",
 )
+@click.option(
+    "--launch-mode",
+    "launch_mode",
+    type=click.Choice(LAUNCH_MODES),
+    default="exec",
+    show_default=True,
+    help="exec replaces linuxcord with Discord; popen starts it as a child process",
+)
+@click.option(
+    "--verify",
+    "verify_install",
+    is_flag=True,
+    help="Check the install against its recorded hashes before launching",
+)
+@click.option(
+    "--prewarm",
+    "prewarm",
+    is_flag=True,
+    help="Read Discord's hot files into the page cache while it starts",
+)
+@click.option(
+    "--mirror",
+    "mirror",
+    is_flag=True,
+    help="Start Discord from a copy in the RAM-backed runtime directory",
+)
+@click.option(
+    "--limit",
+    "limits",
+    multiple=True,
+    metavar="KEY=VALUE",
+    help="Resource control for Discord, e.g. MemoryMax=4G or CPUWeight=50; repeatable",
+)
+@click.option(
+    "--check-timeout",
+    "check_timeout",
+    type=click.FloatRange(min=0),
+    default=None,
+    help=f"Seconds to spend looking for updates before starting Discord (default: {DEFAULT_CHECK_TIMEOUT:g})",
+)
+@_lock_timeout_option
+@_keep_option
+@_keep_within_option
 @click.pass_obj
-def run(ctx: Context, no_update: bool) -> None:
-    linuxcord.run(
-        discord_tgz_url=ctx.discord_tgz_url,
-        discord_updates_url=ctx.updates_url,
-        no_update=no_update,
+def run(
+    ctx: Context,
+    no_update: bool,
+    launch_mode: LaunchMode,
+    verify_install: bool,
+    prewarm: bool,
+    mirror: bool,
+    limits: tuple[str, ...],
+    check_timeout: float | None,
+    lock_timeout: float | None,
+    keep: int | None,
+    keep_within: str | None,
+) -> None:
+    try:
+        linuxcord.run(
+            store_dir=ctx.store_dir,
+            versions_root=ctx.versions_root,
+            discord_tgz_url=ctx.discord_tgz_url,
+            discord_updates_url=ctx.updates_url,
+            no_update=no_update,
+            launch_mode=launch_mode,
+            verify_install=verify_install,
+            lock_timeout=_resolve_lock_timeout(lock_timeout),
+            retention=_resolve_retention(keep, keep_within),
+            prewarm_patterns=_resolve_prewarm(prewarm),
+            mirror=mirror or _env_flag("LINUXCORD_MIRROR"),
+            durable=ctx.durable,
+            check_timeout=_resolve_check_timeout(check_timeout),
+            limits=_resolve_limits(limits),
+        )
+    except StoreInstallError as e:
+        raise click.ClickException(str(e)) from e
+
+
+@cli.command()
+@_lock_timeout_option
+@_keep_option
+@_keep_within_option
+@click.pass_obj
+def daemon(
+    ctx: Context,
+    lock_timeout: float | None,
+    keep: int | None,
+    keep_within: str | None,
+) -> None:
+    """Keep Discord updated in the background and serve "linuxcord run"."""
+
+    def stop(signum: int, frame: object) -> None:
+        _ = frame
+        raise SystemExit(128 + signum)
+
+    # Unwinds serve_forever so the socket is removed.
+    _ = signal.signal(signal.SIGTERM, stop)
+    try:
+        linuxcord.serve_daemon(
+            store_dir=ctx.store_dir,
+            versions_root=ctx.versions_root,
+            discord_tgz_url=ctx.discord_tgz_url,
+            discord_updates_url=ctx.updates_url,
+            lock_timeout=_resolve_lock_timeout(lock_timeout),
+            retention=_resolve_retention(keep, keep_within),
+            durable=ctx.durable,
+        )
+    except RuntimeError as e:
+        raise click.ClickException(str(e)) from e
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command("prewarm")
+@click.argument("patterns", nargs=-1)
+@click.pass_obj
+def prewarm_command(ctx: Context, patterns: tuple[str, ...]) -> None:
+    """Start reading the current install's hot files into the page cache."""
+
+    result = linuxcord.prewarm(
+        store_dir=ctx.store_dir,
+        versions_root=ctx.versions_root,
+        patterns=patterns or _resolve_prewarm_patterns(),
     )
+    size = result.bytes / (1024 * 1024)
+    click.echo(f"Prewarming {result.files} files ({size:.1f} MiB)")
 
 
 @cli.command()
 @click.pass_obj
 def status(ctx: Context) -> None:
-    result = linuxcord.status(discord_updates_url=ctx.updates_url)
+    result = linuxcord.status(
+        store_dir=ctx.store_dir,
+        versions_root=ctx.versions_root,
+        discord_updates_url=ctx.updates_url,
+    )
     _print_status(result)
 
 
+@cli.command()
+@click.option(
+    "--full", is_flag=True, help="Rehash every file instead of trusting size and mtime"
+)
+@click.option(
+    "--repair",
+    is_flag=True,
+    help="Restore damaged files from the cached tarball, reinstalling if that fails",
+)
+@click.pass_obj
+def verify(ctx: Context, full: bool, repair: bool) -> None:
+    try:
+        result = linuxcord.verify(
+            store_dir=ctx.store_dir,
+            versions_root=ctx.versions_root,
+            discord_tgz_url=ctx.discord_tgz_url,
+            discord_updates_url=ctx.updates_url,
+            full=full,
+            repair=repair,
+            durable=ctx.durable,
+        )
+    except (LookupError, StoreInstallError) as e:
+        raise click.ClickException(str(e)) from e
+    summary = f"{result.checked} files checked, {result.rehashed} rehashed"
+    click.echo(f"Verified Discord {result.version.string}: {summary}")
+    for name in result.missing:
+        click.echo(f"Missing: {name}")
+    for name in result.corrupted:
+        click.echo(f"Corrupted: {name}")
+    if not result.ok:
+        raise SystemExit(1)
+
+
+@cli.command()
+@click.pass_obj
+def versions(ctx: Context) -> None:
+    installs = linuxcord.list_versions(
+        store_dir=ctx.store_dir, versions_root=ctx.versions_root
+    )
+    if not installs:
+        click.echo("No Discord versions installed")
+        return
+    for install in installs:
+        marker = "*" if install.current else " "
+        installed_at = (
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(install.installed_at))
+            if install.installed_at is not None
+            else "unknown"
+        )
+        pinned = "  (pinned)" if install.pinned else ""
+        click.echo(f"{marker} {install.version.string:<12} {installed_at}{pinned}")
+
+
+@cli.command()
+@click.argument("version", required=False)
+@click.option(
+    "--no-pin",
+    "no_pin",
+    is_flag=True,
+    help="Let the next update move forward again instead of pinning",
+)
+@_lock_timeout_option
+@click.pass_obj
+def rollback(
+    ctx: Context, version: str | None, no_pin: bool, lock_timeout: float | None
+) -> None:
+    """Switch back to an installed version (default: the previous one)."""
+
+    try:
+        target = linuxcord.rollback(
+            store_dir=ctx.store_dir,
+            versions_root=ctx.versions_root,
+            version=_parse_version(version),
+            pin=not no_pin,
+            lock_timeout=_resolve_lock_timeout(lock_timeout),
+            durable=ctx.durable,
+        )
+    except LookupError as e:
+        raise click.ClickException(str(e)) from e
+    except LockTimeout as e:
+        raise click.ClickException("Another linuxcord update is in progress") from e
+    pinned = "" if no_pin else "; updates are paused until 'linuxcord unpin'"
+    click.echo(f"Now using Discord {target.string}{pinned}")
+
+
+@cli.command()
+@click.argument("version", required=False)
+@click.pass_obj
+def pin(ctx: Context, version: str | None) -> None:
+    """Stop updates from moving past VERSION (default: the current one)."""
+
+    try:
+        pinned = linuxcord.pin(
+            store_dir=ctx.store_dir,
+            versions_root=ctx.versions_root,
+            version=_parse_version(version),
+        )
+    except LookupError as e:
+        raise click.ClickException(str(e)) from e
+    click.echo(f"Pinned Discord {pinned.string}")
+
+
+@cli.command()
+@click.pass_obj
+def unpin(ctx: Context) -> None:
+    previous = linuxcord.unpin(store_dir=ctx.store_dir, versions_root=ctx.versions_root)
+    if previous is None:
+        click.echo("Discord is not pinned")
+    else:
+        click.echo(f"Unpinned Discord {previous.string}")
+
+
 @cli.command()
 @click.option("--yes", is_flag=True, help="Do not prompt for confirmation")
 @click.pass_obj
 def uninstall(ctx: Context, yes: bool) -> None:
-    _ = ctx
     if not yes and not click.confirm("Remove linuxcord data and desktop entries?"):
         click.echo("Aborted")
         raise SystemExit(1)
-    linuxcord.uninstall()
+    linuxcord.uninstall(store_dir=ctx.store_dir, versions_root=ctx.versions_root)
     click.echo("linuxcord files removed")
 
 
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections.abc import Callable, Mapping
+from pathlib import Path
+from typing import cast
+
+from typing_extensions import override
+
+from linuxcord.paths import LinuxcordPaths
+from linuxcord.versions import LocalVersioner
+
+
+logger = logging.getLogger(__name__)
+# Requests and replies are single lines of JSON, never anywhere near this.
+MESSAGE_LIMIT = 64 * 1024
+# How soon a failed background check is retried, e.g. after boot while
+# the network is still coming up.
+RETRY_INTERVAL = 5 * 60
+
+Message = dict[str, object]
+
+
+def ask_daemon(
+    socket_path: Path, request: Mapping[str, object], timeout: float | None = None
+) -> Message | None:
+    """Send one request to a running daemon and return its reply.
+
+    Returns None when no daemon answers in time, so callers can fall back
+    to doing the work themselves.
+    """
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(socket_path))
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile("rb") as replies:
+                line = replies.readline(MESSAGE_LIMIT)
+    except OSError as e:
+        logger.debug("No answer from the daemon at %s: %s", socket_path, e)
+        return None
+    try:
+        reply = cast(object, json.loads(line))
+    except ValueError:
+        logger.debug("Malformed reply from the daemon: %r", line)
+        return None
+    return cast(Message, reply) if isinstance(reply, dict) else None
+
+
+def _peer_uid(connection: socket.socket) -> int:
+    credentials = connection.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    _pid, uid, _gid = struct.unpack("3i", credentials)
+    return uid
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    @override
+    def handle(self) -> None:
+        server = cast(_DaemonServer, self.server)
+        connection = cast(socket.socket, self.connection)
+        # The runtime directory is private already; this also covers a
+        # socket reached some other way.
+        if _peer_uid(connection) != os.getuid():
+            logger.warning("Refusing a daemon request from another user")
+            return
+        line = self.rfile.readline(MESSAGE_LIMIT)
+        try:
+            request = cast(object, json.loads(line))
+            if not isinstance(request, dict):
+                raise ValueError("requests must be JSON objects")
+            reply = server.dispatch(cast(Message, request))
+        except Exception as e:
+            logger.warning("Daemon request failed", exc_info=True)
+            reply = {"error": str(e)}
+        _ = self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class _DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads: bool = True
+
+    def __init__(self, socket_path: Path, dispatch: Callable[[Message], Message]):
+        self.dispatch: Callable[[Message], Message] = dispatch
+        super().__init__(str(socket_path), _RequestHandler)
+
+
+class LinuxcordDaemon:
+    """A long-running process that keeps Discord ready to launch.
+
+    It runs ``check`` (an update with a session kept warm between calls)
+    every ``interval`` seconds, so new versions are downloaded before they
+    are needed. ``linuxcord run`` asks it over a UNIX socket in the runtime
+    directory for the install to start instead of checking for updates
+    itself.
+
+    Requests are single-line JSON objects with a ``command``:
+
+    - ``ping``: answers ``{"ok": true}``.
+    - ``ready``: answers the current ``version`` and its ``path``, first
+      checking for updates if one is due. The caller's ``install_dir``
+      must match the daemon's, so differently configured clients fall back
+      to checking themselves.
+    - ``update``: checks for updates now, then answers as ``ready``.
+
+    Failures are answered as ``{"error": "..."}``.
+    """
+
+    def __init__(
+        self,
+        linuxcord_paths: LinuxcordPaths,
+        check: Callable[[], None],
+        interval: float,
+    ):
+        self._paths: LinuxcordPaths = linuxcord_paths
+        self._check: Callable[[], None] = check
+        self._interval: float = interval
+        self._mutex: threading.Lock = threading.Lock()
+        self._next_check: float = 0.0
+        self._stopping: threading.Event = threading.Event()
+        self._server: _DaemonServer | None = None
+
+    def serve_forever(self) -> None:
+        socket_path = self._paths.daemon_socket
+        if socket_path is None:
+            raise RuntimeError("There is no runtime directory for the daemon socket")
+        self._claim_socket(socket_path)
+        self._server = _DaemonServer(socket_path, self.dispatch)
+        checker = threading.Thread(
+            target=self._check_periodically, name="linuxcord-check", daemon=True
+        )
+        checker.start()
+        logger.info("Serving on %s", socket_path)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stopping.set()
+            self._server.server_close()
+            socket_path.unlink(missing_ok=True)
+
+    def shutdown(self) -> None:
+        """Stop ``serve_forever``; must be called from another thread."""
+
+        self._stopping.set()
+        if self._server is not None:
+            self._server.shutdown()
+
+    def _claim_socket(self, socket_path: Path) -> None:
+        socket_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if not socket_path.exists():
+            return
+        if ask_daemon(socket_path, {"command": "ping"}, timeout=1) is not None:
+            raise RuntimeError(f"A daemon is already serving on {socket_path}")
+        # Left behind by a daemon that did not shut down cleanly.
+        socket_path.unlink()
+
+    def dispatch(self, request: Message) -> Message:
+        command = request.get("command")
+        if command == "ping":
+            return {"ok": True}
+        if command == "update":
+            with self._mutex:
+                self._next_check = 0.0
+            return self._ready(request)
+        if command == "ready":
+            return self._ready(request)
+        return {"error": f"Unknown command {command!r}"}
+
+    def _ready(self, request: Message) -> Message:
+        install_dir = str(self._paths.install_dir)
+        if request.get("install_dir", install_dir) != install_dir:
+            return {"error": f"This daemon serves installs in {install_dir}"}
+        self._check_if_due()
+        version = LocalVersioner(self._paths).get_current_version()
+        if version is None:
+            return {"error": "Discord is not installed"}
+        return {
+            "version": version.string,
+            "path": str(self._paths.discord_paths(version).dir),
+        }
+
+    def _check_if_due(self) -> None:
+        with self._mutex:
+            if time.time() < self._next_check:
+                return
+            try:
+                self._check()
+            except Exception:
+                logger.warning("Update check failed", exc_info=True)
+                self._next_check = time.time() + min(RETRY_INTERVAL, self._interval)
+            else:
+                self._next_check = time.time() + self._interval
+
+    def _check_periodically(self) -> None:
+        while not self._stopping.wait(max(0.0, self._next_check - time.time())):
+            self._check_if_due()
@@ -2,9 +2,12 @@ from __future__ import annotations
 
 import logging
 import os
+import re
+import shlex
 from pathlib import Path
 
 from xdg.DesktopEntry import DesktopEntry
+from xdg.Exceptions import ParsingError
 from xdg.Menu import MenuEntry
 
 from linuxcord.paths import LinuxcordPaths
@@ -12,11 +15,49 @@ from linuxcord.paths import LinuxcordPaths
 
 logger = logging.getLogger(__name__)
 DESKTOP_NAME = "Linuxcord (Discord)"
+LAUNCHER_SCRIPT_TEMPLATE = """#!/bin/sh
+# Generated by linuxcord; rewritten on every update.
+# Starts the current Discord install directly while no update check is due,
+# and hands over to "linuxcord run", with the options it was installed with,
+# otherwise.
+current={current}
+stamp={stamp}
+# Prewarming, mirroring and resource limits are done by "linuxcord run".
+for option in "${{LINUXCORD_PREWARM:-}}" "${{LINUXCORD_MIRROR:-}}"; do
+    case $option in
+        1|[Tt][Rr][Uu][Ee]|[Yy][Ee][Ss]) exec {run} ;;
+    esac
+done
+if [ -n "${{LINUXCORD_LIMITS:-}}" ]; then
+    exec {run}
+fi
+if [ "$(id -u)" -ne 0 ] && [ -x "$current/Discord" ] && [ -r "$stamp" ]; then
+    read -r due < "$stamp"
+    case $due in
+        ''|*[!0-9]*) ;;
+        *)
+            if [ "$(date +%s)" -lt "$due" ]; then
+                cd -P "$current" && exec "$current/Discord"
+            fi
+            ;;
+    esac
+fi
+exec {run}
+"""
+_EXEC_SAFE = re.compile(r"[A-Za-z0-9_@%+=:,./-]+")
+
+
+def _quote_exec_arg(value: str) -> str:
+    if _EXEC_SAFE.fullmatch(value):
+        return value
+    escaped = re.sub(r'(["`$\\])', r"\\\1", value)
+    return f'"{escaped}"'
 
 
 class FreeDesktop:
-    def __init__(self, paths: LinuxcordPaths):
+    def __init__(self, paths: LinuxcordPaths, durable: bool = False):
         self._paths: LinuxcordPaths = paths
+        self._durable: bool = durable
 
     @property
     def desktop_entry(self) -> Path:
@@ -26,16 +67,72 @@ class FreeDesktop:
     def application_symlink(self) -> Path:
         return self._paths.applications_dir / "linuxcord.desktop"
 
+    @property
+    def launcher_script(self) -> Path:
+        return self._paths.data_dir / "linuxcord-launch"
+
+    def run_command(self) -> list[str]:
+        """``linuxcord run`` with the options that locate these installs."""
+
+        command = ["linuxcord"]
+        if self._paths.store_dir is not None:
+            command += ["--store", str(self._paths.store_dir)]
+        if self._paths.versions_root is not None:
+            command += ["--versions-root", str(self._paths.versions_root)]
+        if self._durable:
+            command.append("--durable")
+        return command + ["run"]
+
+    def _launcher_script_text(self) -> str:
+        return LAUNCHER_SCRIPT_TEMPLATE.format(
+            current=shlex.quote(str(self._paths.discord_current_version_dir_symlink)),
+            stamp=shlex.quote(str(self._paths.update_check_file)),
+            run=shlex.join(self.run_command()),
+        )
+
+    def _exec_line(self) -> str:
+        return _quote_exec_arg(str(self.launcher_script))
+
+    def is_current(self) -> bool:
+        """Whether the launcher script, desktop entry and link are up to date.
+
+        That is, as ``create_desktop_entry`` and ``create_application_symlink``
+        would write them with the options given now.
+        """
+
+        try:
+            script = self.launcher_script.read_text()
+            entry = DesktopEntry(str(self.desktop_entry))
+            link = os.readlink(self.application_symlink)
+        except (OSError, ParsingError):
+            return False
+        if script != self._launcher_script_text():
+            return False
+        return entry.get("Exec") == self._exec_line() and link == os.fspath(
+            self.desktop_entry
+        )
+
+    def create_launcher_script(self) -> Path:
+        script = self._launcher_script_text()
+        self.launcher_script.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.launcher_script.with_name(f".{self.launcher_script.name}.tmp")
+        logger.debug("Writing launcher script to %s", self.launcher_script)
+        _ = tmp_path.write_text(script)
+        tmp_path.chmod(0o755)
+        _ = tmp_path.replace(self.launcher_script)
+        return self.launcher_script
+
     def create_desktop_entry(self) -> Path:
         icon_path = self._paths.data_dir / "discord.png"
         self.desktop_entry.parent.mkdir(parents=True, exist_ok=True)
+        _ = self.create_launcher_script()
 
         desktop = DesktopEntry()
         desktop.addGroup("Desktop Entry")
         desktop.set("Version", "1.0")
         desktop.set("Type", "Application")
         desktop.set("Name", DESKTOP_NAME)
-        desktop.set("Exec", "linuxcord run")
+        desktop.set("Exec", self._exec_line())
         desktop.set("Terminal", "false")
         desktop.set("Categories", "Network;InstantMessaging;")
         desktop.set("StartupWMClass", "discord")
@@ -0,0 +1,355 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import fcntl
+import functools
+import logging
+import os
+import shutil
+import stat
+import sys
+import uuid
+from collections.abc import Callable, Sequence
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import NoReturn, cast
+
+
+logger = logging.getLogger(__name__)
+_AT_FDCWD = -100
+_RENAME_EXCHANGE = 2
+DELETE_WORKERS = 8
+# ioctl(2) request that shares one file's extents with another (linux/fs.h).
+_FICLONE = 0x40049409
+
+
+def replace_symlink(link: Path, target: Path) -> None:
+    """Point ``link`` at ``target`` without a moment where ``link`` is missing."""
+
+    tmp_link = link.with_name(f".{link.name}.{os.getpid()}.tmp")
+    tmp_link.unlink(missing_ok=True)
+    tmp_link.symlink_to(target)
+    try:
+        os.replace(tmp_link, link)
+    except BaseException:
+        tmp_link.unlink(missing_ok=True)
+        raise
+
+
+@functools.cache
+def _renameat2() -> Callable[..., int] | None:
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        function = cast(Callable[..., int], libc.renameat2)
+    except (OSError, AttributeError):
+        return None
+    return function
+
+
+@functools.cache
+def _syncfs() -> Callable[..., int] | None:
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        function = cast(Callable[..., int], libc.syncfs)
+    except (OSError, AttributeError):
+        return None
+    return function
+
+
+def sync_filesystems(*paths: Path) -> None:
+    """Write out everything pending on the filesystems holding ``paths``.
+
+    One syncfs(2) per filesystem, which is much cheaper than an fsync per
+    file of a freshly extracted tree. Without syncfs this falls back to
+    sync(2).
+    """
+
+    syncfs = _syncfs()
+    if syncfs is None:
+        os.sync()
+        return
+    synced: set[int] = set()
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+        try:
+            device = os.fstat(fd).st_dev
+            if device in synced:
+                continue
+            if syncfs(fd) != 0:
+                err = ctypes.get_errno()
+                raise OSError(err, os.strerror(err), str(path))
+            synced.add(device)
+        finally:
+            os.close(fd)
+
+
+def fsync_directory(path: Path) -> None:
+    """Make the renames and new links in ``path`` durable."""
+
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def exchange_paths(first: Path, second: Path) -> bool:
+    """Atomically swap two existing paths on the same filesystem.
+
+    Returns False when the platform or filesystem cannot do it, in which case
+    nothing has been changed.
+    """
+
+    renameat2 = _renameat2()
+    if renameat2 is None:
+        return False
+    ret = renameat2(
+        _AT_FDCWD,
+        os.fsencode(first),
+        _AT_FDCWD,
+        os.fsencode(second),
+        _RENAME_EXCHANGE,
+    )
+    if ret == 0:
+        return True
+    err = ctypes.get_errno()
+    if err in (errno.ENOSYS, errno.EINVAL, errno.ENOTSUP):
+        return False
+    raise OSError(err, os.strerror(err), str(first), None, str(second))
+
+
+def swap_in_directory(staged: Path, destination: Path) -> Path | None:
+    """Move ``staged`` to ``destination``, replacing any existing directory.
+
+    Returns the location the previous ``destination`` was moved to (for the
+    caller to delete), or None if there was nothing to replace.
+    """
+
+    if not destination.exists():
+        _ = staged.rename(destination)
+        return None
+    if exchange_paths(staged, destination):
+        return staged
+    # No atomic exchange available: fall back to two renames, leaving only a
+    # brief window in which destination does not exist.
+    previous = destination.with_name(f".{destination.name}.{os.getpid()}.old")
+    _ = destination.rename(previous)
+    _ = staged.rename(destination)
+    return previous
+
+
+def _reflink(source: Path, destination: Path) -> bool:
+    with source.open("rb") as src, destination.open("wb") as dst:
+        try:
+            _ = fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            destination.unlink()
+            return False
+    return True
+
+
+def clone_file(source: Path, destination: Path, hardlink: bool = True) -> str:
+    """Create ``destination`` with the contents, mode and mtime of ``source``.
+
+    The data is reflinked (copy-on-write) where the filesystem supports it,
+    otherwise hardlinked, and only copied across filesystems or without
+    ``hardlink``. Returns the method used: "reflink", "hardlink" or "copy".
+    """
+
+    if _reflink(source, destination):
+        method = "reflink"
+    else:
+        try:
+            if hardlink:
+                os.link(source, destination)
+                return "hardlink"
+        except OSError:
+            pass
+        _ = shutil.copyfile(source, destination)
+        method = "copy"
+    shutil.copystat(source, destination)
+    return method
+
+
+def clone_tree(source: Path, destination: Path, hardlink: bool = True) -> str:
+    """Recreate ``source`` at ``destination`` with ``clone_file``.
+
+    Returns the slowest method any file needed.
+    """
+
+    methods = {"reflink"}
+    destination.mkdir()
+    for root, dirs, names in os.walk(source):
+        target_root = destination / Path(root).relative_to(source)
+        for name in dirs + names:
+            src = Path(root) / name
+            dst = target_root / name
+            if src.is_symlink():
+                dst.symlink_to(os.readlink(src))
+            elif src.is_dir():
+                dst.mkdir()
+                shutil.copymode(src, dst)
+            else:
+                methods.add(clone_file(src, dst, hardlink))
+    shutil.copymode(source, destination)
+    return next(m for m in ("copy", "hardlink", "reflink") if m in methods)
+
+
+def chown_tree(path: Path, uid: int, gid: int) -> None:
+    """Give ``path`` and everything below it to ``uid``:``gid``.
+
+    Files with several hardlinks are skipped; they are shared with other
+    trees and stay with their current owner. Symlinks are never followed,
+    not even at ``path``: the walk holds each directory open and works
+    relative to it, so a directory swapped for a link midway is not
+    entered either.
+    """
+
+    os.lchown(path, uid, gid)
+    for _root, dirs, names, root_fd in os.fwalk(path, follow_symlinks=False):
+        for name in dirs + names:
+            info = os.stat(name, dir_fd=root_fd, follow_symlinks=False)
+            if info.st_nlink > 1 and not stat.S_ISDIR(info.st_mode):
+                continue
+            if (info.st_uid, info.st_gid) != (uid, gid):
+                os.chown(name, uid, gid, dir_fd=root_fd, follow_symlinks=False)
+
+
+def deny_shared_writes(path: Path) -> None:
+    """Take group and other write permission off ``path`` and its contents."""
+
+    entries = [os.fspath(path)]
+    for root, dirs, names in os.walk(path):
+        entries.extend(os.path.join(root, name) for name in dirs + names)
+    for entry in entries:
+        mode = os.lstat(entry).st_mode
+        if not stat.S_ISLNK(mode) and mode & 0o022:
+            os.chmod(entry, stat.S_IMODE(mode) & ~0o022)
+
+
+def move_to_trash(path: Path, trash_dir: Path | None = None) -> Path:
+    """Rename ``path`` out of the way so it can be deleted at leisure.
+
+    It goes into ``trash_dir``, which must be on the same filesystem, or
+    otherwise next to itself as a hidden ``.<name>.<id>.deleting`` entry.
+    """
+
+    if trash_dir is None:
+        trashed = path.with_name(f".{path.name}.{uuid.uuid4().hex}.deleting")
+    else:
+        trash_dir.mkdir(parents=True, exist_ok=True)
+        trashed = trash_dir / f"{path.name}.{uuid.uuid4().hex}"
+    _ = path.rename(trashed)
+    return trashed
+
+
+def _clear_directory(path: str) -> list[str]:
+    subdirectories: list[str] = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.path)
+                    continue
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+    except FileNotFoundError:
+        pass
+    return subdirectories
+
+
+def delete_tree(path: Path, max_workers: int = DELETE_WORKERS) -> None:
+    """Delete ``path`` with several directories being emptied at once.
+
+    unlink releases the GIL, so on slow disks and network homes a few
+    threads keep more requests in flight than ``shutil.rmtree`` does.
+    Entries vanishing underneath (e.g. another deleter) are ignored.
+    """
+
+    if path.is_symlink() or not path.is_dir():
+        path.unlink(missing_ok=True)
+        return
+    # Parents are always listed before their children.
+    directories = [os.fspath(path)]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {pool.submit(_clear_directory, directories[0])}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for subdirectory in future.result():
+                    directories.append(subdirectory)
+                    pending.add(pool.submit(_clear_directory, subdirectory))
+    for directory in reversed(directories):
+        try:
+            os.rmdir(directory)
+        except FileNotFoundError:
+            pass
+
+
+def remove_tree(
+    path: Path, *, trash_dir: Path | None = None, background: bool = False
+) -> None:
+    """Remove ``path``, returning as soon as it is out of the way.
+
+    With ``background``, the deletion is left to a detached process;
+    anything it does not finish is found again by the caller's next sweep.
+    """
+
+    trashed = move_to_trash(path, trash_dir)
+    if background:
+        spawn_deleter([trashed])
+    else:
+        delete_tree(trashed)
+
+
+def spawn_deleter(paths: Sequence[Path]) -> None:
+    """Delete ``paths`` from a detached, idle-priority process.
+
+    Returns once the deleter is started, without waiting for a Python
+    interpreter to come up.
+    """
+
+    command = [sys.executable, "-m", "linuxcord.fsutil", *map(os.fspath, paths)]
+    ionice = shutil.which("ionice")
+    if ionice:
+        command = [ionice, "-c", "3", *command]
+    logger.debug("Starting background deletion of %d paths", len(paths))
+    # Forked twice, so the deleter is never left as a zombie of Discord in
+    # exec mode. Only the brief middle process is waited for.
+    pid = os.fork()
+    if pid == 0:
+        _exec_detached(command)
+    _ = os.waitpid(pid, 0)
+
+
+def _exec_detached(command: list[str]) -> NoReturn:
+    # Runs in a fork of a possibly threaded process, so it sticks to plain
+    # system calls until the exec.
+    try:
+        _ = os.setsid()
+        if os.fork() == 0:
+            null = os.open(os.devnull, os.O_RDWR)
+            for fd in (0, 1, 2):
+                _ = os.dup2(null, fd)
+            os.execv(command[0], command)
+    finally:
+        os._exit(0)
+
+
+def main(argv: Sequence[str]) -> None:
+    _ = os.nice(19)
+    for path in argv:
+        try:
+            delete_tree(Path(path))
+        except OSError:
+            # Nobody is listening; the next sweep will try again.
+            continue
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
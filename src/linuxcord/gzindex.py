@@ -0,0 +1,455 @@
+"""Random access into gzip-compressed tarballs.
+
+This is the technique from zlib's ``examples/zran.c``: while a gzip stream is
+inflated once from the start, a checkpoint is recorded at a deflate block
+boundary every ``span`` bytes of output. A checkpoint holds the compressed
+bit position and the 32 KiB of output preceding it, which is all inflate
+needs to restart there. Reading any byte range then costs at most ``span``
+bytes of decompression instead of everything before it.
+
+Python's :mod:`zlib` exposes neither block boundaries nor ``inflatePrime``,
+so the few libz calls needed are bound with :mod:`ctypes`.
+"""
+
+# pyright: reportUninitializedInstanceVariable=false
+
+from __future__ import annotations
+
+import bisect
+import ctypes
+import ctypes.util
+import functools
+import io
+import json
+import logging
+import os
+import struct
+import tarfile
+import tempfile
+import zlib
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, cast
+
+from typing_extensions import Buffer, Self, override
+
+
+logger = logging.getLogger(__name__)
+INDEX_MAGIC = b"LCGZIDX\x01"
+DEFAULT_SPAN = 4 * 1024 * 1024
+WINDOW_SIZE = 32 * 1024
+INPUT_CHUNK_SIZE = 256 * 1024
+OUTPUT_CHUNK_SIZE = 256 * 1024
+
+_Z_OK = 0
+_Z_STREAM_END = 1
+_Z_BUF_ERROR = -5
+_Z_NO_FLUSH = 0
+_Z_BLOCK = 5
+# windowBits for inflateInit2: 32 + 15 auto-detects a gzip header, -15 is raw.
+_GZIP_WINDOW_BITS = 47
+_RAW_WINDOW_BITS = -15
+
+
+class _ZStream(ctypes.Structure):
+    # Field types for the checker; ctypes creates the attributes from _fields_.
+    next_in: int | None
+    avail_in: int
+    total_in: int
+    next_out: int | None
+    avail_out: int
+    msg: bytes | None
+    data_type: int
+    _fields_ = [  # pyright: ignore[reportUnannotatedClassAttribute]
+        ("next_in", ctypes.c_void_p),
+        ("avail_in", ctypes.c_uint),
+        ("total_in", ctypes.c_ulong),
+        ("next_out", ctypes.c_void_p),
+        ("avail_out", ctypes.c_uint),
+        ("total_out", ctypes.c_ulong),
+        ("msg", ctypes.c_char_p),
+        ("state", ctypes.c_void_p),
+        ("zalloc", ctypes.c_void_p),
+        ("zfree", ctypes.c_void_p),
+        ("opaque", ctypes.c_void_p),
+        ("data_type", ctypes.c_int),
+        ("adler", ctypes.c_ulong),
+        ("reserved", ctypes.c_ulong),
+    ]
+
+
+@functools.cache
+def _libz() -> ctypes.CDLL:
+    lib = ctypes.CDLL(ctypes.util.find_library("z") or "libz.so.1")
+    stream_p = ctypes.POINTER(_ZStream)
+    lib.zlibVersion.restype = ctypes.c_char_p
+    lib.inflateInit2_.argtypes = [stream_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
+    lib.inflate.argtypes = [stream_p, ctypes.c_int]
+    lib.inflateEnd.argtypes = [stream_p]
+    lib.inflatePrime.argtypes = [stream_p, ctypes.c_int, ctypes.c_int]
+    lib.inflateSetDictionary.argtypes = [stream_p, ctypes.c_char_p, ctypes.c_uint]
+    lib.inflateGetDictionary.argtypes = [
+        stream_p,
+        ctypes.c_char_p,
+        ctypes.POINTER(ctypes.c_uint),
+    ]
+    return lib
+
+
+def index_supported() -> bool:
+    try:
+        _ = _libz()
+    except (OSError, AttributeError):
+        return False
+    return True
+
+
+class _Inflater:
+    """Thin wrapper around a libz inflate stream reading from ``source``."""
+
+    def __init__(self, source: BinaryIO, window_bits: int):
+        self._lib: ctypes.CDLL = _libz()
+        self._source: BinaryIO = source
+        self._stream: _ZStream = _ZStream()
+        self._input: ctypes.Array[ctypes.c_char] = ctypes.create_string_buffer(
+            INPUT_CHUNK_SIZE
+        )
+        self._output: ctypes.Array[ctypes.c_char] = ctypes.create_string_buffer(
+            OUTPUT_CHUNK_SIZE
+        )
+        self._source_done: bool = False
+        self.finished: bool = False
+        ret = cast(
+            int,
+            self._lib.inflateInit2_(
+                ctypes.byref(self._stream),
+                window_bits,
+                self._lib.zlibVersion(),
+                ctypes.sizeof(_ZStream),
+            ),
+        )
+        self._check(ret, "inflateInit2")
+
+    def _check(self, ret: int, call: str) -> None:
+        if ret not in (_Z_OK, _Z_STREAM_END):
+            message = self._stream.msg.decode() if self._stream.msg else str(ret)
+            raise zlib.error(f"{call} failed: {message}")
+
+    @property
+    def total_in(self) -> int:
+        return self._stream.total_in
+
+    @property
+    def data_type(self) -> int:
+        return self._stream.data_type
+
+    def prime(self, bits: int, value: int) -> None:
+        ret = cast(int, self._lib.inflatePrime(ctypes.byref(self._stream), bits, value))
+        self._check(ret, "inflatePrime")
+
+    def set_dictionary(self, window: bytes) -> None:
+        ret = cast(
+            int,
+            self._lib.inflateSetDictionary(
+                ctypes.byref(self._stream), window, len(window)
+            ),
+        )
+        self._check(ret, "inflateSetDictionary")
+
+    def get_dictionary(self) -> bytes:
+        buffer = ctypes.create_string_buffer(WINDOW_SIZE)
+        length = ctypes.c_uint(0)
+        ret = cast(
+            int,
+            self._lib.inflateGetDictionary(
+                ctypes.byref(self._stream), buffer, ctypes.byref(length)
+            ),
+        )
+        self._check(ret, "inflateGetDictionary")
+        return buffer.raw[: length.value]
+
+    def inflate(self, size: int, flush: int = _Z_NO_FLUSH) -> bytes:
+        """Run inflate once and return what it produced, at most ``size`` bytes.
+
+        The result may be empty while headers are consumed; it is only empty
+        with :attr:`finished` set at the end of the stream.
+        """
+
+        stream = self._stream
+        if stream.avail_in == 0 and not self._source_done:
+            chunk = self._source.read(INPUT_CHUNK_SIZE)
+            if not chunk:
+                self._source_done = True
+            else:
+                _ = ctypes.memmove(self._input, chunk, len(chunk))
+                stream.next_in = ctypes.addressof(self._input)
+                stream.avail_in = len(chunk)
+        size = min(size, OUTPUT_CHUNK_SIZE)
+        stream.next_out = ctypes.addressof(self._output)
+        stream.avail_out = size
+        ret = cast(int, self._lib.inflate(ctypes.byref(stream), flush))
+        produced = size - stream.avail_out
+        if ret == _Z_STREAM_END:
+            self.finished = True
+        elif ret == _Z_BUF_ERROR and stream.avail_in == 0 and self._source_done:
+            raise EOFError("Compressed stream ended unexpectedly")
+        elif ret != _Z_BUF_ERROR:
+            self._check(ret, "inflate")
+        return self._output.raw[:produced]
+
+    def close(self) -> None:
+        _ = cast(int, self._lib.inflateEnd(ctypes.byref(self._stream)))
+
+    def __enter__(self) -> _Inflater:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+@dataclass(frozen=True)
+class Checkpoint:
+    out_offset: int
+    in_offset: int
+    bits: int
+    window: bytes
+
+
+@dataclass(frozen=True)
+class MemberLocation:
+    offset: int
+    size: int
+    mode: int
+
+
+class IndexingReader(io.RawIOBase):
+    """Decompress a gzip stream, recording a checkpoint every ``span`` bytes."""
+
+    def __init__(self, source: BinaryIO, span: int = DEFAULT_SPAN):
+        super().__init__()
+        self._inflater: _Inflater = _Inflater(source, _GZIP_WINDOW_BITS)
+        self._span: int = span
+        self._out_offset: int = 0
+        self.checkpoints: list[Checkpoint] = []
+
+    @override
+    def readable(self) -> bool:
+        return True
+
+    @override
+    def readinto(self, buffer: Buffer, /) -> int:
+        view = memoryview(buffer).cast("B")
+        while not self._inflater.finished:
+            data = self._inflater.inflate(len(view), _Z_BLOCK)
+            self._out_offset += len(data)
+            self._maybe_checkpoint()
+            if data:
+                view[: len(data)] = data
+                return len(data)
+        return 0
+
+    def _maybe_checkpoint(self) -> None:
+        data_type = self._inflater.data_type
+        at_block_boundary = data_type & 128 and not data_type & 64
+        if not at_block_boundary:
+            return
+        last = self.checkpoints[-1].out_offset if self.checkpoints else None
+        if last is not None and self._out_offset - last < self._span:
+            return
+        self.checkpoints.append(
+            Checkpoint(
+                out_offset=self._out_offset,
+                in_offset=self._inflater.total_in,
+                bits=data_type & 7,
+                window=self._inflater.get_dictionary(),
+            )
+        )
+
+    @override
+    def close(self) -> None:
+        if not self.closed:
+            self._inflater.close()
+        super().close()
+
+
+def _member_name(name: str) -> str:
+    return name[2:] if name.startswith("./") else name
+
+
+@dataclass
+class GzipIndex:
+    compressed_size: int
+    checkpoints: list[Checkpoint]
+    members: dict[str, MemberLocation]
+
+    def member(self, name: str) -> MemberLocation:
+        try:
+            return self.members[_member_name(name)]
+        except KeyError:
+            raise KeyError(f"{name} is not a file in the indexed tarball") from None
+
+    def read_range(self, source: BinaryIO, offset: int, size: int) -> Iterator[bytes]:
+        """Yield ``size`` bytes of decompressed data starting at ``offset``."""
+
+        position = bisect.bisect_right(
+            [checkpoint.out_offset for checkpoint in self.checkpoints], offset
+        )
+        if position == 0:
+            raise ValueError(f"No checkpoint precedes offset {offset}")
+        checkpoint = self.checkpoints[position - 1]
+
+        _ = source.seek(checkpoint.in_offset - (1 if checkpoint.bits else 0))
+        prime_byte = source.read(1)[0] if checkpoint.bits else 0
+        with _Inflater(source, _RAW_WINDOW_BITS) as inflater:
+            if checkpoint.bits:
+                inflater.prime(checkpoint.bits, prime_byte >> (8 - checkpoint.bits))
+            if checkpoint.window:
+                inflater.set_dictionary(checkpoint.window)
+
+            skip = offset - checkpoint.out_offset
+            while skip:
+                skip -= len(inflater.inflate(skip))
+                if inflater.finished and skip:
+                    raise EOFError(f"Offset {offset} is past the end of the stream")
+            remaining = size
+            while remaining:
+                data = inflater.inflate(remaining)
+                remaining -= len(data)
+                if data:
+                    yield data
+                if inflater.finished and remaining:
+                    raise EOFError("Stream ended before the requested range")
+
+    def extract_member(self, tarball: Path, name: str, dest: Path) -> None:
+        """Write the tar member ``name`` to ``dest``, replacing it atomically."""
+
+        location = self.member(name)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{dest.name}.", dir=dest.parent)
+        try:
+            with os.fdopen(fd, "wb") as out, tarball.open("rb") as source:
+                for chunk in self.read_range(source, location.offset, location.size):
+                    _ = out.write(chunk)
+            os.chmod(tmp_name, location.mode & 0o7777)
+            os.replace(tmp_name, dest)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def save(self, path: Path) -> None:
+        header = {
+            "compressed_size": self.compressed_size,
+            "checkpoints": [
+                [checkpoint.out_offset, checkpoint.in_offset, checkpoint.bits]
+                for checkpoint in self.checkpoints
+            ],
+            "window_sizes": [len(checkpoint.window) for checkpoint in self.checkpoints],
+            "members": {
+                name: [location.offset, location.size, location.mode]
+                for name, location in self.members.items()
+            },
+        }
+        header_blob = zlib.compress(json.dumps(header).encode())
+        windows_blob = zlib.compress(
+            b"".join(checkpoint.window for checkpoint in self.checkpoints)
+        )
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with tmp_path.open("wb") as f:
+            _ = f.write(INDEX_MAGIC)
+            _ = f.write(struct.pack("<Q", len(header_blob)))
+            _ = f.write(header_blob)
+            _ = f.write(windows_blob)
+        _ = tmp_path.replace(path)
+
+    @staticmethod
+    def load(path: Path) -> GzipIndex:
+        data = path.read_bytes()
+        if not data.startswith(INDEX_MAGIC):
+            raise ValueError(f"{path} is not a linuxcord gzip index")
+        (header_size,) = struct.unpack_from("<Q", data, len(INDEX_MAGIC))
+        header_start = len(INDEX_MAGIC) + 8
+        header_end = header_start + header_size
+        header = cast(
+            dict[str, object],
+            json.loads(zlib.decompress(data[header_start:header_end])),
+        )
+        windows = memoryview(zlib.decompress(data[header_end:]))
+
+        checkpoints: list[Checkpoint] = []
+        window_end = 0
+        raw_checkpoints = cast(list[list[int]], header["checkpoints"])
+        window_sizes = cast(list[int], header["window_sizes"])
+        for (out_offset, in_offset, bits), window_size in zip(
+            raw_checkpoints, window_sizes
+        ):
+            window_start, window_end = window_end, window_end + window_size
+            window = bytes(windows[window_start:window_end])
+            checkpoints.append(Checkpoint(out_offset, in_offset, bits, window))
+        members = {
+            name: MemberLocation(offset, size, mode)
+            for name, (offset, size, mode) in cast(
+                dict[str, list[int]], header["members"]
+            ).items()
+        }
+        return GzipIndex(cast(int, header["compressed_size"]), checkpoints, members)
+
+
+class IndexedTarStream:
+    """Read a ``.tar.gz`` front to back once, indexing it along the way.
+
+    Iterating yields each member as the underlying stream reaches it, so the
+    caller can extract it (``self.tar.extract``) before moving on; ``index()``
+    is complete once iteration has finished.
+    """
+
+    def __init__(self, tarball: Path, span: int = DEFAULT_SPAN):
+        self._tarball: Path = tarball
+        self._source: BinaryIO = tarball.open("rb")
+        self._reader: IndexingReader = IndexingReader(self._source, span)
+        self._buffered: io.BufferedReader = io.BufferedReader(
+            self._reader, buffer_size=OUTPUT_CHUNK_SIZE
+        )
+        self.tar: tarfile.TarFile = tarfile.open(fileobj=self._buffered, mode="r|")
+        self._members: dict[str, MemberLocation] = {}
+
+    def __iter__(self) -> Iterator[tarfile.TarInfo]:
+        for member in self.tar:
+            if member.isfile():
+                self._members[_member_name(member.name)] = MemberLocation(
+                    member.offset_data, member.size, member.mode
+                )
+            yield member
+
+    def index(self) -> GzipIndex:
+        logger.debug(
+            "Indexed %s: %d checkpoints, %d members",
+            self._tarball,
+            len(self._reader.checkpoints),
+            len(self._members),
+        )
+        return GzipIndex(
+            os.fstat(self._source.fileno()).st_size,
+            self._reader.checkpoints,
+            dict(self._members),
+        )
+
+    def close(self) -> None:
+        self.tar.close()
+        self._buffered.close()
+        self._source.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def build_index(tarball: Path, span: int = DEFAULT_SPAN) -> GzipIndex:
+    """Inflate ``tarball`` once and index its checkpoints and file members."""
+
+    with IndexedTarStream(tarball, span) as stream:
+        for _member in stream:
+            pass
+        return stream.index()
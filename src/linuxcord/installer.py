@@ -1,88 +1,306 @@
 from __future__ import annotations
 
 import logging
+import os
+import posixpath
 import shutil
 import tarfile
 import tempfile
-from collections.abc import Iterable
-from pathlib import Path
+import time
+import zlib
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
 from typing import cast
 
 import requests
+from packaging.version import InvalidVersion
 
+from linuxcord.fsutil import (
+    clone_file,
+    clone_tree,
+    deny_shared_writes,
+    fsync_directory,
+    move_to_trash,
+    remove_tree,
+    replace_symlink,
+    swap_in_directory,
+    sync_filesystems,
+)
+from linuxcord.gzindex import GzipIndex, IndexedTarStream, index_supported
+from linuxcord.manifest import InstallRecord, ManifestStore
 from linuxcord.paths import DiscordPaths, LinuxcordPaths
 from linuxcord.types import DiscordVersion
+from linuxcord.versions import LocalVersioner
 
 
 logger = logging.getLogger(__name__)
 CHUNK_SIZE = 8192
+ARCHIVE_ROOT = "Discord"
+LOCALES_DIR = PurePosixPath(ARCHIVE_ROOT, "locales")
+# Chromium falls back to this when the UI language has no .pak of its own.
+FALLBACK_LOCALE = "en-US"
+
+
+class StoreInstallError(PermissionError):
+    """A shared store's install belongs to another user, who must replace it."""
+
+
+def locale_selection(locales: Iterable[str]) -> tuple[str, ...]:
+    """Normalise a list of locales to keep, always including the fallback."""
+
+    selected: dict[str, str] = {}
+    for locale in (*locales, FALLBACK_LOCALE):
+        locale = locale.strip()
+        if locale:
+            _ = selected.setdefault(locale.lower(), locale)
+    return tuple(sorted(selected.values(), key=str.lower))
+
+
+def _skipped_locale(member: tarfile.TarInfo, keep_locales: frozenset[str]) -> bool:
+    path = PurePosixPath(member.name)
+    if path.parent != LOCALES_DIR or path.suffix != ".pak":
+        return False
+    return path.stem.lower() not in keep_locales
 
 
 def _validate_tar_member(member: tarfile.TarInfo) -> None:
     name = member.name
     if name.startswith("/"):
         raise ValueError("Absolute paths are not allowed in archive")
-    member_path = Path(name)
+    member_path = PurePosixPath(name)
     if any(part == ".." for part in member_path.parts):
         raise ValueError("Path traversal detected in archive")
+    if member.isdev():
+        raise ValueError(f"Device file {name} is not allowed in archive")
+    if member.issym() or member.islnk():
+        # Symlinks resolve against their own directory, hardlinks against
+        # the archive root.
+        base = member_path.parent if member.issym() else PurePosixPath()
+        target = posixpath.normpath(base / member.linkname)
+        if member.linkname.startswith("/") or target.split("/")[0] == "..":
+            raise ValueError(f"Link {name} points outside the archive")
 
 
-def _safe_extract(tar: tarfile.TarFile, target: Path) -> None:
-    logger.debug("Extracting tarball to %s", target)
-    for member in tar.getmembers():
+def _extract_members(
+    tar: tarfile.TarFile,
+    members: Iterable[tarfile.TarInfo],
+    target: Path,
+    keep_locales: Sequence[str] | None = None,
+) -> None:
+    # Members are checked one at a time just before they are written, so the
+    # archive is only read once; the caller discards the partial tree when a
+    # member is rejected.
+    keep = (
+        frozenset(locale.lower() for locale in keep_locales)
+        if keep_locales is not None
+        else None
+    )
+    for member in members:
         _validate_tar_member(member)
-    tar.extractall(path=target)
+        if keep is not None and _skipped_locale(member, keep):
+            continue
+        try:
+            # The data filter resolves each member against what is already
+            # on disk, so a chain of links cannot lead outside ``target``.
+            tar.extract(member, path=target, filter="data")
+        except tarfile.FilterError as e:
+            raise ValueError(f"Unsafe member {member.name} in archive: {e}") from e
+
+
+def _check_replaceable(version: DiscordVersion, destination: Path) -> None:
+    # Renaming another user's directory out of the store fails with EACCES,
+    # so say whose it is before downloading anything.
+    owner = destination.stat().st_uid
+    if os.geteuid() not in (0, owner):
+        who = f"Discord {version.string} in the shared store belongs to user {owner}"
+        raise StoreInstallError(f"{who}; only they or root can reinstall or repair it")
+
+
+def _extract_tarball(
+    tarball: Path, target: Path, keep_locales: Sequence[str] | None = None
+) -> GzipIndex | None:
+    """Validate and extract ``tarball`` in one forward pass.
+
+    Where libz is available the same pass also builds the tarball's gzip
+    index, which is returned. With ``keep_locales``, other locales' .pak
+    files are skipped as they stream past.
+    """
+
+    logger.debug("Extracting %s to %s", tarball, target)
+    if not index_supported():
+        with tarfile.open(tarball, "r|gz") as tar:
+            _extract_members(tar, tar, target, keep_locales)
+        return None
+    try:
+        with IndexedTarStream(tarball) as stream:
+            _extract_members(stream.tar, stream, target, keep_locales)
+            return stream.index()
+    except (EOFError, zlib.error) as e:
+        raise tarfile.ReadError(f"Corrupt tarball {tarball}: {e}") from e
+
+
+def register_store_user(linuxcord_paths: LinuxcordPaths) -> None:
+    """Record in a shared store which versions this user may launch.
+
+    Called holding the store's lock, which pruning takes exclusively, so
+    no other user can prune a version between its being linked here and
+    registered.
+    """
+
+    user_file = linuxcord_paths.store_user_file
+    if user_file is None:
+        return
+    current = LocalVersioner(linuxcord_paths).get_current_version()
+    pinned = ManifestStore(linuxcord_paths).load(files=False).pinned
+    versions = sorted({v for v in (current, pinned) if v is not None})
+    content = "".join(f"{version.string}\n" for version in versions)
+    try:
+        if user_file.read_text() == content:
+            return
+    except FileNotFoundError:
+        pass
+    user_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = user_file.with_name(f".{user_file.name}.{os.getpid()}")
+    _ = tmp_path.write_text(content)
+    # Read by every user of the store when they prune.
+    tmp_path.chmod(0o644)
+    _ = tmp_path.replace(user_file)
+
+
+def clean_staging(linuxcord_paths: LinuxcordPaths) -> None:
+    """Move staging directories left by interrupted installs to the trash.
+
+    Only safe while holding the exclusive lock, when no other install can
+    be using them.
+    """
+
+    try:
+        orphans = list(linuxcord_paths.staging_dir.iterdir())
+    except FileNotFoundError:
+        return
+    for orphan in orphans:
+        logger.info("Discarding unfinished install at %s", orphan)
+        _ = move_to_trash(orphan, linuxcord_paths.trash_dir)
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """Which installs besides the current one survive pruning.
+
+    The ``keep`` most recently installed are kept, as is anything installed
+    less than ``keep_within`` seconds ago.
+    """
+
+    keep: int = 1
+    keep_within: float | None = None
 
 
 class DiscordInstaller:
+    """Installs, links and prunes Discord versions.
+
+    With ``durable``, a finished tree is flushed to disk before it is
+    renamed into place, and the renames themselves before ``current`` is
+    switched to it. A power cut then leaves either the old install or the
+    complete new one, never a link to truncated files.
+    """
+
     def __init__(
-        self, linuxcord_paths: LinuxcordPaths, session: requests.Session
+        self,
+        linuxcord_paths: LinuxcordPaths,
+        session: requests.Session,
+        durable: bool = False,
     ) -> None:
         self._paths: LinuxcordPaths = linuxcord_paths
         self._session: requests.Session = session
+        self._manifest: ManifestStore = ManifestStore(linuxcord_paths)
+        self._durable: bool = durable
 
     def install(
-        self, version: DiscordVersion, tgz_url: str, force: bool = False
+        self,
+        version: DiscordVersion,
+        tgz_url: str,
+        force: bool = False,
+        keep_locales: tuple[str, ...] | None = None,
     ) -> DiscordPaths:
+        """Download and install ``version``, replacing it with ``force``.
+
+        With ``keep_locales`` (see ``locale_selection``), only those locales
+        are extracted, and the selection is recorded with the install.
+        """
+
         destination = self._paths.discord_paths(version).dir
-        if destination.exists():
-            if not force:
-                raise FileExistsError(f"Destination {destination} already exists")
-            shutil.rmtree(destination)
+        if destination.exists() and not force:
+            raise FileExistsError(f"Destination {destination} already exists")
+        if destination.exists() and self._paths.store_dir is not None:
+            _check_replaceable(version, destination)
 
         destination.parent.mkdir(parents=True, exist_ok=True)
+        clean_staging(self._paths)
+        # The new tree is assembled beside the installs and only renamed into
+        # place once it is complete, so a running or launching Discord never
+        # sees a half-written install, even with --force.
+        self._paths.staging_dir.mkdir(parents=True, exist_ok=True)
+        staging = Path(
+            tempfile.mkdtemp(prefix=f"{version.string}.", dir=self._paths.staging_dir)
+        )
 
-        with tempfile.TemporaryDirectory() as tmpdir_str:
-            tmpdir = Path(tmpdir_str)
-            tarball_path = tmpdir / "discord.tar.gz"
-            self._download_tarball(tgz_url, tarball_path)
-            with tarfile.open(tarball_path, "r:gz") as tar:
-                _safe_extract(tar, tmpdir)
+        # The tarball is kept in the cache so damaged files can be restored
+        # from it later without downloading again.
+        cached_tarball = self._paths.cached_tarball(version)
+        partial_tarball = cached_tarball.with_name(f".{cached_tarball.name}.part")
+        partial_tarball.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self._download_tarball(tgz_url, partial_tarball)
+            index = _extract_tarball(partial_tarball, staging, keep_locales)
 
-            extracted = tmpdir / "Discord"
+            extracted = staging / ARCHIVE_ROOT
             if not extracted.exists():
                 raise ValueError("Extracted archive missing Discord directory")
 
-            logger.debug("Moving extracted Discord directory to %s", destination)
-            _ = shutil.move(str(extracted), destination)
+            staged_paths = DiscordPaths(extracted)
+            for required in (
+                staged_paths.icon,
+                staged_paths.executable,
+                staged_paths.build_info,
+            ):
+                if not required.exists():
+                    raise FileNotFoundError(
+                        f"Expected file {required.name} not found after install"
+                    )
 
-        discord_paths = DiscordPaths(destination)
-        for required in (
-            discord_paths.icon,
-            discord_paths.executable,
-            discord_paths.build_info,
-        ):
-            if not required.exists():
-                raise FileNotFoundError(
-                    f"Expected file {required} not found after install"
+            installed_version = DiscordVersion.from_build_info(staged_paths.build_info)
+            if installed_version != version:
+                raise ValueError(
+                    "Installed version does not match expected version",
                 )
 
-        installed_version = DiscordVersion.from_build_info(discord_paths.build_info)
-        if installed_version != version:
-            raise ValueError(
-                "Installed version does not match expected version",
+            if self._paths.store_dir is not None:
+                # Other users of the store may use the install, not change it.
+                deny_shared_writes(extracted)
+            self._flush(staging, partial_tarball)
+            logger.debug("Swapping %s into %s", extracted, destination)
+            replaced = swap_in_directory(extracted, destination)
+            if replaced is not None:
+                # Deleted in the background along with pruned installs.
+                _ = move_to_trash(replaced, self._paths.trash_dir)
+            _ = partial_tarball.replace(cached_tarball)
+            self._flush_renames(destination.parent, cached_tarball.parent)
+        finally:
+            partial_tarball.unlink(missing_ok=True)
+            remove_tree(staging)
+
+        record = self._manifest.record_install(version, destination, keep_locales)
+        if self._paths.store_manifest_file is not None:
+            ManifestStore(self._paths, self._paths.store_manifest_file).add_install(
+                record
             )
+        self._save_index(version, index)
+        self.copy_icon(version)
+        return DiscordPaths(destination)
 
+    def copy_icon(self, version: DiscordVersion) -> None:
+        discord_paths = self._paths.discord_paths(version)
         icon_target = self._paths.data_dir / "discord.png"
         try:
             _ = shutil.copy(discord_paths.icon, icon_target)
@@ -92,7 +310,82 @@ class DiscordInstaller:
                 discord_paths.icon,
             )
 
-        return discord_paths
+    def install_clone(
+        self, version: DiscordVersion, source: LinuxcordPaths, hardlink: bool = True
+    ) -> DiscordPaths:
+        """Install ``version`` by cloning another profile's install of it.
+
+        The tree, cached tarball and index share their data with the source
+        where the filesystem allows (see ``fsutil.clone_file``), and the
+        source's recorded hashes are reused. Without ``hardlink`` they are
+        copied rather than hardlinked, for sources owned by someone else.
+        """
+
+        source_dir = source.discord_paths(version).dir
+        destination = self._paths.discord_paths(version).dir
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        clean_staging(self._paths)
+        self._paths.staging_dir.mkdir(parents=True, exist_ok=True)
+        staging = Path(
+            tempfile.mkdtemp(prefix=f"{version.string}.", dir=self._paths.staging_dir)
+        )
+        try:
+            method = clone_tree(source_dir, staging / ARCHIVE_ROOT, hardlink)
+            logger.debug("Cloned %s into %s by %s", source_dir, staging, method)
+            self._flush(staging)
+            replaced = swap_in_directory(staging / ARCHIVE_ROOT, destination)
+            if replaced is not None:
+                _ = move_to_trash(replaced, self._paths.trash_dir)
+            self._flush_renames(destination.parent)
+        finally:
+            remove_tree(staging)
+
+        self._paths.tarball_cache_dir.mkdir(parents=True, exist_ok=True)
+        for source_file, target_file in (
+            (source.cached_tarball(version), self._paths.cached_tarball(version)),
+            (source.tarball_index(version), self._paths.tarball_index(version)),
+        ):
+            target_file.unlink(missing_ok=True)
+            if source_file.exists():
+                _ = clone_file(source_file, target_file, hardlink)
+
+        record = ManifestStore(source).load().install_record(version)
+        if record is None:
+            _ = self._manifest.record_install(version, destination)
+        else:
+            self._manifest.add_install(
+                InstallRecord(version, time.time(), dict(record.files), record.locales)
+            )
+        self.copy_icon(version)
+        return DiscordPaths(destination)
+
+    def _flush(self, *paths: Path) -> None:
+        if not self._durable:
+            return
+        started = time.monotonic()
+        sync_filesystems(*paths)
+        logger.debug("Flushed to disk in %.3fs", time.monotonic() - started)
+
+    def _flush_renames(self, *directories: Path) -> None:
+        if self._durable:
+            for directory in directories:
+                fsync_directory(directory)
+
+    def _save_index(self, version: DiscordVersion, index: GzipIndex | None) -> None:
+        index_path = self._paths.tarball_index(version)
+        index_path.unlink(missing_ok=True)
+        if index is None:
+            logger.debug("libz is unavailable; not indexing the cached tarball")
+            return
+        try:
+            index.save(index_path)
+        except OSError:
+            logger.warning(
+                "Could not save %s; repairs will need a full reinstall",
+                index_path,
+                exc_info=True,
+            )
+            index_path.unlink(missing_ok=True)
 
     def _download_tarball(self, url: str, dest: Path) -> None:
         logger.info("Downloading Discord from %s", url)
@@ -114,25 +407,101 @@ class DiscordInstaller:
         target_dir = self._paths.discord_paths(version).dir
         symlink = self._paths.discord_current_version_dir_symlink
         symlink.parent.mkdir(parents=True, exist_ok=True)
-        if symlink.exists() or symlink.is_symlink():
-            logger.debug("Removing existing current link %s", symlink)
-            symlink.unlink()
+        if symlink.exists() and not symlink.is_symlink():
+            raise FileExistsError(f"{symlink} exists and is not a symlink")
         logger.info("Linking %s to current install", target_dir)
-        symlink.symlink_to(target_dir)
+        # Swapped in with a rename so launches never find the link missing
+        # and need not take the lock.
+        replace_symlink(symlink, target_dir)
+        self._flush_renames(symlink.parent)
+        self._manifest.record_current(version)
+
+    def _store_references(self) -> set[DiscordVersion] | None:
+        """Versions other users of a shared store may still launch.
+
+        Read from the files ``register_store_user`` leaves in the store.
+        None when one of them cannot be read, so nothing is pruned.
+        """
+
+        users_dir = self._paths.store_users_dir
+        if users_dir is None:
+            return set()
+        referenced: set[DiscordVersion] = set()
+        try:
+            user_files = list(users_dir.iterdir())
+            for user_file in user_files:
+                if user_file.name.startswith("."):
+                    continue
+                for line in user_file.read_text().split():
+                    try:
+                        referenced.add(DiscordVersion(line))
+                    except InvalidVersion:
+                        continue
+        except FileNotFoundError:
+            return referenced
+        except OSError:
+            logger.warning("Not pruning %s", self._paths.install_dir, exc_info=True)
+            return None
+        return referenced
+
+    def prune_old_versions(
+        self,
+        current_version: DiscordVersion,
+        retention: RetentionPolicy | None = None,
+    ) -> list[DiscordVersion]:
+        """Move installs outside the retention policy to the trash.
+
+        Only the rename happens here; the space is freed once the trash is
+        handed to ``fsutil.spawn_deleter``. Returns the versions pruned.
+        """
 
-    def prune_old_versions(self, current_version: DiscordVersion) -> None:
-        versions_dir = self._paths.discord_versions_dir
-        no_pruning_flag = versions_dir / "NO_PRUNING"
+        # Beside the installs, wherever --versions-root has put them.
+        no_pruning_flag = self._paths.install_dir / "NO_PRUNING"
         if no_pruning_flag.exists():
             logger.info("Skipping pruning because %s exists", no_pruning_flag)
-            return
+            return []
+        others = self._store_references()
+        if others is None:
+            return []
+
+        retention = retention or RetentionPolicy()
+        manifest = self._manifest.load(files=False)
+        # The pinned install must survive for as long as the pin holds.
+        referenced = {current_version, manifest.pinned, *others}
+        candidates: list[tuple[float, DiscordVersion]] = []
+        for version in LocalVersioner(self._paths).installed_versions():
+            if version in referenced:
+                continue
+            record = manifest.install_record(version)
+            install_dir = self._paths.discord_paths(version).dir
+            installed_at = (
+                record.installed_at if record else install_dir.stat().st_mtime
+            )
+            candidates.append((installed_at, version))
 
-        current_dir = self._paths.discord_paths(current_version).dir
-        for child in versions_dir.iterdir():
-            if child == current_dir:
+        now = time.time()
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        pruned: list[DiscordVersion] = []
+        for position, (installed_at, version) in enumerate(candidates):
+            if position < retention.keep:
                 continue
-            if child == self._paths.discord_current_version_dir_symlink:
+            if retention.keep_within is not None:
+                if now - installed_at <= retention.keep_within:
+                    continue
+            install_dir = self._paths.discord_paths(version).dir
+            logger.info("Pruning old Discord install at %s", install_dir)
+            try:
+                _ = move_to_trash(install_dir, self._paths.trash_dir)
+            except PermissionError:
+                # Another store user's read-only install; theirs to prune.
+                logger.info("Leaving %s to the user who installed it", install_dir)
                 continue
-            if child.is_dir():
-                logger.info("Pruning old Discord install at %s", child)
-                shutil.rmtree(child, ignore_errors=True)
+            self._manifest.forget_install(version)
+            if self._paths.store_manifest_file is not None:
+                ManifestStore(
+                    self._paths, self._paths.store_manifest_file
+                ).forget_install(version)
+            self._paths.cached_tarball(version).unlink(missing_ok=True)
+            self._paths.tarball_index(version).unlink(missing_ok=True)
+            pruned.append(version)
+        return pruned
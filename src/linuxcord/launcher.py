@@ -3,14 +3,23 @@ from __future__ import annotations
 import logging
 import os
 import subprocess
-from collections.abc import Callable
+import sys
+from collections.abc import Callable, Mapping, Sequence
+from pathlib import Path
+from typing import Literal
 
-from linuxcord.paths import LinuxcordPaths
+from linuxcord.limits import ResourceLimits, limit_command
+from linuxcord.mirror import InstallMirror
+from linuxcord.paths import DiscordPaths, LinuxcordPaths
+from linuxcord.prewarm import prewarm_install, prewarm_in_background
 from linuxcord.types import DiscordVersion
 
 
 logger = logging.getLogger(__name__)
 PopenType = Callable[..., subprocess.Popen[bytes]] | type[subprocess.Popen[bytes]]
+ExecveType = Callable[[str, list[str], Mapping[str, str]], object]
+LaunchMode = Literal["popen", "exec"]
+LAUNCH_MODES: tuple[LaunchMode, ...] = ("popen", "exec")
 
 
 class DiscordLauncher:
@@ -18,24 +27,85 @@ class DiscordLauncher:
         self,
         linuxcord_paths: LinuxcordPaths,
         popen: PopenType | None = None,
+        execve: ExecveType | None = None,
+        prewarm_patterns: Sequence[str] | None = None,
+        mirror: bool = False,
+        limits: ResourceLimits | None = None,
     ):
         self._paths: LinuxcordPaths = linuxcord_paths
         self.popen: PopenType = popen or subprocess.Popen
+        self.execve: ExecveType = execve or os.execve
+        # Files to pull into the page cache while Discord starts; None to
+        # leave the cache alone.
+        self.prewarm_patterns: Sequence[str] | None = prewarm_patterns
+        # Start from a copy in the runtime directory (see InstallMirror).
+        self.mirror: bool = mirror
+        # Run Discord in its own cgroup, at its own priority (see limit_command).
+        self.limits: ResourceLimits | None = limits
 
     def _ensure_not_root(self) -> None:
         if hasattr(os, "geteuid") and os.geteuid() == 0:
             raise RuntimeError("Do not run linuxcord as root")
 
-    def launch(self, discord_version: DiscordVersion) -> None:
+    def launch(
+        self, discord_version: DiscordVersion, mode: LaunchMode = "popen"
+    ) -> None:
+        """Start Discord as a child process, or replace this process with it."""
+
         self._ensure_not_root()
         discord_paths = self._paths.discord_paths(discord_version)
         install_dir = discord_paths.dir
         executable = discord_paths.executable
         if not executable.exists():
             raise RuntimeError("Discord executable not found; is it installed?")
+        prewarm_patterns = self.prewarm_patterns
+        if self.mirror:
+            mirrored = self._mirror(discord_version)
+            if mirrored is not None:
+                install_dir = mirrored.dir
+                executable = mirrored.executable
+                # Already in RAM.
+                prewarm_patterns = None
+
+        command = [str(executable)]
+        if self.limits is not None:
+            command = limit_command(command, self.limits, self._paths.runtime_dir)
 
-        env = os.environ.copy()
         logger.debug("Launching Discord with cwd=%s", install_dir)
         logger.info("Launching Discord from %s", executable)
+        if mode == "exec":
+            if prewarm_patterns is not None:
+                # A thread would not survive the exec, but queueing the
+                # readahead only takes a moment.
+                _ = prewarm_install(install_dir, prewarm_patterns)
+            self._exec(command, install_dir)
+            return
+
+        if prewarm_patterns is not None:
+            _ = prewarm_in_background(install_dir, prewarm_patterns)
+
+        env = os.environ.copy()
         popen = self.popen
-        _ = popen([str(executable)], cwd=str(install_dir), env=env)
+        _ = popen(command, cwd=str(install_dir), env=env)
+
+    def _mirror(self, discord_version: DiscordVersion) -> DiscordPaths | None:
+        try:
+            result = InstallMirror(self._paths).mirror(discord_version)
+        except OSError:
+            logger.warning(
+                "Could not mirror Discord; launching it in place", exc_info=True
+            )
+            return None
+        if result is None:
+            return None
+        mirrored = DiscordPaths(result.path)
+        return mirrored if mirrored.executable.exists() else None
+
+    def _exec(self, command: list[str], install_dir: Path) -> None:
+        # Nothing buffered in Python survives the exec, so flush it first.
+        for handler in logging.getLogger().handlers:
+            handler.flush()
+        _ = sys.stdout.flush()
+        _ = sys.stderr.flush()
+        os.chdir(install_dir)
+        _ = self.execve(command[0], command, os.environ)
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import shutil
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+# Leaves created beside linuxcord's own cgroup when systemd is unavailable.
+CGROUP_PREFIX = "linuxcord-discord-"
+# Moves the shell into the cgroup whose cgroup.procs is $0, then becomes the
+# command. A failed move only costs the limits, never the launch.
+_ENTER_CGROUP = (
+    '{ echo $$ > "$0"; } 2>/dev/null'
+    ' || echo "linuxcord: could not move Discord into ${0%/*}" >&2; exec "$@"'
+)
+IO_CLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+_SIZE = re.compile(r"([0-9]+)([KMGT]?)")
+_SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+@dataclass(frozen=True)
+class ResourceLimits:
+    """Resource controls for Discord, named as systemd names them.
+
+    The memory limits and weights are cgroup settings. ``nice`` and the
+    I/O scheduling class and priority apply to the process itself.
+    """
+
+    memory_high: int | None = None
+    memory_max: int | None = None
+    cpu_weight: int | None = None
+    io_weight: int | None = None
+    nice: int | None = None
+    io_scheduling_class: str | None = None
+    io_scheduling_priority: int | None = None
+
+    @classmethod
+    def parse(cls, settings: Iterable[str]) -> ResourceLimits:
+        """Limits from ``Key=value`` settings such as ``MemoryMax=4G``.
+
+        Raises ValueError for unknown keys and out of range values.
+        """
+
+        limits = cls()
+        for setting in settings:
+            key, sep, value = setting.partition("=")
+            key, value = key.strip(), value.strip()
+            if not sep or not value:
+                raise ValueError(f"expected Key=value, got {setting!r}")
+            if key == "MemoryHigh":
+                limits = replace(limits, memory_high=_parse_size(value))
+            elif key == "MemoryMax":
+                limits = replace(limits, memory_max=_parse_size(value))
+            elif key == "CPUWeight":
+                limits = replace(limits, cpu_weight=_parse_int(key, value, 1, 10000))
+            elif key == "IOWeight":
+                limits = replace(limits, io_weight=_parse_int(key, value, 1, 10000))
+            elif key == "Nice":
+                limits = replace(limits, nice=_parse_int(key, value, -20, 19))
+            elif key == "IOSchedulingClass":
+                if value not in IO_CLASSES:
+                    raise ValueError(f"unknown IOSchedulingClass {value!r}")
+                limits = replace(limits, io_scheduling_class=value)
+            elif key == "IOSchedulingPriority":
+                priority = _parse_int(key, value, 0, 7)
+                limits = replace(limits, io_scheduling_priority=priority)
+            else:
+                raise ValueError(f"unknown resource limit {key!r}")
+        return limits
+
+    def cgroup_files(self) -> dict[str, str]:
+        """The cgroup v2 interface files to write, and their contents."""
+
+        files: dict[str, str] = {}
+        if self.memory_high is not None:
+            files["memory.high"] = str(self.memory_high)
+        if self.memory_max is not None:
+            files["memory.max"] = str(self.memory_max)
+        if self.cpu_weight is not None:
+            files["cpu.weight"] = str(self.cpu_weight)
+        if self.io_weight is not None:
+            files["io.weight"] = f"default {self.io_weight}"
+        return files
+
+    def systemd_properties(self) -> list[str]:
+        properties: list[str] = []
+        if self.memory_high is not None:
+            properties.append(f"MemoryHigh={self.memory_high}")
+        if self.memory_max is not None:
+            properties.append(f"MemoryMax={self.memory_max}")
+        if self.cpu_weight is not None:
+            properties.append(f"CPUWeight={self.cpu_weight}")
+        if self.io_weight is not None:
+            properties.append(f"IOWeight={self.io_weight}")
+        return properties
+
+
+def _parse_int(key: str, value: str, low: int, high: int) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{key} must be a whole number, got {value!r}") from None
+    if not low <= number <= high:
+        raise ValueError(f"{key} must be between {low} and {high}, got {number}")
+    return number
+
+
+def _parse_size(value: str) -> int:
+    match = _SIZE.fullmatch(value.upper())
+    if match is None:
+        raise ValueError(f"invalid size {value!r}, expected e.g. 512M or 4G")
+    return int(match.group(1)) * _SIZE_UNITS[match.group(2)]
+
+
+def limit_command(
+    command: Sequence[str], limits: ResourceLimits, runtime_dir: Path | None
+) -> list[str]:
+    """``command`` wrapped to run under ``limits``.
+
+    The cgroup settings go on a transient ``systemd-run --user --scope``
+    when the user's service manager is reachable, and on a new cgroup v2
+    leaf beside linuxcord's own otherwise. Controls that cannot be set up
+    are logged and left out; Discord is started regardless.
+    """
+
+    wrapped = _priority_prefix(limits) + list(command)
+    cgroup_files = limits.cgroup_files()
+    if not cgroup_files:
+        return wrapped
+    systemd_run = _systemd_run(runtime_dir)
+    if systemd_run is not None:
+        properties = [f"--property={p}" for p in limits.systemd_properties()]
+        scope = [systemd_run, "--user", "--scope", "--quiet", "--collect"]
+        return scope + properties + ["--"] + wrapped
+    procs_file = _create_cgroup(cgroup_files)
+    if procs_file is None:
+        logger.warning("Starting Discord without cgroup limits")
+        return wrapped
+    shell = shutil.which("sh") or "/bin/sh"
+    return [shell, "-c", _ENTER_CGROUP, str(procs_file)] + wrapped
+
+
+def _priority_prefix(limits: ResourceLimits) -> list[str]:
+    prefix: list[str] = []
+    if limits.nice is not None:
+        nice = shutil.which("nice")
+        if nice is None:
+            logger.warning("nice is not installed; not changing Discord's priority")
+        else:
+            prefix += [nice, "-n", str(limits.nice)]
+    io_class = limits.io_scheduling_class
+    if io_class is None and limits.io_scheduling_priority is not None:
+        io_class = "best-effort"
+    if io_class is not None:
+        ionice = shutil.which("ionice")
+        if ionice is None:
+            logger.warning("ionice is not installed; not changing Discord's I/O class")
+        else:
+            # -t: start Discord even if the class is not allowed (realtime).
+            prefix += [ionice, "-t", "-c", str(IO_CLASSES[io_class])]
+            if limits.io_scheduling_priority is not None and io_class != "idle":
+                prefix += ["-n", str(limits.io_scheduling_priority)]
+    return prefix
+
+
+def _systemd_run(runtime_dir: Path | None) -> str | None:
+    systemd_run = shutil.which("systemd-run")
+    if systemd_run is None:
+        return None
+    # systemd-run --user talks to the manager over the user's bus.
+    if os.environ.get("DBUS_SESSION_BUS_ADDRESS"):
+        return systemd_run
+    if runtime_dir is not None and (runtime_dir / "bus").exists():
+        return systemd_run
+    logger.info("No user bus for systemd-run; falling back to a plain cgroup")
+    return None
+
+
+def own_cgroup() -> Path | None:
+    """This process's cgroup v2 directory, or None without cgroup v2."""
+
+    try:
+        lines = Path("/proc/self/cgroup").read_text().splitlines()
+    except OSError:
+        return None
+    for line in lines:
+        if line.startswith("0::/"):
+            return CGROUP_ROOT / line.removeprefix("0::/")
+    return None
+
+
+def _create_cgroup(cgroup_files: dict[str, str]) -> Path | None:
+    """Create a limited cgroup leaf and return its ``cgroup.procs``.
+
+    Processes may only live in leaves once controllers are enabled, so the
+    leaf goes beside linuxcord's own cgroup. That takes a cgroup subtree
+    delegated to this user.
+    """
+
+    own = own_cgroup()
+    if own is None or own == CGROUP_ROOT:
+        logger.warning("No cgroup v2 hierarchy to put Discord in")
+        return None
+    parent = own.parent
+    # Leaves of earlier launches; those still in use are not empty.
+    for stale in parent.glob(f"{CGROUP_PREFIX}*"):
+        try:
+            stale.rmdir()
+        except OSError:
+            continue
+    controllers = {name.partition(".")[0] for name in cgroup_files}
+    leaf = parent / f"{CGROUP_PREFIX}{os.getpid()}"
+    try:
+        enabled = set((parent / "cgroup.subtree_control").read_text().split())
+        missing = controllers - enabled
+        if missing:
+            enable = " ".join(f"+{name}" for name in sorted(missing))
+            _ = (parent / "cgroup.subtree_control").write_text(enable)
+        leaf.mkdir(exist_ok=True)
+        for name, value in cgroup_files.items():
+            _ = (leaf / name).write_text(value)
+    except OSError as e:
+        logger.warning("Could not set up a cgroup in %s: %s", parent, e)
+        try:
+            leaf.rmdir()
+        except OSError:
+            pass
+        return None
+    return leaf / "cgroup.procs"
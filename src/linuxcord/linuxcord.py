@@ -1,7 +1,11 @@
 from __future__ import annotations
 
 import logging
-import shutil
+import os
+import time
+import zlib
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from typing import cast
@@ -10,15 +14,36 @@ import requests
 from xdg import BaseDirectory
 
 from linuxcord import DEFAULT_DISCORD_TGZ_URL, DEFAULT_UPDATES_URL
+from linuxcord.daemon import LinuxcordDaemon, ask_daemon
 from linuxcord.freedesktop import FreeDesktop
-from linuxcord.installer import DiscordInstaller
-from linuxcord.launcher import DiscordLauncher
-from linuxcord.paths import LinuxcordPaths
+from linuxcord.fsutil import chown_tree, move_to_trash, spawn_deleter
+from linuxcord.installer import (
+    DiscordInstaller,
+    RetentionPolicy,
+    clean_staging,
+    locale_selection,
+    register_store_user,
+)
+from linuxcord.launcher import DiscordLauncher, LaunchMode
+from linuxcord.limits import ResourceLimits
+from linuxcord.locking import InstallLock, LockMode, LockTimeout
+from linuxcord.manifest import ManifestStore
+from linuxcord.paths import HomeXDG, LinuxcordPaths
+from linuxcord.prewarm import (
+    DEFAULT_PREWARM_PATTERNS,
+    PrewarmResult,
+    prewarm_install,
+)
 from linuxcord.types import DiscordVersion, PyXDG
+from linuxcord.verify import InstallVerifier, VerifyResult
 from linuxcord.versions import LocalVersioner, OnlineVersioner
 
 
 logger = logging.getLogger(__name__)
+UPDATE_CHECK_INTERVAL = 60 * 60
+# How long launches skip the update check after it found Discord unreachable.
+OFFLINE_RETRY_INTERVAL = 10 * 60
+FLEET_WORKERS = 4
 
 
 @dataclass
@@ -29,99 +54,378 @@ class UpdateResult:
     current_path: Path | None
 
 
-def _build_paths(xdg: PyXDG | None) -> LinuxcordPaths:
+def _build_paths(
+    xdg: PyXDG | None,
+    store_dir: Path | None = None,
+    versions_root: Path | None = None,
+) -> LinuxcordPaths:
     resolved_xdg = cast(PyXDG, xdg or BaseDirectory)
-    return LinuxcordPaths(resolved_xdg)
+    return LinuxcordPaths(resolved_xdg, store_dir, versions_root)
+
+
+def _adopt_install(
+    linuxcord_paths: LinuxcordPaths,
+    installer: DiscordInstaller,
+    version: DiscordVersion,
+) -> bool:
+    """Take up an install that is already on disk, if it is intact.
+
+    A shared store's install was recorded by whoever installed it, so its
+    record is copied into this user's manifest and checked before use. Any
+    store member can rewrite that record, so the check catches damaged or
+    unfinished trees, not tampering by another member.
+    """
+
+    if linuxcord_paths.store_manifest_file is not None:
+        shared = ManifestStore(linuxcord_paths, linuxcord_paths.store_manifest_file)
+        record = shared.load().install_record(version)
+        if record is None:
+            return False
+        ManifestStore(linuxcord_paths).add_install(record)
+        if not InstallVerifier(linuxcord_paths).verify(version).ok:
+            return False
+    installer.copy_icon(version)
+    return True
+
+
+@dataclass
+class InstalledVersion:
+    version: DiscordVersion
+    path: Path
+    installed_at: float | None
+    current: bool
+    pinned: bool
+
+
+def _schedule_next_check(
+    linuxcord_paths: LinuxcordPaths,
+    now: float,
+    interval: float = UPDATE_CHECK_INTERVAL,
+) -> None:
+    # Read by the desktop launcher script, so write it atomically as a bare
+    # epoch timestamp of when the next online check is due.
+    check_file = linuxcord_paths.update_check_file
+    tmp_path = check_file.with_name(f".{check_file.name}.{os.getpid()}")
+    _ = tmp_path.write_text(f"{int(now + interval)}\n")
+    _ = tmp_path.replace(check_file)
+
+
+def _record_update_check(linuxcord_paths: LinuxcordPaths) -> None:
+    now = time.time()
+    _schedule_next_check(linuxcord_paths, now)
+    ManifestStore(linuxcord_paths).record_online_check(now)
+
+
+def _check_before_launch(
+    linuxcord_paths: LinuxcordPaths,
+    online_versioner: OnlineVersioner,
+    budget: float,
+) -> DiscordVersion | None:
+    """The latest version, or None when it cannot be had within ``budget``.
+
+    A failed check is remembered, and launches in the following
+    ``OFFLINE_RETRY_INTERVAL`` start the installed version without trying.
+    """
+
+    manifest_store = ManifestStore(linuxcord_paths)
+    now = time.time()
+    offline = manifest_store.load(files=False).last_offline_check
+    if offline is not None and 0 <= now - offline < OFFLINE_RETRY_INTERVAL:
+        logger.info("Offline as of %s; not checking for updates", time.ctime(offline))
+        return None
+    latest_version = online_versioner.get_latest_version_within(budget)
+    if latest_version is None:
+        logger.warning("Could not reach Discord; starting the installed version")
+        manifest_store.record_offline_check(now)
+        # Also lets the desktop launcher script skip linuxcord until then.
+        _schedule_next_check(linuxcord_paths, now, OFFLINE_RETRY_INTERVAL)
+    return latest_version
+
+
+def _current_path(linuxcord_paths: LinuxcordPaths) -> Path | None:
+    symlink = linuxcord_paths.discord_current_version_dir_symlink
+    return symlink.resolve(strict=False) if symlink.exists() else None
+
+
+def _locales_differ(
+    linuxcord_paths: LinuxcordPaths,
+    version: DiscordVersion,
+    keep_locales: tuple[str, ...] | None,
+) -> bool:
+    if linuxcord_paths.store_dir is not None:
+        # Shared installs keep whatever their installer selected.
+        return False
+    record = ManifestStore(linuxcord_paths).load(files=False).install_record(version)
+    return record is not None and record.locales != keep_locales
+
+
+def _refresh_desktop(
+    linuxcord_paths: LinuxcordPaths,
+    installed_version: DiscordVersion | None,
+    durable: bool,
+) -> None:
+    """Rewrite the desktop entry and launcher script if they are out of date.
+
+    Updates that install nothing still reach here, so a deleted script or
+    one written with other options (``--store``, ``--durable``) is put right.
+    """
+
+    if installed_version is None:
+        return
+    desktop = FreeDesktop(linuxcord_paths, durable)
+    if not desktop.is_current():
+        logger.info("Rewriting the desktop entry and launcher script")
+        _ = desktop.create_desktop_entry()
+        _ = desktop.create_application_symlink()
+
+
+def _forget_missing_installs(linuxcord_paths: LinuxcordPaths) -> None:
+    manifest_store = ManifestStore(linuxcord_paths)
+    for record in list(manifest_store.load(files=False).installs.values()):
+        if not linuxcord_paths.discord_paths(record.version).dir.exists():
+            logger.info("Forgetting the vanished install of %s", record.version.string)
+            manifest_store.forget_install(record.version)
+
+
+def _collect_garbage(linuxcord_paths: LinuxcordPaths) -> None:
+    """Start deleting what interrupted installs and deletions left behind.
+
+    Called without the install lock held. Unfinished staging trees are
+    only moved to the trash if the lock can be had exclusively at once,
+    so no running install loses its tree and nothing waits for one.
+    """
+
+    try:
+        with linuxcord_paths.acquire_lock("exclusive", 0):
+            clean_staging(linuxcord_paths)
+    except LockTimeout:
+        logger.debug("An install is running; leaving the staging directory")
+    except OSError:
+        logger.warning("Could not clear the staging directory", exc_info=True)
+    leftovers = linuxcord_paths.pending_deletions()
+    if not leftovers:
+        return
+    try:
+        spawn_deleter(leftovers)
+    except OSError:
+        logger.warning("Could not start deleting old files", exc_info=True)
 
 
 def update(
     *,
     xdg: PyXDG | None = None,
+    store_dir: Path | None = None,
+    versions_root: Path | None = None,
     session: requests.Session | None = None,
     discord_tgz_url: str | None = None,
     discord_updates_url: str | None = None,
     force: bool = False,
+    lock_timeout: float | None = None,
+    retention: RetentionPolicy | None = None,
+    version: DiscordVersion | None = None,
+    version_url_template: str | None = None,
+    pin: bool = False,
+    durable: bool = False,
+    keep_locales: Sequence[str] | None = None,
 ) -> UpdateResult:
-    linuxcord_paths = _build_paths(xdg)
-    linuxcord_paths.ensure_base_dirs()
-    lock = linuxcord_paths.acquire_lock()
-    try:
-        logger.debug("Starting update process")
-        session = session or requests.Session()
-        discord_tgz_url = discord_tgz_url or DEFAULT_DISCORD_TGZ_URL
-        discord_updates_url = discord_updates_url or DEFAULT_UPDATES_URL
+    """Install the latest Discord, or exactly ``version`` when given.
 
-        local_versioner = LocalVersioner(linuxcord_paths)
-        installed_version = local_versioner.get_current_version()
+    With ``pin`` the resulting install is pinned, as by ``pin()``. With
+    ``durable`` the install is flushed to disk before it is switched to
+    (see ``DiscordInstaller``). ``keep_locales`` saves which locales to
+    extract from now on, an empty list meaning all of them; an install
+    extracted with another selection is replaced.
+    """
 
-        online_versioner = OnlineVersioner(
-            discord_tgz_url, discord_updates_url, session
-        )
-        latest_version = online_versioner.get_latest_version()
-
-        logger.info(
-            "Installed version: %s",
-            installed_version.string if installed_version else "none",
-        )
-        logger.info(
-            "Latest available version: %s",
-            latest_version.string if latest_version else "unknown",
+    linuxcord_paths = _build_paths(xdg, store_dir, versions_root)
+    linuxcord_paths.ensure_base_dirs()
+    mode: LockMode = "exclusive" if force else "shared"
+    with linuxcord_paths.acquire_lock(mode, lock_timeout) as lock:
+        if keep_locales is not None:
+            ManifestStore(linuxcord_paths).record_keep_locales(
+                locale_selection(keep_locales) if keep_locales else None
+            )
+        result = _update(
+            linuxcord_paths,
+            lock,
+            session=session,
+            discord_tgz_url=discord_tgz_url,
+            discord_updates_url=discord_updates_url,
+            force=force,
+            retention=retention,
+            version=version,
+            version_url_template=version_url_template,
+            pin=pin,
+            durable=durable,
         )
+        register_store_user(linuxcord_paths)
+    _collect_garbage(linuxcord_paths)
+    return result
 
-        needs_install = installed_version is None
-        needs_update = (
-            latest_version is not None and installed_version != latest_version
-        )
 
-        if not force and not needs_install and not needs_update:
-            current_path = (
-                linuxcord_paths.discord_current_version_dir_symlink.resolve(
-                    strict=False
-                )
-                if linuxcord_paths.discord_current_version_dir_symlink.exists()
-                else None
-            )
-            return UpdateResult(installed_version, latest_version, False, current_path)
+def _update(
+    linuxcord_paths: LinuxcordPaths,
+    lock: InstallLock,
+    *,
+    session: requests.Session | None,
+    discord_tgz_url: str | None,
+    discord_updates_url: str | None,
+    force: bool,
+    retention: RetentionPolicy | None = None,
+    version: DiscordVersion | None = None,
+    version_url_template: str | None = None,
+    pin: bool = False,
+    durable: bool = False,
+    check_timeout: float | None = None,
+) -> UpdateResult:
+    logger.debug("Starting update process")
+    session = session or requests.Session()
+    discord_tgz_url = discord_tgz_url or DEFAULT_DISCORD_TGZ_URL
+    discord_updates_url = discord_updates_url or DEFAULT_UPDATES_URL
 
-        if latest_version is None and not force:
-            current_path = (
-                linuxcord_paths.discord_current_version_dir_symlink.resolve(
-                    strict=False
-                )
-                if linuxcord_paths.discord_current_version_dir_symlink.exists()
-                else None
+    local_versioner = LocalVersioner(linuxcord_paths)
+    installed_version = local_versioner.get_current_version()
+    manifest = ManifestStore(linuxcord_paths).load(files=False)
+    pinned = manifest.pinned
+    keep_locales = manifest.keep_locales
+    # Recorded as current, but the current link leads nowhere: the versions
+    # directory was wiped (a reimage, a tmp cleaner) or moved.
+    stranded = manifest.current if installed_version is None else None
+    if stranded is not None:
+        logger.warning("The current install of %s is missing", stranded.string)
+    # Extracted with another locale selection than the one now saved.
+    relocalise = installed_version is not None and _locales_differ(
+        linuxcord_paths, installed_version, keep_locales
+    )
+    if version is None and pinned is not None:
+        if not force and stranded is None and not relocalise:
+            # Nothing to look up while pinned, so skip the network entirely.
+            logger.info("Discord is pinned to %s; not updating", pinned.string)
+            _schedule_next_check(linuxcord_paths, time.time())
+            _refresh_desktop(linuxcord_paths, installed_version, durable)
+            return UpdateResult(
+                installed_version, None, False, _current_path(linuxcord_paths)
             )
-            return UpdateResult(installed_version, latest_version, False, current_path)
-
-        if latest_version is None:
-            raise RuntimeError("Cannot determine the latest Discord version to install")
+        # A forced reinstall (e.g. a repair) or one replacing a wiped install
+        # must not leave the pinned build.
+        version = pinned
+    elif version is None and stranded is not None:
+        if linuxcord_paths.discord_paths(stranded).executable.exists():
+            # Still on disk where the versions directory is now, so only the
+            # link needs redoing; the next check updates as usual.
+            version = stranded
 
-        installer = DiscordInstaller(linuxcord_paths, session)
-        download_url = online_versioner.get_latest_download_url()
+    online_versioner = OnlineVersioner(
+        discord_tgz_url, discord_updates_url, session, version_url_template
+    )
+    if version is not None:
+        # An exact build is fetched from its own CDN path, without asking the
+        # updates API or following the download redirects.
+        latest_version = None
+        target_version = version
+    elif check_timeout is not None and installed_version is not None:
+        latest_version = _check_before_launch(
+            linuxcord_paths, online_versioner, check_timeout
+        )
+        target_version = latest_version
+    else:
+        latest_version = online_versioner.get_latest_version()
         target_version = latest_version
 
-        discord_paths = installer.install(target_version, download_url, force=force)
-        installer.link_current(target_version)
-        installer.prune_old_versions(target_version)
+    logger.info(
+        "Installed version: %s",
+        installed_version.string if installed_version else "none",
+    )
+    logger.info(
+        "%s version: %s",
+        "Requested" if version else "Latest available",
+        target_version.string if target_version else "unknown",
+    )
 
-        desktop = FreeDesktop(linuxcord_paths)
-        _ = desktop.create_desktop_entry()
-        _ = desktop.create_application_symlink()
+    if not force and relocalise and installed_version == target_version:
+        logger.info("Reinstalling Discord to apply the locale selection")
+        force = True
 
+    if not force and (target_version is None or installed_version == target_version):
+        if latest_version is not None:
+            _record_update_check(linuxcord_paths)
+        if pin and installed_version is not None:
+            ManifestStore(linuxcord_paths).record_pin(installed_version)
+        _refresh_desktop(linuxcord_paths, installed_version, durable)
         return UpdateResult(
-            target_version, latest_version or target_version, True, discord_paths.dir
+            installed_version, latest_version, False, _current_path(linuxcord_paths)
         )
-    finally:
-        lock.release()
+
+    if target_version is None:
+        raise RuntimeError("Cannot determine the latest Discord version to install")
+
+    if lock.mode != "exclusive":
+        lock.upgrade()
+        # Another process may have installed while the lock was being upgraded.
+        installed_version = local_versioner.get_current_version()
+        if not force and installed_version == target_version:
+            logger.info("Discord %s was installed concurrently", target_version.string)
+            if latest_version is not None:
+                _record_update_check(linuxcord_paths)
+            _refresh_desktop(linuxcord_paths, installed_version, durable)
+            return UpdateResult(
+                installed_version,
+                latest_version,
+                False,
+                _current_path(linuxcord_paths),
+            )
+
+    if stranded is not None:
+        _forget_missing_installs(linuxcord_paths)
+    installer = DiscordInstaller(linuxcord_paths, session, durable)
+    discord_paths = linuxcord_paths.discord_paths(target_version)
+    reuse = not force and discord_paths.executable.exists()
+    if reuse and _locales_differ(linuxcord_paths, target_version, keep_locales):
+        logger.info("Not reusing %s: other locales were kept", target_version.string)
+        reuse, force = False, True
+    if reuse and not _adopt_install(linuxcord_paths, installer, target_version):
+        logger.warning("Existing install of %s is damaged", target_version.string)
+        reuse, force = False, True
+    if reuse:
+        # Kept from before a rollback, or installed into the shared store by
+        # another user; either way no download is needed.
+        logger.info("Reusing the existing install of %s", target_version.string)
+    else:
+        download_url = (
+            online_versioner.get_version_download_url(target_version)
+            if version is not None
+            else online_versioner.get_latest_download_url()
+        )
+        discord_paths = installer.install(
+            target_version, download_url, force=force, keep_locales=keep_locales
+        )
+    installer.link_current(target_version)
+    if pin or (pinned is not None and pinned != target_version):
+        ManifestStore(linuxcord_paths).record_pin(target_version)
+    _ = installer.prune_old_versions(target_version, retention)
+
+    desktop = FreeDesktop(linuxcord_paths, durable)
+    _ = desktop.create_desktop_entry()
+    _ = desktop.create_application_symlink()
+    if latest_version is not None:
+        _record_update_check(linuxcord_paths)
+    else:
+        _schedule_next_check(linuxcord_paths, time.time())
+
+    return UpdateResult(
+        target_version, latest_version or target_version, True, discord_paths.dir
+    )
 
 
 def status(
     *,
     xdg: PyXDG | None = None,
+    store_dir: Path | None = None,
+    versions_root: Path | None = None,
     session: requests.Session | None = None,
     discord_updates_url: str | None = None,
 ) -> UpdateResult:
-    linuxcord_paths = _build_paths(xdg)
+    linuxcord_paths = _build_paths(xdg, store_dir, versions_root)
     linuxcord_paths.ensure_base_dirs()
     local_versioner = LocalVersioner(linuxcord_paths)
     session = session or requests.Session()
@@ -144,33 +448,648 @@ def status(
 def run(
     *,
     xdg: PyXDG | None = None,
+    store_dir: Path | None = None,
+    versions_root: Path | None = None,
     session: requests.Session | None = None,
     discord_tgz_url: str | None = None,
     discord_updates_url: str | None = None,
     no_update: bool = False,
+    launch_mode: LaunchMode = "popen",
+    verify_install: bool = False,
+    lock_timeout: float | None = None,
+    retention: RetentionPolicy | None = None,
+    prewarm_patterns: Sequence[str] | None = None,
+    mirror: bool = False,
+    durable: bool = False,
+    check_timeout: float | None = None,
+    limits: ResourceLimits | None = None,
 ) -> None:
-    linuxcord_paths = _build_paths(xdg)
+    """Update if needed, then start Discord.
+
+    With ``check_timeout``, an installed Discord is started after at most
+    that many seconds of looking for updates, and is started straight away
+    for a while after a check that found Discord unreachable.
+
+    With ``prewarm_patterns``, the matching files of the install are read
+    into the page cache while Discord starts (see ``linuxcord.prewarm``).
+    With ``mirror``, Discord starts from a copy in the runtime directory
+    (see ``linuxcord.mirror``). With ``limits``, it runs under those
+    resource controls (see ``linuxcord.limits``).
+    """
+
+    linuxcord_paths = _build_paths(xdg, store_dir, versions_root)
     linuxcord_paths.ensure_base_dirs()
+    # Asked before taking the lock, which the daemon may need exclusively.
+    checked = not no_update and _daemon_ready(linuxcord_paths, lock_timeout)
+    if not no_update and not checked:
+        # Before the shared lock below, which would keep out the exclusive
+        # one that staging is swept under.
+        _collect_garbage(linuxcord_paths)
+
+    # Held shared until Discord has started so its install is not pruned from
+    # under it. The descriptor is close-on-exec, so exec mode drops it.
+    try:
+        with linuxcord_paths.acquire_lock("shared", lock_timeout) as lock:
+            if not no_update and not checked:
+                _ = _update(
+                    linuxcord_paths,
+                    lock,
+                    session=session,
+                    discord_tgz_url=discord_tgz_url,
+                    discord_updates_url=discord_updates_url,
+                    force=False,
+                    retention=retention,
+                    durable=durable,
+                    check_timeout=check_timeout,
+                )
+                register_store_user(linuxcord_paths)
 
-    if not no_update:
-        _ = update(
-            xdg=xdg,
+            if verify_install:
+                try:
+                    result = _verify(
+                        linuxcord_paths,
+                        lock,
+                        session=session,
+                        discord_tgz_url=discord_tgz_url,
+                        discord_updates_url=discord_updates_url,
+                        full=False,
+                        repair=not no_update,
+                        durable=durable,
+                    )
+                except LookupError:
+                    logger.warning("Skipping verification", exc_info=True)
+                else:
+                    if not result.ok:
+                        damaged = ", ".join(result.damaged)
+                        raise RuntimeError(f"Discord install is damaged: {damaged}")
+
+            lock.downgrade()
+            _launch_current(
+                linuxcord_paths, launch_mode, prewarm_patterns, mirror, limits
+            )
+            return
+    except LockTimeout:
+        # Another process is installing; the current symlink is only ever
+        # swapped atomically, so whatever it points at now is safe to start.
+        logger.warning("Another update is in progress; launching the installed version")
+    _launch_current(linuxcord_paths, launch_mode, prewarm_patterns, mirror, limits)
+
+
+def _daemon_ready(linuxcord_paths: LinuxcordPaths, timeout: float | None) -> bool:
+    """Whether a running daemon has checked for updates on our behalf."""
+
+    socket_path = linuxcord_paths.daemon_socket
+    if socket_path is None or not socket_path.exists():
+        return False
+    request = {"command": "ready", "install_dir": str(linuxcord_paths.install_dir)}
+    reply = ask_daemon(socket_path, request, timeout)
+    if reply is None:
+        logger.info("The daemon did not answer; checking for updates here")
+        return False
+    if "error" in reply:
+        logger.info("The daemon could not prepare Discord: %s", reply["error"])
+        return False
+    logger.debug("The daemon has Discord %s ready", reply.get("version"))
+    return True
+
+
+def serve_daemon(
+    *,
+    xdg: PyXDG | None = None,
+    store_dir: Path | None = None,
+    versions_root: Path | None = None,
+    session: requests.Session | None = None,
+    discord_tgz_url: str | None = None,
+    discord_updates_url: str | None = None,
+    lock_timeout: float | None = None,
+    retention: RetentionPolicy | None = None,
+    durable: bool = False,
+) -> None:
+    """Keep Discord updated and serve ``run`` until stopped.
+
+    See ``linuxcord.daemon.LinuxcordDaemon``.
+    """
+
+    linuxcord_paths = _build_paths(xdg, store_dir, versions_root)
+    linuxcord_paths.ensure_base_dirs()
+    # One session for the daemon's lifetime, so its connections stay pooled.
+    session = session or requests.Session()
+
+    def check() -> None:
+        with linuxcord_paths.acquire_lock("shared", lock_timeout) as lock:
+            _ = _update(
+                linuxcord_paths,
+                lock,
+                session=session,
+                discord_tgz_url=discord_tgz_url,
+                discord_updates_url=discord_updates_url,
+                force=False,
+                retention=retention,
+                durable=durable,
+            )
+            register_store_user(linuxcord_paths)
+        _collect_garbage(linuxcord_paths)
+
+    LinuxcordDaemon(linuxcord_paths, check, UPDATE_CHECK_INTERVAL).serve_forever()
+
+
+def _launch_current(
+    linuxcord_paths: LinuxcordPaths,
+    launch_mode: LaunchMode,
+    prewarm_patterns: Sequence[str] | None = None,
+    mirror: bool = False,
+    limits: ResourceLimits | None = None,
+) -> None:
+    local_versioner = LocalVersioner(linuxcord_paths)
+    current_version = local_versioner.get_current_version()
+    if current_version is None:
+        raise RuntimeError("Discord is not installed. Run 'linuxcord update' first.")
+    launcher = DiscordLauncher(
+        linuxcord_paths,
+        prewarm_patterns=prewarm_patterns,
+        mirror=mirror,
+        limits=limits,
+    )
+    launcher.launch(current_version, mode=launch_mode)
+
+
+def prewarm(
+    *,
+    xdg: PyXDG | None = None,
+    store_dir: Path | None = None,
+    versions_root: Path | None = None,
+    patterns: Sequence[str] = DEFAULT_PREWARM_PATTERNS,
+) -> PrewarmResult:
+    """Start reading the current install's hot files into the page cache."""
+
+    linuxcord_paths = _build_paths(xdg, store_dir, versions_root)
+    current_version = LocalVersioner(linuxcord_paths).get_current_version()
+    if current_version is None:
+        raise RuntimeError("Discord is not installed. Run 'linuxcord update' first.")
+    install_dir = linuxcord_paths.discord_paths(current_version).dir
+    return prewarm_install(install_dir, patterns)
+
+
+def verify(
+    *,
+    xdg: PyXDG | None = None,
+    store_dir: Path | None = None,
+    versions_root: Path | None = None,
+    session: requests.Session | None = None,
+    discord_tgz_url: str | None = None,
+    discord_updates_url: str | None = None,
+    full: bool = False,
+    repair: bool = False,
+    durable: bool = False,
+) -> VerifyResult:
+    linuxcord_paths = _build_paths(xdg, store_dir, versions_root)
+    linuxcord_paths.ensure_base_dirs()
+    with linuxcord_paths.acquire_lock("shared") as lock:
+        return _verify(
+            linuxcord_paths,
+            lock,
             session=session,
             discord_tgz_url=discord_tgz_url,
             discord_updates_url=discord_updates_url,
+            full=full,
+            repair=repair,
+            durable=durable,
         )
 
-    local_versioner = LocalVersioner(linuxcord_paths)
-    current_version = local_versioner.get_current_version()
+
+def _verify(
+    linuxcord_paths: LinuxcordPaths,
+    lock: InstallLock,
+    *,
+    session: requests.Session | None,
+    discord_tgz_url: str | None,
+    discord_updates_url: str | None,
+    full: bool,
+    repair: bool,
+    durable: bool = False,
+) -> VerifyResult:
+    current_version = LocalVersioner(linuxcord_paths).get_current_version()
     if current_version is None:
         raise RuntimeError("Discord is not installed. Run 'linuxcord update' first.")
-    launcher = DiscordLauncher(linuxcord_paths)
-    launcher.launch(current_version)
 
+    verifier = InstallVerifier(linuxcord_paths)
+    result = verifier.verify(current_version, full=full)
+    if result.ok or not repair:
+        return result
+
+    if lock.mode != "exclusive":
+        lock.upgrade()
+        # Someone else may have repaired or replaced the install meanwhile.
+        current_version = LocalVersioner(linuxcord_paths).get_current_version()
+        if current_version is None:
+            return result
+        result = verifier.verify(current_version, full=full)
+        if result.ok:
+            return result
+
+    try:
+        return verifier.repair(result)
+    except (LookupError, OSError, ValueError, EOFError, zlib.error):
+        logger.warning("Could not repair from the cached tarball", exc_info=True)
+
+    logger.warning(
+        "Reinstalling Discord to repair %d damaged files", len(result.damaged)
+    )
+    repaired = _update(
+        linuxcord_paths,
+        lock,
+        session=session,
+        discord_tgz_url=discord_tgz_url,
+        discord_updates_url=discord_updates_url,
+        force=True,
+        durable=durable,
+    )
+    if repaired.installed_version is None:
+        return result
+    return verifier.verify(repaired.installed_version)
+
+
+def list_versions(
+    *,
+    xdg: PyXDG | None = None,
+    store_dir: Path | None = None,
+    versions_root: Path | None = None,
+) -> list[InstalledVersion]:
+    linuxcord_paths = _build_paths(xdg, store_dir, versions_root)
+    local_versioner = LocalVersioner(linuxcord_paths)
+    manifest = ManifestStore(linuxcord_paths).load(files=False)
+    current = local_versioner.get_current_version()
+    installs: list[InstalledVersion] = []
+    for version in local_versioner.installed_versions():
+        record = manifest.install_record(version)
+        installs.append(
+            InstalledVersion(
+                version,
+                linuxcord_paths.discord_paths(version).dir,
+                record.installed_at if record else None,
+                current=version == current,
+                pinned=version == manifest.pinned,
+            )
+        )
+    return installs
+
+
+def rollback(
+    *,
+    xdg: PyXDG | None = None,
+    store_dir: Path | None = None,
+    versions_root: Path | None = None,
+    version: DiscordVersion | None = None,
+    pin: bool = True,
+    lock_timeout: float | None = None,
+    durable: bool = False,
+) -> DiscordVersion:
+    """Point ``current`` at a retained install without downloading anything.
+
+    Without ``version`` this picks the newest install older than the current
+    one. The target is pinned unless ``pin`` is false, so the next update
+    does not move straight back to the latest build.
+    """
+
+    linuxcord_paths = _build_paths(xdg, store_dir, versions_root)
+    linuxcord_paths.ensure_base_dirs()
+    with linuxcord_paths.acquire_lock("exclusive", lock_timeout):
+        local_versioner = LocalVersioner(linuxcord_paths)
+        installed = local_versioner.installed_versions()
+        current = local_versioner.get_current_version()
+        if version is None:
+            older = [v for v in installed if current is None or v < current]
+            if not older:
+                raise LookupError("No earlier Discord install to roll back to")
+            version = older[-1]
+        _check_installed(linuxcord_paths, version, installed)
+
+        if version != current:
+            installer = DiscordInstaller(linuxcord_paths, requests.Session(), durable)
+            if not _adopt_install(linuxcord_paths, installer, version):
+                raise LookupError(f"The Discord {version.string} install is damaged")
+            installer.link_current(version)
+            logger.info("Rolled back to Discord %s", version.string)
+        if pin:
+            ManifestStore(linuxcord_paths).record_pin(version)
+        register_store_user(linuxcord_paths)
+    return version
+
+
+def pin(
+    *,
+    xdg: PyXDG | None = None,
+    store_dir: Path | None = None,
+    versions_root: Path | None = None,
+    version: DiscordVersion | None = None,
+    lock_timeout: float | None = None,
+) -> DiscordVersion:
+    """Stop updates from moving past ``version`` (default: the current one)."""
+
+    linuxcord_paths = _build_paths(xdg, store_dir, versions_root)
+    linuxcord_paths.ensure_base_dirs()
+    with linuxcord_paths.acquire_lock("exclusive", lock_timeout):
+        local_versioner = LocalVersioner(linuxcord_paths)
+        version = version or local_versioner.get_current_version()
+        if version is None:
+            raise LookupError("Discord is not installed. Run 'linuxcord update' first.")
+        _check_installed(linuxcord_paths, version, local_versioner.installed_versions())
+        ManifestStore(linuxcord_paths).record_pin(version)
+        register_store_user(linuxcord_paths)
+    return version
+
+
+def unpin(
+    *,
+    xdg: PyXDG | None = None,
+    store_dir: Path | None = None,
+    versions_root: Path | None = None,
+    lock_timeout: float | None = None,
+) -> DiscordVersion | None:
+    """Clear the pin, returning the version that was pinned."""
+
+    linuxcord_paths = _build_paths(xdg, store_dir, versions_root)
+    linuxcord_paths.ensure_base_dirs()
+    with linuxcord_paths.acquire_lock("exclusive", lock_timeout):
+        store = ManifestStore(linuxcord_paths)
+        pinned = store.load(files=False).pinned
+        if pinned is not None:
+            store.record_pin(None)
+            register_store_user(linuxcord_paths)
+    return pinned
+
+
+def _check_installed(
+    linuxcord_paths: LinuxcordPaths,
+    version: DiscordVersion,
+    installed: list[DiscordVersion],
+) -> None:
+    if version not in installed:
+        raise LookupError(f"Discord {version.string} is not installed")
+    if not linuxcord_paths.discord_paths(version).executable.exists():
+        raise LookupError(f"The Discord {version.string} install is incomplete")
+
+
+@dataclass
+class FleetResult:
+    data_dir: Path
+    result: UpdateResult | None = None
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
 
-def uninstall(*, xdg: PyXDG | None = None) -> None:
-    linuxcord_paths = _build_paths(xdg)
+
+def fleet_update(
+    profiles: Sequence[PyXDG],
+    *,
+    session: requests.Session | None = None,
+    discord_tgz_url: str | None = None,
+    discord_updates_url: str | None = None,
+    version: DiscordVersion | None = None,
+    version_url_template: str | None = None,
+    pin: bool = False,
+    lock_timeout: float | None = None,
+    retention: RetentionPolicy | None = None,
+    max_workers: int = FLEET_WORKERS,
+    durable: bool = False,
+) -> list[FleetResult]:
+    """Bring many profiles to one Discord version, downloading it once.
+
+    The version is resolved once and installed into the first profile not
+    pinned elsewhere; the others get clones of that tree (see ``DiscordInstaller.install_clone``),
+    ``max_workers`` at a time. Without an explicit ``version``, profiles
+    pinned to another version are left alone. Failures are reported per
+    profile rather than raised.
+    """
+
+    if not profiles:
+        return []
+    session = session or requests.Session()
+    online_versioner = OnlineVersioner(
+        discord_tgz_url or DEFAULT_DISCORD_TGZ_URL,
+        discord_updates_url or DEFAULT_UPDATES_URL,
+        session,
+        version_url_template,
+    )
+    if version is not None:
+        target_version = version
+        download_url = online_versioner.get_version_download_url(version)
+    else:
+        target_version = online_versioner.get_latest_version()
+        if target_version is None:
+            raise RuntimeError("Cannot determine the latest Discord version to install")
+        download_url = online_versioner.get_latest_download_url()
+
+    def update_profile(xdg: PyXDG, source: PyXDG | None) -> FleetResult:
+        linuxcord_paths = _build_paths(xdg)
+        fleet_result = FleetResult(linuxcord_paths.data_dir)
+        home = xdg.home if isinstance(xdg, HomeXDG) else None
+        try:
+            if home is not None:
+                _check_profile(home, linuxcord_paths)
+            fleet_result.result = _update_profile(
+                linuxcord_paths,
+                target_version,
+                session=session,
+                download_url=download_url,
+                source=_build_paths(source) if source is not None else None,
+                # A shared inode keeps one owner, who could rewrite the
+                # Discord every other owner runs.
+                hardlink=source is None or _owner(source) == _owner(xdg),
+                honour_pin=version is None,
+                pin=pin,
+                lock_timeout=lock_timeout,
+                retention=retention,
+                durable=durable,
+            )
+        except Exception as e:
+            logger.warning("Could not update %s", fleet_result.data_dir, exc_info=True)
+            fleet_result.error = e
+        if home is not None:
+            try:
+                _hand_over(home, linuxcord_paths)
+            except PermissionError as e:
+                logger.warning("Not handing over %s: %s", home, e)
+                fleet_result.error = fleet_result.error or e
+        return fleet_result
+
+    # Profiles are installed one at a time until one of them holds the
+    # target version (those before it are pinned elsewhere); the rest clone
+    # from that one.
+    results: list[FleetResult] = []
+    source: PyXDG | None = None
+    remaining = list(profiles)
+    while remaining and source is None:
+        xdg = remaining.pop(0)
+        result = update_profile(xdg, None)
+        results.append(result)
+        if not result.ok:
+            # Most likely the download failed, and would fail again for
+            # every other profile, so leave them alone.
+            results.extend(
+                FleetResult(_build_paths(other).data_dir, None, result.error)
+                for other in remaining
+            )
+            return results
+        if _build_paths(xdg).discord_paths(target_version).executable.exists():
+            source = xdg
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        results.extend(pool.map(update_profile, remaining, [source] * len(remaining)))
+    return results
+
+
+def _update_profile(
+    linuxcord_paths: LinuxcordPaths,
+    version: DiscordVersion,
+    *,
+    session: requests.Session,
+    download_url: str,
+    source: LinuxcordPaths | None,
+    hardlink: bool,
+    honour_pin: bool,
+    pin: bool,
+    lock_timeout: float | None,
+    retention: RetentionPolicy | None,
+    durable: bool = False,
+) -> UpdateResult:
+    linuxcord_paths.ensure_base_dirs()
+    with linuxcord_paths.acquire_lock("exclusive", lock_timeout) as lock:
+        pinned = ManifestStore(linuxcord_paths).load(files=False).pinned
+        if honour_pin and pinned is not None and pinned != version:
+            logger.info("%s is pinned to %s", linuxcord_paths.data_dir, pinned)
+            installed_version = LocalVersioner(linuxcord_paths).get_current_version()
+            return UpdateResult(
+                installed_version, version, False, _current_path(linuxcord_paths)
+            )
+        discord_paths = linuxcord_paths.discord_paths(version)
+        if not discord_paths.executable.exists():
+            installer = DiscordInstaller(linuxcord_paths, session, durable)
+            if source is None:
+                force = discord_paths.dir.exists()
+                keep_locales = (
+                    ManifestStore(linuxcord_paths).load(files=False).keep_locales
+                )
+                _ = installer.install(
+                    version, download_url, force=force, keep_locales=keep_locales
+                )
+            else:
+                _ = installer.install_clone(version, source, hardlink)
+        # The install is in place now, so this only links, prunes and
+        # refreshes the desktop integration.
+        result = _update(
+            linuxcord_paths,
+            lock,
+            session=session,
+            discord_tgz_url=None,
+            discord_updates_url=None,
+            force=False,
+            retention=retention,
+            version=version,
+            pin=pin,
+            durable=durable,
+        )
+    _collect_garbage(linuxcord_paths)
+    return result
+
+
+def _owner(xdg: PyXDG) -> int:
+    # Whose files a profile's installs end up as (see _hand_over).
+    if os.geteuid() == 0 and isinstance(xdg, HomeXDG) and xdg.home.exists():
+        return xdg.home.stat().st_uid
+    # Otherwise everything is created by, and stays with, whoever runs this.
+    return os.geteuid()
+
+
+def _check_profile(home: Path, linuxcord_paths: LinuxcordPaths) -> None:
+    """Refuse a profile whose owner could redirect linuxcord's writes.
+
+    Run as root, fleet-update creates and chowns everything through these
+    paths. A symlink, or a directory that is not the home owner's, on the
+    way from the home to them would let the owner aim that at files that
+    are not theirs. Raises PermissionError.
+    """
+
+    try:
+        owner = home.stat().st_uid
+    except FileNotFoundError:
+        # Created here, by whoever runs this; no one else has had a hand in it.
+        return
+    desktop = FreeDesktop(linuxcord_paths)
+    targets = (
+        linuxcord_paths.data_dir,
+        linuxcord_paths.cache_dir,
+        linuxcord_paths.state_dir,
+        desktop.application_symlink.parent,
+    )
+    for target in targets:
+        for path in (target, *target.parents):
+            if path == home or not path.is_relative_to(home):
+                break
+            try:
+                info = path.lstat()
+            except FileNotFoundError:
+                continue
+            if path.is_symlink():
+                raise PermissionError(f"{path} is a symlink; not touching {home}")
+            if info.st_uid != owner:
+                raise PermissionError(
+                    f"{path} does not belong to the owner of {home}; not touching it"
+                )
+    lock_file = linuxcord_paths.lock_file
+    if linuxcord_paths.store_dir is None and lock_file.is_symlink():
+        raise PermissionError(f"{lock_file} is a symlink; not touching {home}")
+
+
+def _hand_over(home: Path, linuxcord_paths: LinuxcordPaths) -> None:
+    """Give files created as root for another user's profile to that user.
+
+    The profile is checked again first (see ``_check_profile``), since its
+    owner may have changed it while it was being updated.
+    """
+
+    if os.geteuid() != 0:
+        return
+    _check_profile(home, linuxcord_paths)
+    stat = home.stat()
+    trees = (
+        linuxcord_paths.data_dir,
+        linuxcord_paths.cache_dir,
+        linuxcord_paths.state_dir,
+    )
+    for tree in trees:
+        if tree.exists():
+            chown_tree(tree, stat.st_uid, stat.st_gid)
+    # Plus the desktop entry link and any directories created on the way to
+    # these, such as ~/.local.
+    symlink = FreeDesktop(linuxcord_paths).application_symlink
+    created = {symlink, *symlink.parents}
+    for tree in trees:
+        created.update(tree.parents)
+    for path in created:
+        if path.is_relative_to(home) and path != home and os.path.lexists(path):
+            os.lchown(path, stat.st_uid, stat.st_gid)
+    # Usually in the user's runtime directory rather than the home; left to
+    # root, it would lock the user out of their own updates and launches.
+    lock_file = linuxcord_paths.lock_file
+    if linuxcord_paths.store_dir is None and lock_file.exists():
+        os.lchown(lock_file, stat.st_uid, stat.st_gid)
+
+
+def uninstall(
+    *,
+    xdg: PyXDG | None = None,
+    store_dir: Path | None = None,
+    versions_root: Path | None = None,
+) -> None:
+    linuxcord_paths = _build_paths(xdg, store_dir, versions_root)
     desktop = FreeDesktop(linuxcord_paths)
+    # The shared store itself stays; only this user's claim on it goes, so
+    # the versions they used can be pruned.
+    user_file = linuxcord_paths.store_user_file
+    if user_file is not None:
+        user_file.unlink(missing_ok=True)
 
     for path in (desktop.application_symlink, desktop.desktop_entry):
         try:
@@ -178,11 +1097,17 @@ def uninstall(*, xdg: PyXDG | None = None) -> None:
         except FileNotFoundError:
             pass
 
+    # Renamed aside first so uninstall returns at once; the (possibly large)
+    # trees are then deleted in the background.
+    trashed: list[Path] = []
     for directory in (
-        linuxcord_paths.discord_versions_dir,
+        linuxcord_paths.versions_root,
         linuxcord_paths.cache_dir,
         linuxcord_paths.state_dir,
         linuxcord_paths.data_dir,
     ):
-        shutil.rmtree(directory, ignore_errors=True)
+        if directory is not None and directory.exists():
+            trashed.append(move_to_trash(directory))
+    if trashed:
+        spawn_deleter(trashed)
     logger.info("Uninstalled linuxcord-managed files")
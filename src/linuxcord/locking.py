@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import fcntl
+import logging
+import os
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import Literal
+
+from typing_extensions import Self
+
+
+logger = logging.getLogger(__name__)
+LockMode = Literal["shared", "exclusive"]
+POLL_INTERVAL = 0.05
+
+
+class LockTimeout(TimeoutError):
+    """The install lock could not be acquired within the wait budget."""
+
+
+class InstallLock:
+    """Reader/writer lock around the Discord installs, built on flock(2).
+
+    Version checks and launches hold it shared so they never wait for one
+    another; installing, relinking and pruning need it exclusive. flock drops
+    a shared lock before granting the exclusive one, so after ``upgrade()``
+    callers must re-check whatever made them upgrade.
+
+    With a ``timeout``, each wait gives up after that many seconds and raises
+    LockTimeout with the lock fully released, since a failed upgrade has
+    already given up the shared lock.
+    """
+
+    def __init__(
+        self, lock_file: Path, timeout: float | None = None, file_mode: int = 0o600
+    ):
+        self.lock_file: Path = lock_file
+        self.timeout: float | None = timeout
+        self.file_mode: int = file_mode
+        self.mode: LockMode | None = None
+        self._fd: int | None = None
+
+    @property
+    def is_locked(self) -> bool:
+        return self.mode is not None
+
+    def acquire(self, mode: LockMode = "exclusive") -> Self:
+        if self._fd is None:
+            self.lock_file.parent.mkdir(parents=True, exist_ok=True)
+            # flock needs no write access, so a lock file shared between
+            # users only has to be readable by them.
+            self._fd = os.open(
+                self.lock_file, os.O_RDONLY | os.O_CREAT | os.O_CLOEXEC, self.file_mode
+            )
+        operation = fcntl.LOCK_SH if mode == "shared" else fcntl.LOCK_EX
+        logger.debug("Waiting for %s lock on %s", mode, self.lock_file)
+        try:
+            if self.timeout is None:
+                fcntl.flock(self._fd, operation)
+            else:
+                self._wait(self._fd, operation, self.timeout)
+        except BaseException:
+            self.release()
+            raise
+        self.mode = mode
+        return self
+
+    def _wait(self, fd: int, operation: int, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(fd, operation | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    waited = f"{timeout:g}s"
+                    raise LockTimeout(
+                        f"Timed out after {waited} waiting for {self.lock_file}"
+                    ) from None
+                time.sleep(min(POLL_INTERVAL, remaining))
+
+    def upgrade(self) -> None:
+        if self.mode != "exclusive":
+            _ = self.acquire("exclusive")
+
+    def downgrade(self) -> None:
+        if self.mode == "exclusive":
+            _ = self.acquire("shared")
+
+    def release(self) -> None:
+        if self._fd is not None:
+            # Closing the descriptor drops the flock.
+            os.close(self._fd)
+            self._fd = None
+        self.mode = None
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.release()
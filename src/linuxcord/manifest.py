@@ -0,0 +1,382 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from collections.abc import Generator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import cast
+
+from linuxcord.locking import InstallLock
+from linuxcord.paths import LinuxcordPaths
+from linuxcord.types import DiscordVersion
+
+
+logger = logging.getLogger(__name__)
+MANIFEST_FORMAT = 2
+# Format 1 kept every install's file records inline, in the one file.
+READABLE_FORMATS = (1, MANIFEST_FORMAT)
+HASH_CHUNK_SIZE = 1024 * 1024
+# Below this many bytes hashing on one thread is as quick as spreading it out.
+POOL_THRESHOLD_BYTES = 4 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class FileRecord:
+    size: int
+    mtime_ns: int
+    sha256: str
+
+
+@dataclass
+class InstallRecord:
+    version: DiscordVersion
+    installed_at: float
+    files: dict[str, FileRecord] = field(default_factory=dict)
+    # The locales extracted, or None for all of them.
+    locales: tuple[str, ...] | None = None
+
+    @property
+    def file_count(self) -> int:
+        return len(self.files)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(record.size for record in self.files.values())
+
+
+@dataclass
+class Manifest:
+    current: DiscordVersion | None = None
+    pinned: DiscordVersion | None = None
+    last_online_check: float | None = None
+    # When a pre-launch check last failed to reach Discord, if it has not
+    # succeeded since.
+    last_offline_check: float | None = None
+    installs: dict[str, InstallRecord] = field(default_factory=dict)
+    # Locales to extract from future installs, or None for all of them.
+    keep_locales: tuple[str, ...] | None = None
+
+    def install_record(self, version: DiscordVersion) -> InstallRecord | None:
+        return self.installs.get(version.string)
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_files(paths: Sequence[Path], max_workers: int | None = None) -> list[str]:
+    """Hash ``paths`` in order, spreading large batches over a thread pool.
+
+    hashlib and file reads release the GIL, so threads hash in parallel
+    without forking a process that may itself be running threads.
+    """
+
+    sizes = [path.stat().st_size for path in paths]
+    if len(paths) < 2 or sum(sizes) < POOL_THRESHOLD_BYTES or max_workers == 1:
+        return [hash_file(path) for path in paths]
+    workers = min(len(paths), max_workers or os.cpu_count() or 1)
+    # Biggest files first so one large file does not finish last on its own.
+    order = sorted(range(len(paths)), key=lambda i: sizes[i], reverse=True)
+    digests = [""] * len(paths)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for index, digest in zip(order, pool.map(hash_file, [paths[i] for i in order])):
+            digests[index] = digest
+    return digests
+
+
+def stat_record(path: Path, sha256: str) -> FileRecord:
+    stat = path.stat()
+    return FileRecord(stat.st_size, stat.st_mtime_ns, sha256)
+
+
+def scan_install(directory: Path) -> dict[str, FileRecord]:
+    """Hash every regular file below ``directory``, keyed by relative path."""
+
+    found: list[Path] = []
+    for root, _dirs, names in os.walk(directory):
+        for name in names:
+            path = Path(root) / name
+            if path.is_symlink() or not path.is_file():
+                continue
+            found.append(path)
+    return {
+        path.relative_to(directory).as_posix(): stat_record(path, digest)
+        for path, digest in zip(found, hash_files(found))
+    }
+
+
+def _install_to_json(record: InstallRecord) -> dict[str, object]:
+    raw: dict[str, object] = {"installed_at": record.installed_at}
+    if record.locales is not None:
+        raw["locales"] = list(record.locales)
+    return raw
+
+
+def _files_to_json(record: InstallRecord) -> dict[str, object]:
+    return {
+        "file_count": record.file_count,
+        "total_bytes": record.total_bytes,
+        "files": {
+            name: [file.size, file.mtime_ns, file.sha256]
+            for name, file in sorted(record.files.items())
+        },
+    }
+
+
+def _locales_from_json(raw: object) -> tuple[str, ...] | None:
+    if not isinstance(raw, list):
+        return None
+    return tuple(str(locale) for locale in cast(list[object], raw))
+
+
+def _files_from_json(raw: dict[str, object]) -> dict[str, FileRecord]:
+    files_raw = cast(dict[str, list[object]], raw["files"])
+    return {
+        name: FileRecord(int(cast(int, size)), int(cast(int, mtime)), str(digest))
+        for name, (size, mtime, digest) in files_raw.items()
+    }
+
+
+def _install_from_json(version: str, raw: dict[str, object]) -> InstallRecord:
+    return InstallRecord(
+        DiscordVersion(version),
+        float(cast(float, raw["installed_at"])),
+        # Only format 1 kept the file records here.
+        _files_from_json(raw) if "files" in raw else {},
+        _locales_from_json(raw.get("locales")),
+    )
+
+
+def _check_format(data: dict[str, object]) -> None:
+    if data.get("format") not in READABLE_FORMATS:
+        raise ValueError(f"Unsupported manifest format {data.get('format')!r}")
+
+
+def manifest_to_json(manifest: Manifest) -> dict[str, object]:
+    return {
+        "format": MANIFEST_FORMAT,
+        "current": manifest.current.string if manifest.current else None,
+        "pinned": manifest.pinned.string if manifest.pinned else None,
+        "last_online_check": manifest.last_online_check,
+        "last_offline_check": manifest.last_offline_check,
+        "keep_locales": (
+            list(manifest.keep_locales) if manifest.keep_locales is not None else None
+        ),
+        "installs": {
+            version: _install_to_json(record)
+            for version, record in sorted(manifest.installs.items())
+        },
+    }
+
+
+def files_to_json(manifest: Manifest) -> dict[str, object]:
+    return {
+        "format": MANIFEST_FORMAT,
+        "installs": {
+            version: _files_to_json(record)
+            for version, record in sorted(manifest.installs.items())
+        },
+    }
+
+
+def manifest_from_json(raw: object) -> Manifest:
+    data = cast(dict[str, object], raw)
+    _check_format(data)
+    current = data.get("current")
+    pinned = data.get("pinned")
+    last_online_check = data.get("last_online_check")
+    last_offline_check = data.get("last_offline_check")
+    installs_raw = cast(dict[str, dict[str, object]], data.get("installs") or {})
+    return Manifest(
+        current=DiscordVersion(current) if isinstance(current, str) else None,
+        pinned=DiscordVersion(pinned) if isinstance(pinned, str) else None,
+        last_online_check=(
+            float(last_online_check)
+            if isinstance(last_online_check, (int, float))
+            else None
+        ),
+        last_offline_check=(
+            float(last_offline_check)
+            if isinstance(last_offline_check, (int, float))
+            else None
+        ),
+        installs={
+            version: _install_from_json(version, record)
+            for version, record in installs_raw.items()
+        },
+        keep_locales=_locales_from_json(data.get("keep_locales")),
+    )
+
+
+def attach_files(manifest: Manifest, raw: object) -> None:
+    """Fill in the installs' file records from ``files_to_json`` output."""
+
+    data = cast(dict[str, object], raw)
+    _check_format(data)
+    installs_raw = cast(dict[str, dict[str, object]], data.get("installs") or {})
+    for version, record in manifest.installs.items():
+        if version in installs_raw:
+            record.files = _files_from_json(installs_raw[version])
+
+
+class ManifestStore:
+    """JSON record of installed versions, kept in the XDG state directory.
+
+    The per-file records of each install live in a second file beside it,
+    so launches read the current version, pin and check times without
+    parsing thousands of hashes. Every save replaces the files atomically,
+    so readers need no lock. Launches and checks change the manifest while
+    holding the install lock only shared, so each ``record_*`` load, change
+    and save happens under an exclusive lock of its own. A shared store
+    keeps its own manifest, passed as ``path``.
+    """
+
+    def __init__(self, linuxcord_paths: LinuxcordPaths, path: Path | None = None):
+        self._paths: LinuxcordPaths = linuxcord_paths
+        self._path: Path | None = path
+
+    @property
+    def path(self) -> Path:
+        return self._path or self._paths.manifest_file
+
+    @property
+    def files_path(self) -> Path:
+        return self.path.with_name(f"{self.path.stem}-files.json")
+
+    @property
+    def lock_file(self) -> Path:
+        return self.path.with_name(f".{self.path.name}.lock")
+
+    @contextmanager
+    def _editing(self, files: bool = False) -> Generator[Manifest]:
+        """The manifest to change, saved once the block completes.
+
+        Without ``files`` the file records are neither read nor rewritten.
+        """
+
+        with InstallLock(self.lock_file, file_mode=0o644).acquire():
+            if not self.files_path.exists():
+                # Written before the records had a file of their own (format
+                # 1), or not at all; either way they are split out now.
+                files = True
+            manifest = self.load(files)
+            yield manifest
+            self.save(manifest, files)
+
+    def _read(self, path: Path) -> object | None:
+        try:
+            return cast(object, json.loads(path.read_text()))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable manifest %s", path, exc_info=True)
+            return None
+
+    def load(self, files: bool = True) -> Manifest:
+        """The manifest, with each install's file records unless not ``files``."""
+
+        raw = self._read(self.path)
+        if raw is None:
+            return Manifest()
+        try:
+            manifest = manifest_from_json(raw)
+        except (AttributeError, KeyError, TypeError, ValueError):
+            logger.warning("Ignoring malformed manifest %s", self.path, exc_info=True)
+            return Manifest()
+        files_raw = self._read(self.files_path) if files else None
+        if files_raw is not None:
+            try:
+                attach_files(manifest, files_raw)
+            except (AttributeError, KeyError, TypeError, ValueError):
+                logger.warning(
+                    "Ignoring malformed manifest %s", self.files_path, exc_info=True
+                )
+        return manifest
+
+    def save(self, manifest: Manifest, files: bool = True) -> None:
+        # The records go first, so the manifest never lists an install whose
+        # records were not written.
+        if files:
+            self._write(self.files_path, files_to_json(manifest))
+        self._write(self.path, manifest_to_json(manifest))
+
+    def _write(self, path: Path, data: dict[str, object]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+        try:
+            # Readable by every user of a shared store.
+            os.fchmod(fd, 0o644)
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=1)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def record_install(
+        self,
+        version: DiscordVersion,
+        directory: Path,
+        locales: tuple[str, ...] | None = None,
+    ) -> InstallRecord:
+        record = InstallRecord(version, time.time(), scan_install(directory), locales)
+        self.add_install(record)
+        logger.debug(
+            "Recorded install of %s: %d files, %d bytes",
+            version.string,
+            record.file_count,
+            record.total_bytes,
+        )
+        return record
+
+    def add_install(self, record: InstallRecord) -> None:
+        with self._editing(files=True) as manifest:
+            manifest.installs[record.version.string] = record
+
+    def record_files(
+        self, version: DiscordVersion, files: dict[str, FileRecord]
+    ) -> None:
+        with self._editing(files=True) as manifest:
+            record = manifest.install_record(version)
+            if record is not None:
+                record.files.update(files)
+
+    def record_current(self, version: DiscordVersion) -> None:
+        with self._editing() as manifest:
+            manifest.current = version
+
+    def record_pin(self, version: DiscordVersion | None) -> None:
+        with self._editing() as manifest:
+            manifest.pinned = version
+
+    def record_keep_locales(self, locales: tuple[str, ...] | None) -> None:
+        with self._editing() as manifest:
+            manifest.keep_locales = locales
+
+    def record_online_check(self, when: float | None = None) -> None:
+        with self._editing() as manifest:
+            manifest.last_online_check = time.time() if when is None else when
+            manifest.last_offline_check = None
+
+    def record_offline_check(self, when: float | None = None) -> None:
+        with self._editing() as manifest:
+            manifest.last_offline_check = time.time() if when is None else when
+
+    def forget_install(self, version: DiscordVersion) -> None:
+        with self._editing(files=True) as manifest:
+            forgotten = manifest.installs.pop(version.string, None)
+            if forgotten is not None and manifest.current == version:
+                manifest.current = None
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+
+from linuxcord.fsutil import delete_tree
+from linuxcord.manifest import FileRecord, ManifestStore
+from linuxcord.paths import LinuxcordPaths
+from linuxcord.types import DiscordVersion
+
+
+logger = logging.getLogger(__name__)
+# Left free in the runtime directory so mirroring never fills it up.
+MIRROR_HEADROOM = 64 * 1024 * 1024
+
+
+@dataclass
+class MirrorResult:
+    path: Path
+    copied: int = 0
+    linked: int = 0
+    unchanged: int = 0
+    removed: int = 0
+
+
+def _same_file(stat: os.stat_result, other: os.stat_result) -> bool:
+    return stat.st_size == other.st_size and stat.st_mtime_ns == other.st_mtime_ns
+
+
+class InstallMirror:
+    """A copy of an install in the RAM-backed runtime directory.
+
+    For homes on slow or network storage: the first launch after boot
+    copies the install to tmpfs and later launches start from there. Each
+    pass only copies files whose size or mtime differ from the mirror.
+    Files unchanged since the previously mirrored version (by their recorded
+    hashes) are hardlinked from its mirror rather than read again from the
+    slow storage.
+    """
+
+    def __init__(self, linuxcord_paths: LinuxcordPaths):
+        self._paths: LinuxcordPaths = linuxcord_paths
+
+    def mirror(self, version: DiscordVersion) -> MirrorResult | None:
+        """Bring the mirror of ``version`` up to date.
+
+        Returns None, leaving nothing half-used, when there is no runtime
+        directory, it does not allow executables, or it lacks the space.
+        """
+
+        root = self._paths.mirror_dir
+        if root is None:
+            logger.info("No runtime directory to mirror Discord into")
+            return None
+        root.mkdir(parents=True, exist_ok=True)
+        usage = os.statvfs(root)
+        if usage.f_flag & os.ST_NOEXEC:
+            logger.info("Not mirroring Discord: %s is mounted noexec", root)
+            return None
+
+        source = self._paths.discord_paths(version).dir
+        target = root / version.string
+        pending = self._pending_bytes(source, target)
+        available = usage.f_bavail * usage.f_frsize - MIRROR_HEADROOM
+        if pending > available:
+            logger.warning(
+                "Not mirroring Discord: %d bytes needed, %d available in %s",
+                pending,
+                available,
+                root,
+            )
+            return None
+
+        result = self._sync(version, source, target)
+        for other in root.iterdir():
+            if other != target:
+                delete_tree(other)
+        logger.debug(
+            "Mirrored %s: %d copied, %d linked, %d unchanged, %d removed",
+            target,
+            result.copied,
+            result.linked,
+            result.unchanged,
+            result.removed,
+        )
+        return result
+
+    def _pending_bytes(self, source: Path, target: Path) -> int:
+        pending = 0
+        for root, _dirs, names in os.walk(source):
+            relative = Path(root).relative_to(source)
+            for name in names:
+                path = Path(root) / name
+                if path.is_symlink():
+                    continue
+                stat = path.stat()
+                try:
+                    if _same_file(stat, (target / relative / name).stat()):
+                        continue
+                except FileNotFoundError:
+                    pass
+                pending += stat.st_size
+        return pending
+
+    def _reusable(self, version: DiscordVersion) -> dict[str, Path]:
+        """Files of other mirrored versions identical to ``version``'s."""
+
+        root = self._paths.mirror_dir
+        manifest = ManifestStore(self._paths).load()
+        record = manifest.install_record(version)
+        if root is None or record is None:
+            return {}
+        reusable: dict[str, Path] = {}
+        for other_dir in root.iterdir():
+            try:
+                other = manifest.install_record(DiscordVersion(other_dir.name))
+            except ValueError:
+                continue
+            if other is None or other.version == version:
+                continue
+            for name, expected in record.files.items():
+                previous: FileRecord | None = other.files.get(name)
+                if previous is None or previous.sha256 != expected.sha256:
+                    continue
+                path = other_dir / name
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if (stat.st_size, stat.st_mtime_ns) == (
+                    previous.size,
+                    previous.mtime_ns,
+                ):
+                    _ = reusable.setdefault(name, path)
+        return reusable
+
+    def _sync(
+        self, version: DiscordVersion, source: Path, target: Path
+    ) -> MirrorResult:
+        result = MirrorResult(target)
+        reusable = self._reusable(version)
+        target.mkdir(exist_ok=True)
+        for root, dirs, names in os.walk(source):
+            relative = Path(root).relative_to(source)
+            target_root = target / relative
+            wanted = set(dirs) | set(names)
+            for existing in list(target_root.iterdir()):
+                if existing.name not in wanted:
+                    if existing.is_dir() and not existing.is_symlink():
+                        delete_tree(existing)
+                    else:
+                        existing.unlink()
+                    result.removed += 1
+            for name in dirs:
+                path = Path(root) / name
+                if path.is_symlink():
+                    self._sync_symlink(path, target_root / name)
+                else:
+                    (target_root / name).mkdir(exist_ok=True)
+            for name in names:
+                path = Path(root) / name
+                if path.is_symlink():
+                    self._sync_symlink(path, target_root / name)
+                    continue
+                destination = target_root / name
+                stat = path.stat()
+                try:
+                    if _same_file(stat, destination.stat()):
+                        result.unchanged += 1
+                        continue
+                except FileNotFoundError:
+                    pass
+                # Replaced by rename, so a Discord already running from the
+                # mirror keeps the file it has open.
+                tmp = destination.with_name(f".{name}.{os.getpid()}.tmp")
+                tmp.unlink(missing_ok=True)
+                shared = reusable.get((relative / name).as_posix())
+                if shared is not None:
+                    # Same content as in the previous version's mirror, which
+                    # is deleted after this pass; take over its inode.
+                    os.link(shared, tmp)
+                    os.utime(tmp, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+                    result.linked += 1
+                else:
+                    _ = shutil.copyfile(path, tmp)
+                    shutil.copystat(path, tmp)
+                    result.copied += 1
+                os.replace(tmp, destination)
+        return result
+
+    def _sync_symlink(self, source: Path, destination: Path) -> None:
+        link_target = os.readlink(source)
+        if destination.is_symlink() and os.readlink(destination) == link_target:
+            return
+        if destination.is_dir() and not destination.is_symlink():
+            delete_tree(destination)
+        else:
+            destination.unlink(missing_ok=True)
+        destination.symlink_to(link_target)
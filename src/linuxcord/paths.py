@@ -3,16 +3,63 @@ from __future__ import annotations
 import os
 from pathlib import Path
 
-from filelock import BaseFileLock, FileLock
-
+from linuxcord.locking import InstallLock, LockMode
 from linuxcord.types import DiscordVersion, PyXDG
 
 APP_NAME = "linuxcord"
 
 
+class HomeXDG:
+    """The XDG base directories of a home directory, at their defaults.
+
+    Used to manage profiles other than the caller's own. The runtime
+    directory is the home owner's, so locks are shared with that user's
+    own linuxcord processes.
+    """
+
+    def __init__(self, home: Path):
+        self.home: Path = home
+        self.xdg_data_home: str | None = str(home / ".local" / "share")
+        self.xdg_cache_home: str | None = str(home / ".cache")
+        self.xdg_state_home: str | None = str(home / ".local" / "state")
+
+    def save_data_path(self, xdg_dir_name: str) -> str:
+        path = Path(self.xdg_data_home or self.home) / xdg_dir_name
+        path.mkdir(parents=True, exist_ok=True)
+        return str(path)
+
+    def get_runtime_dir(self, strict: bool = True) -> str:
+        _ = strict
+        runtime_dir = Path("/run/user") / str(self.home.stat().st_uid)
+        if not runtime_dir.is_dir():
+            raise KeyError(f"{self.home} has no runtime directory")
+        return str(runtime_dir)
+
+
 class LinuxcordPaths:
-    def __init__(self, xdg: PyXDG):
+    """Where linuxcord keeps its files.
+
+    With a ``store_dir``, Discord installs, their cached tarballs and the
+    install lock live in that shared directory instead, so every user on
+    the machine uses one copy of each version. The ``current`` symlink,
+    the manifest and the desktop files stay per-user.
+
+    A ``versions_root`` does the same for one user only, typically to keep
+    the large trees on a local disk when the home directory is on network
+    storage.
+    """
+
+    def __init__(
+        self,
+        xdg: PyXDG,
+        store_dir: Path | None = None,
+        versions_root: Path | None = None,
+    ):
+        if store_dir is not None and versions_root is not None:
+            raise ValueError("A shared store and a versions root are exclusive")
         self._xdg: PyXDG = xdg
+        self.store_dir: Path | None = store_dir
+        self.versions_root: Path | None = versions_root
 
     @property
     def data_dir(self) -> Path:
@@ -37,10 +84,80 @@ class LinuxcordPaths:
     def discord_versions_dir(self) -> Path:
         return self.data_dir / "versions"
 
+    @property
+    def install_dir(self) -> Path:
+        """The directory holding one subdirectory per installed version."""
+
+        if self.store_dir is not None:
+            return self.store_dir / "versions"
+        if self.versions_root is not None:
+            return self.versions_root / "versions"
+        return self.discord_versions_dir
+
     @property
     def discord_current_version_dir_symlink(self) -> Path:
         return self.discord_versions_dir / "current"
 
+    @property
+    def trash_dir(self) -> Path:
+        # Beside the installs so moving one there is a rename.
+        return self.install_dir / ".trash"
+
+    @property
+    def staging_dir(self) -> Path:
+        # Same filesystem as the installs, so finished trees are renamed in.
+        return self.install_dir / ".staging"
+
+    def pending_deletions(self) -> list[Path]:
+        """Trash left behind by deletions that were interrupted.
+
+        Entries this user cannot remove, such as another user's in a shared
+        store, are left out so no deleter is started just to fail on them.
+        """
+
+        found: list[Path] = []
+        if self.trash_dir.is_dir():
+            found.extend(self.trash_dir.iterdir())
+        directories = [self.data_dir, self.cache_dir, self.state_dir]
+        if self.versions_root is not None:
+            # Trashed beside itself by ``uninstall``.
+            directories.append(self.versions_root)
+        for directory in directories:
+            found.extend(directory.parent.glob(f".{directory.name}.*.deleting"))
+        return [path for path in found if _deletable(path)]
+
+    @property
+    def tarball_cache_dir(self) -> Path:
+        if self.store_dir is not None:
+            return self.store_dir / "tarballs"
+        if self.versions_root is not None:
+            return self.versions_root / "tarballs"
+        return self.cache_dir / "tarballs"
+
+    @property
+    def manifest_file(self) -> Path:
+        return self.state_dir / "manifest.json"
+
+    @property
+    def store_manifest_file(self) -> Path | None:
+        # Hashes recorded by whichever user installed each shared version.
+        return self.store_dir / "manifest.json" if self.store_dir else None
+
+    @property
+    def store_users_dir(self) -> Path | None:
+        # One file per user of the store, naming the versions they may still
+        # launch, so pruning by anyone else keeps those.
+        return self.store_dir / "users" if self.store_dir else None
+
+    @property
+    def store_user_file(self) -> Path | None:
+        users_dir = self.store_users_dir
+        return users_dir / str(os.getuid()) if users_dir else None
+
+    @property
+    def update_check_file(self) -> Path:
+        return self.state_dir / "next_update_check"
+
     @property
     def runtime_dir(self) -> Path | None:
         try:
@@ -49,16 +166,32 @@ class LinuxcordPaths:
             return None
         return Path(value) if value else None
 
-    def acquire_lock(self) -> BaseFileLock:
-        lock_path = (
+    @property
+    def mirror_dir(self) -> Path | None:
+        # The runtime directory is a per-user tmpfs, emptied at logout.
+        return self.runtime_dir / APP_NAME / "mirror" if self.runtime_dir else None
+
+    @property
+    def daemon_socket(self) -> Path | None:
+        return self.runtime_dir / APP_NAME / "daemon.sock" if self.runtime_dir else None
+
+    @property
+    def lock_file(self) -> Path:
+        if self.store_dir is not None:
+            # One lock for every user of the store, so each version is only
+            # ever downloaded and extracted once.
+            return self.store_dir / "lock"
+        return (
             self.runtime_dir / f"{APP_NAME}.lock"
             if self.runtime_dir
             else self.state_dir / "lock"
         )
-        lock_path.parent.mkdir(parents=True, exist_ok=True)
-        lock = FileLock(lock_path)
-        _ = lock.acquire()
-        return lock
+
+    def acquire_lock(
+        self, mode: LockMode = "exclusive", timeout: float | None = None
+    ) -> InstallLock:
+        file_mode = 0o600 if self.store_dir is None else 0o644
+        return InstallLock(self.lock_file, timeout, file_mode).acquire(mode)
 
     def ensure_base_dirs(self) -> None:
         for directory in (
@@ -68,9 +201,53 @@ class LinuxcordPaths:
             self.discord_versions_dir,
         ):
             directory.mkdir(parents=True, exist_ok=True)
+        if self.store_dir is not None:
+            self._ensure_store_dirs(self.store_dir)
+        if self.versions_root is not None:
+            self._ensure_versions_root(self.versions_root)
+
+    def _ensure_store_dirs(self, store_dir: Path) -> None:
+        # Created with the store's own permissions (typically a setgid,
+        # group-writable directory) rather than this user's umask, so that
+        # every member of the group can install into them.
+        store_dir.mkdir(parents=True, exist_ok=True)
+        permissions = store_dir.stat().st_mode & 0o7777
+        for directory in (
+            self.install_dir,
+            self.staging_dir,
+            self.trash_dir,
+            self.tarball_cache_dir,
+            store_dir / "users",
+        ):
+            try:
+                directory.mkdir()
+            except FileExistsError:
+                continue
+            directory.chmod(permissions)
+
+    def _ensure_versions_root(self, versions_root: Path) -> None:
+        # Usually somewhere world-writable such as /var/tmp, where another
+        # user could have created the directory first and planted a Discord.
+        try:
+            versions_root.mkdir(mode=0o700, parents=True)
+        except FileExistsError:
+            pass
+        stat = versions_root.lstat()
+        foreign = stat.st_uid != os.getuid() or bool(stat.st_mode & 0o022)
+        if versions_root.is_symlink() or foreign:
+            raise PermissionError(
+                f"{versions_root} must be a directory owned and only writable by this user"
+            )
 
     def discord_paths(self, discord_version: DiscordVersion) -> "DiscordPaths":
-        return DiscordPaths(self.discord_versions_dir / discord_version.string)
+        return DiscordPaths(self.install_dir / discord_version.string)
+
+    def cached_tarball(self, discord_version: DiscordVersion) -> Path:
+        return self.tarball_cache_dir / f"discord-{discord_version.string}.tar.gz"
+
+    def tarball_index(self, discord_version: DiscordVersion) -> Path:
+        tarball = self.cached_tarball(discord_version)
+        return tarball.with_name(f"{tarball.name}.idx")
 
 
 class DiscordPaths:
@@ -92,3 +269,12 @@ class DiscordPaths:
     @property
     def build_info(self) -> Path:
         return self._dir / "resources" / "build_info.json"
+
+
+def _deletable(path: Path) -> bool:
+    # Unlinking takes write access to the parent, and emptying a directory
+    # write access to the directory itself.
+    access = os.W_OK | os.X_OK
+    if not os.access(path.parent, access):
+        return False
+    return path.is_symlink() or not path.is_dir() or os.access(path, access)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+# What a cold Electron start reads first: the binary, its bundled libraries,
+# V8 snapshots, ICU data, the .pak resource bundles and the app itself.
+DEFAULT_PREWARM_PATTERNS: tuple[str, ...] = (
+    "Discord",
+    "*.so",
+    "*.so.*",
+    "*.bin",
+    "*.dat",
+    "*.pak",
+    "locales/en-US.pak",
+    "resources/app.asar",
+)
+
+
+@dataclass
+class PrewarmResult:
+    files: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+
+def hot_files(install_dir: Path, patterns: Sequence[str]) -> list[Path]:
+    """Regular files in ``install_dir`` matching ``patterns``, in order.
+
+    Patterns are globs relative to the install directory.
+    """
+
+    seen: set[Path] = set()
+    found: list[Path] = []
+    for pattern in patterns:
+        for path in sorted(install_dir.glob(pattern)):
+            if path in seen or path.is_symlink() or not path.is_file():
+                continue
+            seen.add(path)
+            found.append(path)
+    return found
+
+
+def prewarm_install(
+    install_dir: Path, patterns: Sequence[str] = DEFAULT_PREWARM_PATTERNS
+) -> PrewarmResult:
+    """Ask the kernel to start reading the hot files into the page cache.
+
+    posix_fadvise(WILLNEED) only queues the readahead, so this returns long
+    before the data has been read.
+    """
+
+    result = PrewarmResult()
+    if not hasattr(os, "posix_fadvise"):
+        logger.debug("posix_fadvise is unavailable; not prewarming")
+        return result
+    started = time.monotonic()
+    for path in hot_files(install_dir, patterns):
+        try:
+            fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+        except OSError:
+            continue
+        try:
+            size = os.fstat(fd).st_size
+            os.posix_fadvise(fd, 0, size, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            logger.debug("Could not prewarm %s", path, exc_info=True)
+            continue
+        finally:
+            os.close(fd)
+        result.files += 1
+        result.bytes += size
+    result.seconds = time.monotonic() - started
+    logger.debug(
+        "Prewarmed %d files (%d bytes) in %.3fs",
+        result.files,
+        result.bytes,
+        result.seconds,
+    )
+    return result
+
+
+def prewarm_in_background(
+    install_dir: Path, patterns: Sequence[str] = DEFAULT_PREWARM_PATTERNS
+) -> threading.Thread:
+    # Not a daemon: the interpreter finishes queueing the readahead before
+    # it exits, rather than cutting it short.
+    thread = threading.Thread(
+        target=prewarm_install, args=(install_dir, patterns), name="linuxcord-prewarm"
+    )
+    thread.start()
+    return thread
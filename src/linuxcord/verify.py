@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import logging
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from linuxcord.gzindex import GzipIndex
+from linuxcord.installer import ARCHIVE_ROOT
+from linuxcord.manifest import (
+    FileRecord,
+    ManifestStore,
+    hash_file,
+    hash_files,
+    stat_record,
+)
+from linuxcord.paths import LinuxcordPaths
+from linuxcord.types import DiscordVersion
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class VerifyResult:
+    version: DiscordVersion
+    checked: int = 0
+    rehashed: int = 0
+    missing: list[str] = field(default_factory=list)
+    corrupted: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing and not self.corrupted
+
+    @property
+    def damaged(self) -> list[str]:
+        return sorted(self.missing + self.corrupted)
+
+
+class InstallVerifier:
+    """Check an install against the hashes recorded when it was installed.
+
+    Files whose size and mtime still match the manifest are trusted without
+    reading them. Everything else is rehashed, in a thread pool when the
+    batch is large enough to be worth it.
+    """
+
+    def __init__(
+        self,
+        linuxcord_paths: LinuxcordPaths,
+        max_workers: int | None = None,
+    ):
+        self._paths: LinuxcordPaths = linuxcord_paths
+        self._manifest: ManifestStore = ManifestStore(linuxcord_paths)
+        self._max_workers: int | None = max_workers
+
+    def verify(self, version: DiscordVersion, *, full: bool = False) -> VerifyResult:
+        record = self._manifest.load().install_record(version)
+        if record is None:
+            hint = "reinstall it with 'linuxcord update --force'"
+            raise LookupError(
+                f"No recorded hashes for Discord {version.string}; {hint}"
+            )
+
+        install_dir = self._paths.discord_paths(version).dir
+        result = VerifyResult(version)
+        suspicious: list[tuple[str, Path, FileRecord]] = []
+        for name, expected in record.files.items():
+            result.checked += 1
+            path = install_dir / name
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                result.missing.append(name)
+                continue
+            if stat.st_size != expected.size:
+                result.corrupted.append(name)
+            elif full or stat.st_mtime_ns != expected.mtime_ns:
+                suspicious.append((name, path, expected))
+
+        digests = hash_files([path for _, path, _ in suspicious], self._max_workers)
+        result.rehashed = len(suspicious)
+        refreshed: dict[str, FileRecord] = {}
+        for (name, path, expected), digest in zip(suspicious, digests):
+            if digest != expected.sha256:
+                result.corrupted.append(name)
+            elif path.stat().st_mtime_ns != expected.mtime_ns:
+                # Content is intact but the mtime moved (e.g. a copy without
+                # -p); remember the new mtime so the next check stays cheap.
+                refreshed[name] = stat_record(path, digest)
+        if refreshed:
+            self._manifest.record_files(version, refreshed)
+
+        result.missing.sort()
+        result.corrupted.sort()
+        logger.debug(
+            "Verified %s: %d files checked, %d rehashed, %d damaged",
+            version.string,
+            result.checked,
+            result.rehashed,
+            len(result.damaged),
+        )
+        return result
+
+    def repair(self, result: VerifyResult) -> VerifyResult:
+        """Restore damaged files from the cached tarball, then verify again.
+
+        Each file is read straight from its offset in the tarball using the
+        gzip index written at install time, so only the damaged files are
+        decompressed.
+        """
+
+        version = result.version
+        tarball = self._paths.cached_tarball(version)
+        index_path = self._paths.tarball_index(version)
+        if not tarball.exists() or not index_path.exists():
+            raise LookupError(f"No indexed tarball cached for Discord {version.string}")
+        index = GzipIndex.load(index_path)
+        if index.compressed_size != tarball.stat().st_size:
+            raise LookupError(f"Index {index_path} does not match {tarball}")
+        record = self._manifest.load().install_record(version)
+        if record is None:
+            raise LookupError(f"No recorded hashes for Discord {version.string}")
+
+        install_dir = self._paths.discord_paths(version).dir
+        restored: dict[str, FileRecord] = {}
+        for name in result.damaged:
+            dest = install_dir / name
+            logger.info("Restoring %s from %s", dest, tarball)
+            index.extract_member(tarball, f"{ARCHIVE_ROOT}/{name}", dest)
+            digest = hash_file(dest)
+            if digest != record.files[name].sha256:
+                raise ValueError(f"Cached tarball does not match the recorded {name}")
+            restored[name] = stat_record(dest, digest)
+        self._manifest.record_files(version, restored)
+        return self.verify(version)
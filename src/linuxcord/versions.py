@@ -2,21 +2,65 @@ from __future__ import annotations
 
 import logging
 import re
+import socket
+import threading
+import time
 from pathlib import Path
 from typing import cast
+from urllib.parse import urlsplit
 
 import requests
+from requests.utils import get_environ_proxies, select_proxy
+from packaging.version import InvalidVersion
 
+from linuxcord import DEFAULT_VERSION_URL_TEMPLATE
+from linuxcord.manifest import ManifestStore
 from linuxcord.paths import DiscordPaths, LinuxcordPaths
 from linuxcord.types import DiscordVersion
 
 
 logger = logging.getLogger(__name__)
+REQUEST_TIMEOUT = 10
+
+
+def has_route(url: str) -> bool:
+    """Whether the kernel has a route to ``url``'s host, or its proxy's.
+
+    Connecting a UDP socket only looks the route up without sending
+    anything, so an offline machine is noticed within milliseconds. Name
+    resolution can still stall on a broken resolver.
+    """
+
+    proxy = select_proxy(url, get_environ_proxies(url))
+    parts = urlsplit(proxy or url)
+    if parts.hostname is None:
+        return True
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    try:
+        family, kind, proto, _name, address = socket.getaddrinfo(
+            parts.hostname, port, type=socket.SOCK_DGRAM
+        )[0]
+        with socket.socket(family, kind, proto) as sock:
+            sock.connect(address)
+    except OSError as e:
+        logger.info("No route to %s: %s", parts.hostname, e)
+        return False
+    return True
+
+
+def _request_timeout(deadline: float | None) -> float:
+    if deadline is None:
+        return REQUEST_TIMEOUT
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("Out of time for the update check")
+    return min(REQUEST_TIMEOUT, remaining)
 
 
 class LocalVersioner:
     def __init__(self, linuxcord_paths: LinuxcordPaths):
         self._paths: LinuxcordPaths = linuxcord_paths
+        self._manifest: ManifestStore = ManifestStore(linuxcord_paths)
 
     def get_version(self, path: str | Path) -> DiscordVersion | None:
         try:
@@ -24,6 +68,22 @@ class LocalVersioner:
         except FileNotFoundError:
             return None
 
+    def installed_versions(self) -> list[DiscordVersion]:
+        """Versions with an install directory, oldest first."""
+
+        versions_dir = self._paths.install_dir
+        if not versions_dir.is_dir():
+            return []
+        found: list[DiscordVersion] = []
+        for child in versions_dir.iterdir():
+            if child.is_symlink() or not child.is_dir():
+                continue
+            try:
+                found.append(DiscordVersion(child.name))
+            except InvalidVersion:
+                continue
+        return sorted(found)
+
     def get_current_version(self) -> DiscordVersion | None:
         current = self._paths.discord_current_version_dir_symlink
         if not current.exists():
@@ -32,6 +92,9 @@ class LocalVersioner:
             resolved = current.resolve(strict=True)
         except OSError:
             return None
+        recorded = self._manifest.load(files=False).current
+        if recorded is not None and resolved == self._paths.discord_paths(recorded).dir:
+            return recorded
         return self.get_version(resolved)
 
 
@@ -41,10 +104,14 @@ class OnlineVersioner:
         discord_tgz_url: str,
         discord_updates_url: str,
         session: requests.Session,
+        version_url_template: str | None = None,
     ):
         self._tgz_url: str = discord_tgz_url
         self._updates_url: str = discord_updates_url
         self._session: requests.Session = session
+        self._version_url_template: str = (
+            version_url_template or DEFAULT_VERSION_URL_TEMPLATE
+        )
 
     def _extract_version_from_url(self, url: str) -> DiscordVersion | None:
         pattern = r"([0-9]+\.[0-9]+\.[0-9]+)"
@@ -53,10 +120,20 @@ class OnlineVersioner:
             return DiscordVersion(match.group(1))
         return None
 
-    def get_latest_version(self) -> DiscordVersion | None:
+    def get_latest_version(
+        self, deadline: float | None = None
+    ) -> DiscordVersion | None:
+        """The latest version, or None if it cannot be found out.
+
+        A ``deadline`` (a ``time.monotonic`` value) shortens the request
+        timeouts, and skips the download URL fallback once it has passed.
+        """
+
         logger.debug("Fetching latest version from %s", self._updates_url)
         try:
-            response = self._session.get(self._updates_url, timeout=10)
+            response = self._session.get(
+                self._updates_url, timeout=_request_timeout(deadline)
+            )
             response.raise_for_status()
             data = cast(dict[str, object], response.json())
             name = data.get("name")
@@ -67,17 +144,47 @@ class OnlineVersioner:
 
         logger.debug("Falling back to resolving version from download URL")
         try:
-            resolved_url = self.get_latest_download_url()
+            resolved_url = self.get_latest_download_url(deadline)
             return self._extract_version_from_url(resolved_url)
         except Exception:
             logger.error("Failed to resolve version from download URL", exc_info=True)
             return None
 
-    def get_latest_download_url(self) -> str:
+    def get_latest_version_within(self, budget: float) -> DiscordVersion | None:
+        """``get_latest_version``, giving up after ``budget`` seconds in all.
+
+        Request timeouts do not cover name resolution, so the check runs on
+        a daemon thread that is abandoned once the budget is spent.
+        """
+
+        deadline = time.monotonic() + budget
+        found: list[DiscordVersion | None] = []
+
+        def check() -> None:
+            if has_route(self._updates_url):
+                found.append(self.get_latest_version(deadline))
+            else:
+                found.append(None)
+
+        worker = threading.Thread(target=check, name="linuxcord-check", daemon=True)
+        worker.start()
+        worker.join(budget)
+        if not found:
+            logger.warning("No answer from the updates API within %gs", budget)
+            return None
+        return found[0]
+
+    def get_latest_download_url(self, deadline: float | None = None) -> str:
         response = self._session.head(
-            self._tgz_url, allow_redirects=True, timeout=10, stream=True
+            self._tgz_url,
+            allow_redirects=True,
+            timeout=_request_timeout(deadline),
+            stream=True,
         )
         response.raise_for_status()
         final_url = response.url
         response.close()
         return final_url
+
+    def get_version_download_url(self, version: DiscordVersion) -> str:
+        return self._version_url_template.format(version=version.string)
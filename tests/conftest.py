@@ -1,3 +1,4 @@
+import os
 import sys
 from pathlib import Path
 
@@ -5,3 +6,7 @@ PROJECT_ROOT = Path(__file__).resolve().parents[1]
 SRC_PATH = PROJECT_ROOT / "src"
 if str(SRC_PATH) not in sys.path:
     sys.path.insert(0, str(SRC_PATH))
+# Background helpers run as "python -m linuxcord..." and need it importable too.
+os.environ["PYTHONPATH"] = os.pathsep.join(
+    filter(None, [str(SRC_PATH), os.environ.get("PYTHONPATH")])
+)
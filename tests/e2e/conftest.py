@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+
+import pytest
+
+from tests.e2e.server import DiscordCdn, discord_cdn
+
+
+@pytest.fixture()
+def cdn() -> Iterator[DiscordCdn]:
+    with discord_cdn() as server:
+        yield server
@@ -1,54 +1,311 @@
+"""A local stand-in for Discord's update API and download CDN.
+
+Tarballs are served with sendfile and support Range, If-Range, ETag and
+conditional GETs, and ``/api/download`` answers with a redirect chain ending
+at ``/apps/linux/<version>/discord-<version>.tar.gz`` like the real download
+URL. ``CdnConfig`` adds latency, bandwidth caps, stalls and injected errors
+so download behaviour can be exercised offline.
+
+Run ``python -m tests.e2e.server --help`` to serve a tarball by hand.
+"""
+
 from __future__ import annotations
 
+import argparse
+import email.utils
 import json
+import os
+import re
+import socket
 import threading
-from collections.abc import Iterator
+import time
+from collections.abc import Generator
 from contextlib import contextmanager
+from dataclasses import dataclass, field
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+from typing import cast
+from urllib.parse import urlsplit
 
 from linuxcord.types import DiscordVersion
 from typing_extensions import override
 
 _CONTENT_PATH = "/download/discord_latest.tar.gz"
 _UPDATE_PATH = "/update_version"
+_DOWNLOAD_PATH = "/api/download"
+_REDIRECT_PREFIX = "/redirect/"
+_APPS_PATH = re.compile(r"/apps/linux/(?P<version>[^/]+)/discord-(?P=version)\.tar\.gz")
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+_THROTTLE_INTERVAL = 0.05
 
 
-def _build_handler(version: DiscordVersion, tarball_path: Path):
-    update_payload = json.dumps({"name": version.string}).encode()
+@dataclass
+class CdnConfig:
+    latency: float = 0.0
+    """Seconds to wait before answering any request."""
+    bandwidth: int | None = None
+    """Cap on tarball bytes per second, per connection."""
+    stall_after: int | None = None
+    """Pause once this many tarball bytes have been sent on a connection."""
+    stall_seconds: float = 0.0
+    drop_after: int | None = None
+    """Close the connection once this many tarball bytes have been sent."""
+    fail_requests: int = 0
+    """Answer this many tarball requests with ``error_status`` first."""
+    error_status: int = 503
+    redirect_hops: int = 2
+    """Redirects between /api/download and the versioned tarball URL."""
 
-    class DiscordRequestHandler(BaseHTTPRequestHandler):  # type: ignore[misc]
-        def _send_tarball_headers(self) -> None:
-            tarball_size = tarball_path.stat().st_size
-            self.send_response(200)
-            self.send_header("Content-Type", "application/gzip")
-            self.send_header("Content-Length", str(tarball_size))
+
+@dataclass
+class RequestRecord:
+    method: str
+    path: str
+    status: int
+    range: str | None
+
+
+@dataclass
+class _Published:
+    version: DiscordVersion
+    tarball: Path
+
+
+@dataclass
+class DiscordCdn:
+    """Serves the latest published version until it is stopped."""
+
+    config: CdnConfig = field(default_factory=CdnConfig)
+    requests: list[RequestRecord] = field(default_factory=list)
+    base_url: str = ""
+    _published: dict[str, _Published] = field(default_factory=dict)
+    _latest: str | None = None
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+    _server: ThreadingHTTPServer | None = None
+    _thread: threading.Thread | None = None
+
+    @property
+    def tgz_url(self) -> str:
+        return f"{self.base_url}{_DOWNLOAD_PATH}?platform=linux&format=tar.gz"
+
+    @property
+    def updates_url(self) -> str:
+        return f"{self.base_url}{_UPDATE_PATH}"
+
+    @property
+    def version_url_template(self) -> str:
+        return f"{self.base_url}/apps/linux/{{version}}/discord-{{version}}.tar.gz"
+
+    def tarball_url(self, version: DiscordVersion) -> str:
+        return f"{self.base_url}/apps/linux/{version.string}/discord-{version.string}.tar.gz"
+
+    def publish(self, version: DiscordVersion, tarball: Path) -> None:
+        with self._lock:
+            self._published[version.string] = _Published(version, tarball)
+            self._latest = version.string
+
+    def latest(self) -> _Published | None:
+        with self._lock:
+            return self._published.get(self._latest) if self._latest else None
+
+    def lookup(self, version: str) -> _Published | None:
+        with self._lock:
+            return self._published.get(version)
+
+    def take_failure(self) -> bool:
+        with self._lock:
+            if self.config.fail_requests <= 0:
+                return False
+            self.config.fail_requests -= 1
+            return True
+
+    def record(self, request: RequestRecord) -> None:
+        with self._lock:
+            self.requests.append(request)
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        self._server = ThreadingHTTPServer((host, port), _build_handler(self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        bound_host, bound_port = self._server.server_address[:2]
+        self.base_url = f"http://{bound_host!s}:{bound_port}"
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+        self._server = None
+        self._thread = None
+
+
+def _etag(path: Path) -> str:
+    stat = path.stat()
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Return the inclusive byte range requested, or None if unsatisfiable."""
+
+    match = _RANGE.fullmatch(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last or int(last) == 0:
+            return None
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return None
+    return start, end
+
+
+def _build_handler(cdn: DiscordCdn) -> type[BaseHTTPRequestHandler]:
+    class DiscordRequestHandler(BaseHTTPRequestHandler):
+        protocol_version: str = "HTTP/1.1"
+
+        def _record(self, status: int) -> None:
+            cdn.record(
+                RequestRecord(
+                    self.command, self.path, status, self.headers.get("Range")
+                )
+            )
+
+        def _send_empty(self, status: int, headers: dict[str, str]) -> None:
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", "0")
             self.end_headers()
+            self._record(status)
 
-        def _send_update_headers(self) -> None:
+        def _send_update(self, body: bool) -> None:
+            published = cdn.latest()
+            if published is None:
+                self._send_empty(404, {})
+                return
+            payload = json.dumps({"name": published.version.string}).encode()
             self.send_response(200)
             self.send_header("Content-Type", "application/json")
-            self.send_header("Content-Length", str(len(update_payload)))
+            self.send_header("Content-Length", str(len(payload)))
             self.end_headers()
+            self._record(200)
+            if body:
+                _ = self.wfile.write(payload)
 
-        def do_HEAD(self) -> None:  # noqa: N802
-            if self.path == _UPDATE_PATH:
-                self._send_update_headers()
-            elif self.path == _CONTENT_PATH:
-                self._send_tarball_headers()
+        def _redirect(self, hop: int) -> None:
+            published = cdn.latest()
+            if published is None:
+                self._send_empty(404, {})
+                return
+            if hop < cdn.config.redirect_hops - 1:
+                location = f"{_REDIRECT_PREFIX}{hop + 1}"
             else:
-                self.send_error(404)
+                location = urlsplit(cdn.tarball_url(published.version)).path
+            self._send_empty(302, {"Location": location})
 
-        def do_GET(self) -> None:  # noqa: N802
-            if self.path == _UPDATE_PATH:
-                self._send_update_headers()
-                _ = self.wfile.write(update_payload)
-            elif self.path == _CONTENT_PATH:
-                self._send_tarball_headers()
-                with tarball_path.open("rb") as f:
-                    _ = self.wfile.write(f.read())
+        def _send_tarball(self, tarball: Path, body: bool) -> None:
+            if cdn.take_failure():
+                self._send_empty(cdn.config.error_status, {})
+                return
+            size = tarball.stat().st_size
+            etag = _etag(tarball)
+            last_modified = email.utils.formatdate(tarball.stat().st_mtime, usegmt=True)
+            validators = {"ETag": etag, "Last-Modified": last_modified}
+            if self.headers.get("If-None-Match") in (etag, "*"):
+                self._send_empty(304, validators)
+                return
+
+            start, end, status = 0, size - 1, 200
+            range_header = self.headers.get("Range")
+            if_range = self.headers.get("If-Range")
+            if range_header and (if_range is None or if_range == etag):
+                requested = _parse_range(range_header, size)
+                if requested is None:
+                    self._send_empty(416, {"Content-Range": f"bytes */{size}"})
+                    return
+                (start, end), status = requested, 206
+
+            self.send_response(status)
+            self.send_header("Content-Type", "application/gzip")
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(end - start + 1))
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            for name, value in validators.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self._record(status)
+            if body:
+                with tarball.open("rb") as f:
+                    self._sendfile(f.fileno(), start, end - start + 1)
+
+        def _sendfile(self, fd: int, offset: int, count: int) -> None:
+            config = cdn.config
+            sent = 0
+            stall_at = config.stall_after
+            chunk = (
+                max(1, int(config.bandwidth * _THROTTLE_INTERVAL))
+                if config.bandwidth
+                else count
+            )
+            connection = cast(socket.socket, self.connection)
+            socket_fd = connection.fileno()
+            while sent < count:
+                limit = count - sent
+                for threshold in (stall_at, config.drop_after):
+                    if threshold is not None and threshold > sent:
+                        limit = min(limit, threshold - sent)
+                started = time.monotonic()
+                written = os.sendfile(socket_fd, fd, offset + sent, min(chunk, limit))
+                if written == 0:
+                    break
+                sent += written
+                if config.drop_after is not None and sent >= config.drop_after:
+                    connection.shutdown(socket.SHUT_RDWR)
+                    return
+                if stall_at is not None and sent >= stall_at:
+                    stall_at = None
+                    time.sleep(config.stall_seconds)
+                if config.bandwidth:
+                    delay = written / config.bandwidth - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+
+        def _handle(self, body: bool) -> None:
+            if cdn.config.latency:
+                time.sleep(cdn.config.latency)
+            path = urlsplit(self.path).path
+            if path == _UPDATE_PATH:
+                self._send_update(body)
+            elif path == _DOWNLOAD_PATH:
+                self._redirect(0)
+            elif path.startswith(_REDIRECT_PREFIX):
+                self._redirect(int(path.removeprefix(_REDIRECT_PREFIX) or 0))
+            elif path == _CONTENT_PATH:
+                published = cdn.latest()
+                if published is None:
+                    self._send_empty(404, {})
+                else:
+                    self._send_tarball(published.tarball, body)
+            elif match := _APPS_PATH.fullmatch(path):
+                published = cdn.lookup(match["version"])
+                if published is None:
+                    self._send_empty(404, {})
+                else:
+                    self._send_tarball(published.tarball, body)
             else:
-                self.send_error(404)
+                self._send_empty(404, {})
+
+        def do_HEAD(self) -> None:  # noqa: N802
+            self._handle(body=False)
+
+        def do_GET(self) -> None:  # noqa: N802
+            self._handle(body=True)
 
         @override
         def log_message(self, format: str, *args: object) -> None:  # noqa: A003
@@ -58,15 +315,78 @@ def _build_handler(version: DiscordVersion, tarball_path: Path):
 
 
 @contextmanager
-def discord_test_server(version: DiscordVersion, tarball_path: Path) -> Iterator[str]:
-    handler = _build_handler(version, tarball_path)
-    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
-    thread = threading.Thread(target=server.serve_forever, daemon=True)
-    thread.start()
-    base_url = f"http://{server.server_address[0]}:{server.server_address[1]}"
+def discord_cdn(config: CdnConfig | None = None) -> Generator[DiscordCdn, None, None]:
+    cdn = DiscordCdn(config or CdnConfig())
+    cdn.start()
     try:
-        yield base_url
+        yield cdn
     finally:
-        server.shutdown()
-        thread.join()
-        server.server_close()
+        cdn.stop()
+
+
+@contextmanager
+def discord_test_server(
+    version: DiscordVersion, tarball_path: Path
+) -> Generator[str, None, None]:
+    with discord_cdn() as cdn:
+        cdn.publish(version, tarball_path)
+        yield cdn.base_url
+
+
+class _Arguments(argparse.Namespace):
+    version: str = ""
+    tarball: Path = Path()
+    host: str = ""
+    port: int = 0
+    latency: float = 0.0
+    bandwidth: int | None = None
+    stall_after: int | None = None
+    stall_seconds: float = 0.0
+    drop_after: int | None = None
+    fail_requests: int = 0
+    error_status: int = 0
+    redirect_hops: int = 0
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve a fake Discord CDN")
+    _ = parser.add_argument("version", help="Version to announce, e.g. 0.0.90")
+    _ = parser.add_argument("tarball", type=Path, help="Tarball to serve")
+    _ = parser.add_argument("--host", default="127.0.0.1")
+    _ = parser.add_argument("--port", type=int, default=8080)
+    _ = parser.add_argument("--latency", type=float, default=0.0)
+    _ = parser.add_argument("--bandwidth", type=int, help="Bytes per second")
+    _ = parser.add_argument("--stall-after", type=int)
+    _ = parser.add_argument("--stall-seconds", type=float, default=0.0)
+    _ = parser.add_argument("--drop-after", type=int)
+    _ = parser.add_argument("--fail-requests", type=int, default=0)
+    _ = parser.add_argument("--error-status", type=int, default=503)
+    _ = parser.add_argument("--redirect-hops", type=int, default=2)
+    args = parser.parse_args(argv, namespace=_Arguments())
+
+    config = CdnConfig(
+        latency=args.latency,
+        bandwidth=args.bandwidth,
+        stall_after=args.stall_after,
+        stall_seconds=args.stall_seconds,
+        drop_after=args.drop_after,
+        fail_requests=args.fail_requests,
+        error_status=args.error_status,
+        redirect_hops=args.redirect_hops,
+    )
+    cdn = DiscordCdn(config)
+    cdn.publish(DiscordVersion(args.version), args.tarball)
+    cdn.start(args.host, args.port)
+    print(f"LINUXCORD_DISCORD_TGZ_URL={cdn.tgz_url}")
+    print(f"LINUXCORD_UPDATES_URL={cdn.updates_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cdn.stop()
+
+
+if __name__ == "__main__":
+    main()
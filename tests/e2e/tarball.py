@@ -2,12 +2,15 @@ from __future__ import annotations
 
 import shutil
 import tarfile
+from collections.abc import Sequence
 from pathlib import Path
 
 from linuxcord.types import DiscordVersion
 
 
-def build_discord_tarball(dest_dir: Path, version: DiscordVersion) -> Path:
+def build_discord_tarball(
+    dest_dir: Path, version: DiscordVersion, locales: Sequence[str] = ()
+) -> Path:
     dest_dir.mkdir(parents=True, exist_ok=True)
     tarball_path = dest_dir / "discord_latest.tar.gz"
 
@@ -24,6 +27,10 @@ def build_discord_tarball(dest_dir: Path, version: DiscordVersion) -> Path:
     _ = (resources_dir / "build_info.json").write_text(
         f'{{"version": "{version.string}"}}'
     )
+    for locale in locales:
+        locales_dir = discord_dir / "locales"
+        locales_dir.mkdir(exist_ok=True)
+        _ = (locales_dir / f"{locale}.pak").write_text(locale)
 
     with tarfile.open(tarball_path, "w:gz") as tar:
         tar.add(discord_dir, arcname="Discord")
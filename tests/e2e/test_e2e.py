@@ -1,15 +1,19 @@
 from __future__ import annotations
 
+import shutil
+import time
 from pathlib import Path
 from typing import cast
 
+import pytest
 import requests
 import linuxcord.linuxcord as linuxcord
+from linuxcord.installer import RetentionPolicy
 from linuxcord.launcher import DiscordLauncher
-from linuxcord.paths import LinuxcordPaths
+from linuxcord.paths import HomeXDG, LinuxcordPaths
 from linuxcord.types import DiscordVersion
 from pytest_mock import MockerFixture
-from tests.e2e.server import discord_test_server
+from tests.e2e.server import DiscordCdn, discord_test_server
 from tests.e2e.tarball import build_discord_tarball
 from tests.helpers import MockPyXDG
 
@@ -124,6 +128,12 @@ def test_uninstall_removes_installed_files(tmp_path: Path) -> None:
     ):
         assert not directory.exists()
 
+    # The renamed trees are deleted by a detached background process.
+    deadline = time.monotonic() + 10
+    while paths.pending_deletions() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not paths.pending_deletions()
+
 
 def test_update_prunes_previous_version(tmp_path: Path) -> None:
     first_version = DiscordVersion("1.2.3")
@@ -157,6 +167,7 @@ def test_update_prunes_previous_version(tmp_path: Path) -> None:
             session=session,
             discord_tgz_url=f"{base_url}/download/discord_latest.tar.gz",
             discord_updates_url=f"{base_url}/update_version",
+            retention=RetentionPolicy(keep=0),
         )
 
     current_dir = paths.discord_paths(second_version).dir
@@ -166,6 +177,12 @@ def test_update_prunes_previous_version(tmp_path: Path) -> None:
     assert not old_dir.exists()
     assert paths.discord_current_version_dir_symlink.resolve(strict=True) == current_dir
 
+    # The old install is deleted by a detached background process.
+    deadline = time.monotonic() + 10
+    while any(paths.trash_dir.iterdir()) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not any(paths.trash_dir.iterdir())
+
 
 def test_update_respects_no_pruning_flag(tmp_path: Path) -> None:
     first_version = DiscordVersion("1.2.3")
@@ -209,3 +226,256 @@ def test_update_respects_no_pruning_flag(tmp_path: Path) -> None:
     assert old_dir.exists()
     assert no_pruning_flag.exists()
     assert paths.discord_current_version_dir_symlink.resolve(strict=True) == current_dir
+
+
+@pytest.mark.parametrize("keep_index", [True, False])
+def test_verify_repairs_damaged_install(tmp_path: Path, keep_index: bool) -> None:
+    version = DiscordVersion("3.1.4")
+    tarball_path = build_discord_tarball(tmp_path, version)
+    xdg = create_xdg(tmp_path)
+    paths = LinuxcordPaths(xdg)
+
+    with (
+        discord_test_server(version, tarball_path) as base_url,
+        requests.Session() as session,
+    ):
+        tgz_url = f"{base_url}/download/discord_latest.tar.gz"
+        updates_url = f"{base_url}/update_version"
+        _ = linuxcord.update(
+            xdg=xdg,
+            session=session,
+            discord_tgz_url=tgz_url,
+            discord_updates_url=updates_url,
+        )
+        executable = paths.discord_paths(version).executable
+        _ = executable.write_text("truncated")
+        if not keep_index:
+            paths.tarball_index(version).unlink()
+
+        damaged = linuxcord.verify(xdg=xdg, session=session)
+        repaired = linuxcord.verify(
+            xdg=xdg,
+            session=session,
+            discord_tgz_url=tgz_url,
+            discord_updates_url=updates_url,
+            repair=True,
+        )
+
+    assert damaged.corrupted == ["Discord"]
+    assert repaired.ok
+    assert executable.read_text() == "#!/bin/sh\necho discord"
+
+
+def test_update_installs_requested_version_directly(
+    tmp_path: Path, cdn: DiscordCdn
+) -> None:
+    requested = DiscordVersion("4.5.6")
+    cdn.publish(requested, build_discord_tarball(tmp_path / "old", requested))
+    latest = DiscordVersion("4.5.7")
+    cdn.publish(latest, build_discord_tarball(tmp_path / "new", latest))
+    xdg = create_xdg(tmp_path)
+    paths = LinuxcordPaths(xdg)
+
+    with requests.Session() as session:
+        result = linuxcord.update(
+            xdg=xdg,
+            session=session,
+            discord_tgz_url=cdn.tgz_url,
+            discord_updates_url=cdn.updates_url,
+            version=requested,
+            version_url_template=cdn.version_url_template,
+            pin=True,
+        )
+        # Pinned, so the next update stays put without asking the CDN.
+        _ = linuxcord.update(
+            xdg=xdg,
+            session=session,
+            discord_tgz_url=cdn.tgz_url,
+            discord_updates_url=cdn.updates_url,
+        )
+
+    assert result.installed_version == requested
+    assert paths.discord_current_version_dir_symlink.resolve(strict=True) == (
+        paths.discord_paths(requested).dir
+    )
+    # One GET straight to the versioned path: no updates API, no redirects.
+    assert [(r.method, r.path) for r in cdn.requests] == [
+        ("GET", "/apps/linux/4.5.6/discord-4.5.6.tar.gz")
+    ]
+
+
+def test_users_share_one_install_from_the_store(
+    tmp_path: Path, cdn: DiscordCdn
+) -> None:
+    version = DiscordVersion("5.6.7")
+    cdn.publish(version, build_discord_tarball(tmp_path / "tarball", version))
+    store = tmp_path / "store"
+    users = [create_xdg(tmp_path / user) for user in ("alice", "bob")]
+
+    with requests.Session() as session:
+        for xdg in users:
+            _ = linuxcord.update(
+                xdg=xdg,
+                store_dir=store,
+                session=session,
+                discord_tgz_url=cdn.tgz_url,
+                discord_updates_url=cdn.updates_url,
+            )
+
+    downloads = [r for r in cdn.requests if r.method == "GET" and "/apps/" in r.path]
+    assert len(downloads) == 1
+    shared_dir = store / "versions" / version.string
+    for xdg in users:
+        paths = LinuxcordPaths(xdg, store)
+        current = paths.discord_current_version_dir_symlink.resolve(strict=True)
+        assert current == shared_dir
+        assert not (paths.discord_versions_dir / version.string).exists()
+        assert linuxcord.verify(xdg=xdg, store_dir=store).ok
+
+
+def test_fleet_update_downloads_once_for_every_home(
+    tmp_path: Path, cdn: DiscordCdn
+) -> None:
+    version = DiscordVersion("6.7.8")
+    cdn.publish(version, build_discord_tarball(tmp_path / "tarball", version))
+    homes = [HomeXDG(tmp_path / "home" / user) for user in ("ann", "ben", "cat")]
+
+    with requests.Session() as session:
+        results = linuxcord.fleet_update(
+            homes,
+            session=session,
+            discord_tgz_url=cdn.tgz_url,
+            discord_updates_url=cdn.updates_url,
+            max_workers=2,
+        )
+
+    assert all(result.ok for result in results)
+    assert all(result.result and result.result.updated for result in results)
+    downloads = [r for r in cdn.requests if r.method == "GET" and "/apps/" in r.path]
+    assert len(downloads) == 1
+    executables = [
+        LinuxcordPaths(xdg).discord_paths(version).executable for xdg in homes
+    ]
+    assert len({path.read_text() for path in executables}) == 1
+    for xdg in homes:
+        paths = LinuxcordPaths(xdg)
+        assert paths.discord_current_version_dir_symlink.resolve(strict=True) == (
+            paths.discord_paths(version).dir
+        )
+        assert paths.cached_tarball(version).exists()
+        assert paths.applications_dir.joinpath("linuxcord.desktop").exists()
+        assert linuxcord.verify(xdg=xdg).ok
+
+
+def test_fleet_update_clones_from_a_home_that_is_not_pinned(
+    tmp_path: Path, cdn: DiscordCdn
+) -> None:
+    old, new = DiscordVersion("0.0.1"), DiscordVersion("0.0.2")
+    cdn.publish(old, build_discord_tarball(tmp_path / "old", old))
+    homes = [HomeXDG(tmp_path / "home" / user) for user in ("ann", "ben", "cat")]
+
+    with requests.Session() as session:
+        _ = linuxcord.update(
+            xdg=homes[0],
+            session=session,
+            discord_tgz_url=cdn.tgz_url,
+            discord_updates_url=cdn.updates_url,
+            pin=True,
+        )
+        cdn.publish(new, build_discord_tarball(tmp_path / "new", new))
+        results = linuxcord.fleet_update(
+            homes,
+            session=session,
+            discord_tgz_url=cdn.tgz_url,
+            discord_updates_url=cdn.updates_url,
+        )
+
+    assert all(result.ok for result in results)
+    installed = [
+        result.result and result.result.installed_version for result in results
+    ]
+    assert installed == [old, new, new]
+    downloads = [
+        r.path for r in cdn.requests if r.method == "GET" and new.string in r.path
+    ]
+    assert len(downloads) == 1
+
+
+def test_versions_root_survives_moves_and_recovers_from_wipes(
+    tmp_path: Path, cdn: DiscordCdn
+) -> None:
+    version = DiscordVersion("7.8.9")
+    cdn.publish(version, build_discord_tarball(tmp_path / "tarball", version))
+    xdg = create_xdg(tmp_path)
+    old_root = tmp_path / "old-host" / "linuxcord"
+    new_root = tmp_path / "new-host" / "linuxcord"
+
+    def update(root: Path) -> linuxcord.UpdateResult:
+        with requests.Session() as session:
+            return linuxcord.update(
+                xdg=xdg,
+                versions_root=root,
+                session=session,
+                discord_tgz_url=cdn.tgz_url,
+                discord_updates_url=cdn.updates_url,
+            )
+
+    def downloads() -> int:
+        return len(
+            [r for r in cdn.requests if r.method == "GET" and "/apps/" in r.path]
+        )
+
+    _ = update(old_root)
+    paths = LinuxcordPaths(xdg, versions_root=new_root)
+    assert not (paths.discord_versions_dir / version.string).exists()
+
+    # Moved along with the home: relinked where it is now, no download.
+    new_root.parent.mkdir()
+    _ = old_root.rename(new_root)
+    assert update(new_root).installed_version == version
+    assert downloads() == 1
+    current = paths.discord_current_version_dir_symlink
+    assert current.resolve(strict=True) == paths.discord_paths(version).dir
+
+    # Wiped: installed again from scratch.
+    shutil.rmtree(new_root)
+    assert update(new_root).installed_version == version
+    assert downloads() == 2
+    assert current.resolve(strict=True) == paths.discord_paths(version).dir
+    assert linuxcord.verify(xdg=xdg, versions_root=new_root).ok
+
+
+def test_changing_kept_locales_reinstalls_current_version(
+    tmp_path: Path, cdn: DiscordCdn
+) -> None:
+    version = DiscordVersion("3.1.4")
+    tarball = build_discord_tarball(
+        tmp_path / "tarball", version, locales=["de", "en-US", "fr"]
+    )
+    cdn.publish(version, tarball)
+    xdg = create_xdg(tmp_path)
+    locales_dir = LinuxcordPaths(xdg).discord_paths(version).dir / "locales"
+
+    def update(keep_locales: list[str] | None) -> linuxcord.UpdateResult:
+        with requests.Session() as session:
+            return linuxcord.update(
+                xdg=xdg,
+                session=session,
+                discord_tgz_url=cdn.tgz_url,
+                discord_updates_url=cdn.updates_url,
+                keep_locales=keep_locales,
+            )
+
+    def kept() -> list[str]:
+        return sorted(path.stem for path in locales_dir.iterdir())
+
+    _ = update(["fr"])
+    assert kept() == ["en-US", "fr"]
+
+    # The selection is remembered, so a plain update changes nothing.
+    assert update(None).updated is False
+    assert kept() == ["en-US", "fr"]
+
+    assert update([]).updated is True
+    assert kept() == ["de", "en-US", "fr"]
+    assert linuxcord.verify(xdg=xdg).ok
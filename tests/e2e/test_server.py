@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+import linuxcord.linuxcord as linuxcord
+from linuxcord.paths import LinuxcordPaths
+from linuxcord.types import DiscordVersion
+from tests.e2e.server import DiscordCdn
+from tests.e2e.tarball import build_discord_tarball
+from tests.helpers import MockPyXDG
+
+VERSION = DiscordVersion("0.0.77")
+
+
+@pytest.fixture()
+def payload(tmp_path: Path, cdn: DiscordCdn) -> bytes:
+    data = os.urandom(64 * 1024)
+    tarball = tmp_path / "payload.tar.gz"
+    _ = tarball.write_bytes(data)
+    cdn.publish(VERSION, tarball)
+    return data
+
+
+def test_download_url_redirects_to_versioned_tarball(
+    cdn: DiscordCdn, payload: bytes
+) -> None:
+    response = requests.get(cdn.tgz_url, timeout=5)
+
+    assert response.status_code == 200
+    assert [r.status_code for r in response.history] == [302, 302]
+    assert response.url == cdn.tarball_url(VERSION)
+    assert response.content == payload
+    assert requests.get(cdn.updates_url, timeout=5).json() == {"name": VERSION.string}
+
+
+def test_range_requests(cdn: DiscordCdn, payload: bytes) -> None:
+    url = cdn.tarball_url(VERSION)
+
+    partial = requests.get(url, headers={"Range": "bytes=10-19"}, timeout=5)
+    assert partial.status_code == 206
+    assert partial.content == payload[10:20]
+    assert partial.headers["Content-Range"] == f"bytes 10-19/{len(payload)}"
+
+    suffix = requests.get(url, headers={"Range": "bytes=-5"}, timeout=5)
+    assert suffix.content == payload[-5:]
+
+    beyond = requests.get(url, headers={"Range": f"bytes={len(payload)}-"}, timeout=5)
+    assert beyond.status_code == 416
+
+
+def test_etag_validators(cdn: DiscordCdn, payload: bytes) -> None:
+    url = cdn.tarball_url(VERSION)
+    etag = requests.head(url, timeout=5).headers["ETag"]
+
+    assert (
+        requests.get(url, headers={"If-None-Match": etag}, timeout=5).status_code == 304
+    )
+
+    resumed = requests.get(
+        url, headers={"Range": "bytes=100-", "If-Range": etag}, timeout=5
+    )
+    assert resumed.status_code == 206
+    assert resumed.content == payload[100:]
+
+    stale = requests.get(
+        url, headers={"Range": "bytes=100-", "If-Range": '"stale"'}, timeout=5
+    )
+    assert stale.status_code == 200
+    assert stale.content == payload
+
+
+def test_error_injection_and_dropped_connections(
+    cdn: DiscordCdn, payload: bytes
+) -> None:
+    url = cdn.tarball_url(VERSION)
+    cdn.config.fail_requests = 1
+
+    assert requests.get(url, timeout=5).status_code == 503
+    assert requests.get(url, timeout=5).content == payload
+
+    cdn.config.drop_after = 1000
+    with pytest.raises(requests.RequestException):
+        _ = requests.get(url, timeout=5).content
+
+
+def test_bandwidth_cap_and_stall(cdn: DiscordCdn, payload: bytes) -> None:
+    cdn.config.bandwidth = 512 * 1024
+    cdn.config.stall_after = 1024
+    cdn.config.stall_seconds = 0.2
+
+    started = time.monotonic()
+    response = requests.get(cdn.tarball_url(VERSION), timeout=5)
+    elapsed = time.monotonic() - started
+
+    assert response.content == payload
+    # 64 KiB at 512 KiB/s plus the stall.
+    assert elapsed >= 0.3
+    assert [record.status for record in cdn.requests] == [200]
+
+
+def test_update_through_redirect_chain(tmp_path: Path, cdn: DiscordCdn) -> None:
+    tarball = build_discord_tarball(tmp_path / "tarball", VERSION)
+    cdn.publish(VERSION, tarball)
+    xdg = MockPyXDG(
+        xdg_data_home=tmp_path / "data",
+        xdg_cache_home=tmp_path / "cache",
+        xdg_state_home=tmp_path / "state",
+    )
+
+    with requests.Session() as session:
+        result = linuxcord.update(
+            xdg=xdg,
+            session=session,
+            discord_tgz_url=cdn.tgz_url,
+            discord_updates_url=cdn.updates_url,
+        )
+
+    assert result.installed_version == VERSION
+    assert LinuxcordPaths(xdg).discord_paths(VERSION).executable.exists()
@@ -1,10 +1,26 @@
 from __future__ import annotations
 
+from pathlib import Path
+from typing import cast
+
 from click.testing import CliRunner
 from pytest_mock import MockerFixture
 
+from linuxcord import (
+    DEFAULT_DISCORD_TGZ_URL,
+    DEFAULT_UPDATES_URL,
+    DEFAULT_VERSION_URL_TEMPLATE,
+)
+from linuxcord import linuxcord
 from linuxcord.cli import cli
+from linuxcord.installer import RetentionPolicy
+from linuxcord.limits import ResourceLimits
 from linuxcord.linuxcord import UpdateResult
+from linuxcord.locking import LockTimeout
+from linuxcord.paths import HomeXDG
+from linuxcord.prewarm import DEFAULT_PREWARM_PATTERNS
+from linuxcord.types import DiscordVersion
+from linuxcord.verify import VerifyResult
 
 
 def test_update_invokes_linuxcord_update_with_context(mocker: MockerFixture) -> None:
@@ -28,9 +44,18 @@ def test_update_invokes_linuxcord_update_with_context(mocker: MockerFixture) ->
 
     assert result.exit_code == 0
     mock_update.assert_called_once_with(
+        store_dir=None,
+        versions_root=None,
         discord_tgz_url="http://example.com/dl",
         discord_updates_url="http://example.com/upd",
         force=True,
+        lock_timeout=10.0,
+        retention=RetentionPolicy(),
+        version=None,
+        version_url_template=DEFAULT_VERSION_URL_TEMPLATE,
+        pin=False,
+        durable=False,
+        keep_locales=None,
     )
 
 
@@ -52,9 +77,20 @@ def test_run_invokes_linuxcord_run_with_context(mocker: MockerFixture) -> None:
 
     assert result.exit_code == 0
     mock_run.assert_called_once_with(
+        store_dir=None,
+        versions_root=None,
         discord_tgz_url="http://example.com/dl2",
         discord_updates_url="http://example.com/upd2",
         no_update=True,
+        launch_mode="exec",
+        verify_install=False,
+        lock_timeout=10.0,
+        retention=RetentionPolicy(),
+        prewarm_patterns=None,
+        mirror=False,
+        durable=False,
+        check_timeout=5.0,
+        limits=None,
     )
 
 
@@ -71,7 +107,11 @@ def test_status_invokes_linuxcord_status_and_prints(mocker: MockerFixture) -> No
     )
 
     assert result.exit_code == 0
-    mock_status.assert_called_once_with(discord_updates_url="http://example.com/upd3")
+    mock_status.assert_called_once_with(
+        store_dir=None,
+        versions_root=None,
+        discord_updates_url="http://example.com/upd3",
+    )
     assert "Installed version: none" in result.output
     assert "Latest online version: unknown" in result.output
 
@@ -83,7 +123,7 @@ def test_uninstall_invokes_linuxcord_uninstall(mocker: MockerFixture) -> None:
     result = runner.invoke(cli, ["uninstall", "--yes"])
 
     assert result.exit_code == 0
-    mock_uninstall.assert_called_once_with()
+    mock_uninstall.assert_called_once_with(store_dir=None, versions_root=None)
     assert "linuxcord files removed" in result.output
 
 
@@ -107,9 +147,18 @@ def test_update_resolves_urls_from_environment_when_options_missing(
 
     assert result.exit_code == 0
     mock_update.assert_called_once_with(
+        store_dir=None,
+        versions_root=None,
         discord_tgz_url="http://env.example.com/dl",
         discord_updates_url="http://env.example.com/upd",
         force=True,
+        lock_timeout=10.0,
+        retention=RetentionPolicy(),
+        version=None,
+        version_url_template=DEFAULT_VERSION_URL_TEMPLATE,
+        pin=False,
+        durable=False,
+        keep_locales=None,
     )
 
 
@@ -134,7 +183,324 @@ def test_cli_arguments_override_environment(mocker: MockerFixture) -> None:
 
     assert result.exit_code == 0
     mock_run.assert_called_once_with(
+        store_dir=None,
+        versions_root=None,
         discord_tgz_url="http://cli.example.com/dl",
         discord_updates_url="http://cli.example.com/upd",
         no_update=False,
+        launch_mode="exec",
+        verify_install=False,
+        lock_timeout=10.0,
+        retention=RetentionPolicy(),
+        prewarm_patterns=None,
+        mirror=False,
+        durable=False,
+        check_timeout=5.0,
+        limits=None,
+    )
+
+
+def test_update_installs_exact_version_from_template(mocker: MockerFixture) -> None:
+    runner = CliRunner()
+    mock_update = mocker.patch(
+        "linuxcord.cli.linuxcord.update",
+        return_value=UpdateResult(None, None, False, None),
+    )
+    template = "http://mirror.example.com/{version}.tar.gz"
+
+    result = runner.invoke(
+        cli,
+        ["update", "--version", "0.0.90", "--pin"],
+        env={"LINUXCORD_VERSION_URL_TEMPLATE": template},
+    )
+
+    assert result.exit_code == 0
+    assert mock_update.call_args.kwargs["version"] == DiscordVersion("0.0.90")
+    assert mock_update.call_args.kwargs["version_url_template"] == template
+    assert mock_update.call_args.kwargs["pin"] is True
+
+    result = runner.invoke(
+        cli, ["--version-url-template", "http://mirror.example.com/x", "update"]
+    )
+    assert result.exit_code != 0
+
+
+def test_store_from_environment_and_option(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    runner = CliRunner()
+    mock_run = mocker.patch("linuxcord.cli.linuxcord.run")
+    env = {"LINUXCORD_STORE": str(tmp_path / "env-store")}
+
+    _ = runner.invoke(cli, ["run"], env=env)
+    assert mock_run.call_args.kwargs["store_dir"] == tmp_path / "env-store"
+
+    _ = runner.invoke(cli, ["--store", str(tmp_path / "store"), "run"], env=env)
+    assert mock_run.call_args.kwargs["store_dir"] == tmp_path / "store"
+
+
+def test_versions_root_from_environment_and_option(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    runner = CliRunner()
+    mock_run = mocker.patch("linuxcord.cli.linuxcord.run")
+    env = {"LINUXCORD_VERSIONS_ROOT": str(tmp_path / "env-root")}
+
+    _ = runner.invoke(cli, ["run"], env=env)
+    assert mock_run.call_args.kwargs["versions_root"] == tmp_path / "env-root"
+
+    _ = runner.invoke(cli, ["--versions-root", str(tmp_path / "root"), "run"], env=env)
+    assert mock_run.call_args.kwargs["versions_root"] == tmp_path / "root"
+
+    result = runner.invoke(cli, ["--store", str(tmp_path / "store"), "run"], env=env)
+    assert result.exit_code == 2
+    assert "cannot be combined" in result.output
+
+
+def test_fleet_update_reports_each_home(mocker: MockerFixture, tmp_path: Path) -> None:
+    runner = CliRunner()
+    homes_file = tmp_path / "homes"
+    _ = homes_file.write_text("/home/ann\n\n# lab machines\n/home/ben  # spare\n")
+    updated = UpdateResult(DiscordVersion("1.0.0"), None, True, None)
+    mock_fleet = mocker.patch(
+        "linuxcord.cli.linuxcord.fleet_update",
+        return_value=[
+            linuxcord.FleetResult(Path("/home/ann"), updated),
+            linuxcord.FleetResult(Path("/home/ben"), None, OSError("disk full")),
+        ],
+    )
+
+    result = runner.invoke(
+        cli, ["fleet-update", "--homes", str(homes_file), "--jobs", "8"]
+    )
+
+    assert result.exit_code == 1
+    profiles = cast(list[HomeXDG], mock_fleet.call_args.args[0])
+    assert [xdg.home for xdg in profiles] == [Path("/home/ann"), Path("/home/ben")]
+    assert mock_fleet.call_args.kwargs["max_workers"] == 8
+    assert "/home/ann: updated (1.0.0)" in result.output
+    assert "/home/ben: failed: disk full" in result.output
+
+
+def test_prewarm_from_environment_and_option(mocker: MockerFixture) -> None:
+    runner = CliRunner()
+    mock_run = mocker.patch("linuxcord.cli.linuxcord.run")
+
+    _ = runner.invoke(cli, ["run", "--prewarm"])
+    assert mock_run.call_args.kwargs["prewarm_patterns"] == DEFAULT_PREWARM_PATTERNS
+
+    env = {"LINUXCORD_PREWARM": "1", "LINUXCORD_PREWARM_FILES": "Discord, *.pak"}
+    _ = runner.invoke(cli, ["run"], env=env)
+    assert mock_run.call_args.kwargs["prewarm_patterns"] == ("Discord", "*.pak")
+
+
+def test_run_mirror_from_option_and_environment(mocker: MockerFixture) -> None:
+    runner = CliRunner()
+    mock_run = mocker.patch("linuxcord.cli.linuxcord.run")
+
+    _ = runner.invoke(cli, ["run", "--mirror"])
+    assert mock_run.call_args.kwargs["mirror"] is True
+
+    _ = runner.invoke(cli, ["run"], env={"LINUXCORD_MIRROR": "yes"})
+    assert mock_run.call_args.kwargs["mirror"] is True
+
+    _ = runner.invoke(cli, ["run"], env={"LINUXCORD_MIRROR": "0"})
+    assert mock_run.call_args.kwargs["mirror"] is False
+
+
+def test_run_accepts_popen_launch_mode(mocker: MockerFixture) -> None:
+    runner = CliRunner()
+    mock_run = mocker.patch("linuxcord.cli.linuxcord.run")
+
+    result = runner.invoke(cli, ["run", "--no-update", "--launch-mode", "popen"])
+
+    assert result.exit_code == 0
+    assert mock_run.call_args.kwargs["launch_mode"] == "popen"
+
+
+def test_lock_timeout_from_environment_and_option(mocker: MockerFixture) -> None:
+    runner = CliRunner()
+    mock_run = mocker.patch("linuxcord.cli.linuxcord.run")
+    env = {"LINUXCORD_LOCK_TIMEOUT": "2.5"}
+
+    _ = runner.invoke(cli, ["run"], env=env)
+    assert mock_run.call_args.kwargs["lock_timeout"] == 2.5
+
+    _ = runner.invoke(cli, ["run", "--lock-timeout", "0"], env=env)
+    assert mock_run.call_args.kwargs["lock_timeout"] == 0
+
+
+def test_limits_from_environment_and_options(mocker: MockerFixture) -> None:
+    runner = CliRunner()
+    mock_run = mocker.patch("linuxcord.cli.linuxcord.run")
+    env = {"LINUXCORD_LIMITS": "MemoryMax=4G,CPUWeight=50"}
+
+    _ = runner.invoke(cli, ["run"], env=env)
+    assert mock_run.call_args.kwargs["limits"] == ResourceLimits(
+        memory_max=4 << 30, cpu_weight=50
+    )
+
+    _ = runner.invoke(
+        cli, ["run", "--limit", "CPUWeight=20", "--limit", "Nice=5"], env=env
     )
+    assert mock_run.call_args.kwargs["limits"] == ResourceLimits(
+        memory_max=4 << 30, cpu_weight=20, nice=5
+    )
+
+    result = runner.invoke(cli, ["run", "--limit", "MemoryMax=lots"])
+    assert result.exit_code != 0
+    assert "invalid size" in result.output
+
+
+def test_check_timeout_from_environment_and_option(mocker: MockerFixture) -> None:
+    runner = CliRunner()
+    mock_run = mocker.patch("linuxcord.cli.linuxcord.run")
+    env = {"LINUXCORD_CHECK_TIMEOUT": "1.5"}
+
+    _ = runner.invoke(cli, ["run"], env=env)
+    assert mock_run.call_args.kwargs["check_timeout"] == 1.5
+
+    _ = runner.invoke(cli, ["run", "--check-timeout", "30"], env=env)
+    assert mock_run.call_args.kwargs["check_timeout"] == 30
+
+    result = runner.invoke(cli, ["run"], env={"LINUXCORD_CHECK_TIMEOUT": "soon"})
+    assert result.exit_code != 0
+
+
+def test_retention_policy_from_environment_and_options(
+    mocker: MockerFixture,
+) -> None:
+    runner = CliRunner()
+    mock_update = mocker.patch(
+        "linuxcord.cli.linuxcord.update",
+        return_value=UpdateResult(None, None, False, None),
+    )
+    env = {"LINUXCORD_KEEP_VERSIONS": "3", "LINUXCORD_KEEP_WITHIN": "2d"}
+
+    _ = runner.invoke(cli, ["update"], env=env)
+    assert mock_update.call_args.kwargs["retention"] == RetentionPolicy(3, 172800)
+
+    _ = runner.invoke(cli, ["update", "--keep", "0", "--keep-within", "90m"], env=env)
+    assert mock_update.call_args.kwargs["retention"] == RetentionPolicy(0, 5400)
+
+    result = runner.invoke(cli, ["update", "--keep-within", "soon"])
+    assert result.exit_code != 0
+
+
+def test_update_reports_update_in_progress(mocker: MockerFixture) -> None:
+    runner = CliRunner()
+    _ = mocker.patch("linuxcord.cli.linuxcord.update", side_effect=LockTimeout("busy"))
+
+    result = runner.invoke(cli, ["update"])
+
+    assert result.exit_code == 0
+    assert "already in progress" in result.output
+
+
+def test_verify_reports_damage_and_fails(mocker: MockerFixture) -> None:
+    runner = CliRunner()
+    mock_verify = mocker.patch(
+        "linuxcord.cli.linuxcord.verify",
+        return_value=VerifyResult(
+            DiscordVersion("1.2.3"), checked=3, rehashed=1, corrupted=["Discord"]
+        ),
+    )
+
+    result = runner.invoke(cli, ["verify", "--repair"])
+
+    assert result.exit_code == 1
+    assert mock_verify.call_args.kwargs["repair"] is True
+    assert mock_verify.call_args.kwargs["full"] is False
+    assert "3 files checked, 1 rehashed" in result.output
+    assert "Corrupted: Discord" in result.output
+
+
+def test_verify_help_describes_repair_from_the_cached_tarball() -> None:
+    result = CliRunner().invoke(cli, ["verify", "--help"])
+
+    assert "Restore damaged files from the cached tarball" in result.output
+
+
+def test_verify_reports_missing_record(mocker: MockerFixture) -> None:
+    runner = CliRunner()
+    _ = mocker.patch(
+        "linuxcord.cli.linuxcord.verify", side_effect=LookupError("No recorded hashes")
+    )
+
+    result = runner.invoke(cli, ["verify"])
+
+    assert result.exit_code == 1
+    assert "No recorded hashes" in result.output
+
+
+def test_rollback_pins_unless_told_otherwise(mocker: MockerFixture) -> None:
+    runner = CliRunner()
+    mock_rollback = mocker.patch(
+        "linuxcord.cli.linuxcord.rollback", return_value=DiscordVersion("1.0.9")
+    )
+
+    result = runner.invoke(cli, ["rollback", "1.0.9"])
+
+    assert result.exit_code == 0
+    mock_rollback.assert_called_once_with(
+        store_dir=None,
+        versions_root=None,
+        version=DiscordVersion("1.0.9"),
+        pin=True,
+        lock_timeout=10.0,
+        durable=False,
+    )
+    assert "Now using Discord 1.0.9" in result.output
+
+    _ = runner.invoke(cli, ["rollback", "--no-pin"])
+    assert mock_rollback.call_args.kwargs["version"] is None
+    assert mock_rollback.call_args.kwargs["pin"] is False
+
+    result = runner.invoke(cli, ["rollback", "latest"])
+    assert result.exit_code != 0
+
+
+def test_durable_from_option_and_environment(mocker: MockerFixture) -> None:
+    runner = CliRunner()
+    mock_update = mocker.patch("linuxcord.cli.linuxcord.update")
+
+    _ = runner.invoke(cli, ["--durable", "update"])
+    assert mock_update.call_args.kwargs["durable"] is True
+
+    _ = runner.invoke(cli, ["update"], env={"LINUXCORD_DURABLE": "true"})
+    assert mock_update.call_args.kwargs["durable"] is True
+
+
+def test_keep_locales_from_option_and_environment(mocker: MockerFixture) -> None:
+    runner = CliRunner()
+    mock_update = mocker.patch("linuxcord.cli.linuxcord.update")
+    env = {"LINUXCORD_KEEP_LOCALES": "de, fr,"}
+
+    _ = runner.invoke(cli, ["update"], env=env)
+    assert mock_update.call_args.kwargs["keep_locales"] == ("de", "fr")
+
+    _ = runner.invoke(cli, ["update", "--keep-locales", "ALL"], env=env)
+    assert mock_update.call_args.kwargs["keep_locales"] == ()
+
+
+def test_daemon_serves_with_the_group_options(mocker: MockerFixture) -> None:
+    runner = CliRunner()
+    serve = mocker.patch("linuxcord.cli.linuxcord.serve_daemon")
+
+    result = runner.invoke(cli, ["daemon", "--keep", "2"])
+
+    assert result.exit_code == 0
+    serve.assert_called_once_with(
+        store_dir=None,
+        versions_root=None,
+        discord_tgz_url=DEFAULT_DISCORD_TGZ_URL,
+        discord_updates_url=DEFAULT_UPDATES_URL,
+        lock_timeout=10.0,
+        retention=RetentionPolicy(keep=2),
+        durable=False,
+    )
+
+    serve.side_effect = RuntimeError("A daemon is already serving")
+    result = runner.invoke(cli, ["daemon"])
+    assert result.exit_code == 1
+    assert "already serving" in result.output
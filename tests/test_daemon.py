@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from linuxcord.daemon import LinuxcordDaemon, ask_daemon
+from linuxcord.paths import LinuxcordPaths
+from linuxcord.types import DiscordVersion
+from tests.helpers import MockPyXDG
+
+
+@pytest.fixture()
+def paths(tmp_path: Path) -> Iterator[LinuxcordPaths]:
+    # pytest's own directories can exceed the length limit of socket paths.
+    with tempfile.TemporaryDirectory(prefix="lc-") as runtime_dir:
+        yield LinuxcordPaths(
+            MockPyXDG(
+                xdg_data_home=tmp_path / "data",
+                xdg_state_home=tmp_path / "state",
+                runtime_dir=runtime_dir,
+            )
+        )
+
+
+def install(paths: LinuxcordPaths, version: DiscordVersion) -> None:
+    discord_paths = paths.discord_paths(version)
+    discord_paths.build_info.parent.mkdir(parents=True)
+    _ = discord_paths.build_info.write_text(f'{{"version": "{version.string}"}}')
+    current = paths.discord_current_version_dir_symlink
+    current.unlink(missing_ok=True)
+    current.symlink_to(discord_paths.dir)
+
+
+def serve(daemon: LinuxcordDaemon, paths: LinuxcordPaths) -> threading.Thread:
+    thread = threading.Thread(target=daemon.serve_forever)
+    thread.start()
+    socket_path = paths.daemon_socket
+    assert socket_path is not None
+    for _ in range(200):
+        if ask_daemon(socket_path, {"command": "ping"}, timeout=1) is not None:
+            break
+        time.sleep(0.01)
+    return thread
+
+
+def test_daemon_checks_once_per_interval_and_reports_the_install(
+    paths: LinuxcordPaths,
+) -> None:
+    versions = iter([DiscordVersion("1.0.0"), DiscordVersion("1.0.1")])
+    checks: list[DiscordVersion] = []
+
+    def check() -> None:
+        checks.append(next(versions))
+        install(paths, checks[-1])
+
+    daemon = LinuxcordDaemon(paths, check, interval=3600)
+    thread = serve(daemon, paths)
+    socket_path = paths.daemon_socket
+    assert socket_path is not None
+    try:
+        ready = {"command": "ready", "install_dir": str(paths.install_dir)}
+        assert ask_daemon(socket_path, ready) == {
+            "version": "1.0.0",
+            "path": str(paths.discord_paths(DiscordVersion("1.0.0")).dir),
+        }
+        assert ask_daemon(socket_path, ready) is not None
+        assert len(checks) == 1
+
+        reply = ask_daemon(socket_path, {"command": "update"})
+        assert reply is not None
+        assert reply["version"] == "1.0.1"
+
+        elsewhere = {"command": "ready", "install_dir": "/elsewhere"}
+        assert "error" in (ask_daemon(socket_path, elsewhere) or {})
+        assert "error" in (ask_daemon(socket_path, {"command": "bogus"}) or {})
+
+        with pytest.raises(RuntimeError, match="already serving"):
+            LinuxcordDaemon(paths, check, interval=3600).serve_forever()
+    finally:
+        daemon.shutdown()
+        thread.join()
+    assert not socket_path.exists()
+    assert ask_daemon(socket_path, {"command": "ping"}) is None
+
+
+def test_daemon_reports_failed_checks(paths: LinuxcordPaths) -> None:
+    def check() -> None:
+        raise OSError("network is down")
+
+    daemon = LinuxcordDaemon(paths, check, interval=3600)
+    thread = serve(daemon, paths)
+    socket_path = paths.daemon_socket
+    assert socket_path is not None
+    try:
+        assert ask_daemon(socket_path, {"command": "ready"}) == {
+            "error": "Discord is not installed"
+        }
+    finally:
+        daemon.shutdown()
+        thread.join()
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import os
+import subprocess
+import time
 from pathlib import Path
 
 import pytest
@@ -7,6 +10,7 @@ from pytest_mock import MockerFixture
 
 from linuxcord.freedesktop import DESKTOP_NAME, FreeDesktop
 from linuxcord.paths import LinuxcordPaths
+from linuxcord.types import DiscordVersion
 
 from .helpers import MockPyXDG
 
@@ -57,7 +61,7 @@ def test_create_desktop_entry_writes_expected_values(
     assert ("Version", "1.0") in desktop.set_calls
     assert ("Type", "Application") in desktop.set_calls
     assert ("Name", DESKTOP_NAME) in desktop.set_calls
-    assert ("Exec", "linuxcord run") in desktop.set_calls
+    assert ("Exec", str(freedesktop.launcher_script)) in desktop.set_calls
     assert ("Terminal", "false") in desktop.set_calls
     assert ("Categories", "Network;InstantMessaging;") in desktop.set_calls
     assert ("StartupWMClass", "discord") in desktop.set_calls
@@ -68,6 +72,129 @@ def test_create_desktop_entry_writes_expected_values(
     assert desktop.written_paths == [str(desktop_entry_path)]
 
 
+def test_create_desktop_entry_quotes_launcher_path_with_spaces(
+    tmp_path: Path, mocker: MockerFixture
+) -> None:
+    xdg = MockPyXDG(xdg_data_home=tmp_path / "my data")
+    freedesktop = FreeDesktop(LinuxcordPaths(xdg))
+    desktop = StubDesktopEntry()
+    _ = mocker.patch("linuxcord.freedesktop.DesktopEntry", return_value=desktop)
+
+    _ = freedesktop.create_desktop_entry()
+
+    assert ("Exec", f'"{freedesktop.launcher_script}"') in desktop.set_calls
+
+
+def _install_fake_discord(paths: LinuxcordPaths, tmp_path: Path) -> Path:
+    marker = tmp_path / "launched"
+    version_dir = paths.discord_paths(DiscordVersion("1.0.0")).dir
+    version_dir.mkdir(parents=True)
+    executable = version_dir / "Discord"
+    _ = executable.write_text(f'#!/bin/sh\necho "discord $PWD" > "{marker}"\n')
+    executable.chmod(0o755)
+    paths.discord_current_version_dir_symlink.symlink_to(version_dir)
+    return marker
+
+
+def _run_launcher_script(
+    script: Path, tmp_path: Path, extra_env: dict[str, str] | None = None
+) -> None:
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir(exist_ok=True)
+    fake_linuxcord = bin_dir / "linuxcord"
+    _ = fake_linuxcord.write_text(
+        f'#!/bin/sh\necho "linuxcord $*" > "{tmp_path / "launched"}"\n'
+    )
+    fake_linuxcord.chmod(0o755)
+    env = dict(os.environ, PATH=f"{bin_dir}:{os.environ.get('PATH', '')}")
+    env.update(extra_env or {})
+    _ = subprocess.run([str(script)], env=env, check=True)
+
+
+@pytest.mark.skipif(
+    os.geteuid() == 0, reason="launcher script defers to Python as root"
+)
+def test_launcher_script_execs_discord_while_check_is_fresh(tmp_path: Path) -> None:
+    paths = LinuxcordPaths(
+        MockPyXDG(xdg_data_home=tmp_path / "data", xdg_state_home=tmp_path / "state")
+    )
+    paths.ensure_base_dirs()
+    marker = _install_fake_discord(paths, tmp_path)
+    _ = paths.update_check_file.write_text(f"{int(time.time()) + 600}\n")
+
+    script = FreeDesktop(paths).create_launcher_script()
+    _run_launcher_script(script, tmp_path)
+
+    version_dir = paths.discord_paths(DiscordVersion("1.0.0")).dir
+    assert marker.read_text() == f"discord {version_dir}\n"
+
+
+@pytest.mark.parametrize("stamp", [None, "0", "garbage"])
+def test_launcher_script_falls_back_to_linuxcord_run(
+    tmp_path: Path, stamp: str | None
+) -> None:
+    paths = LinuxcordPaths(
+        MockPyXDG(xdg_data_home=tmp_path / "data", xdg_state_home=tmp_path / "state")
+    )
+    paths.ensure_base_dirs()
+    marker = _install_fake_discord(paths, tmp_path)
+    if stamp is not None:
+        _ = paths.update_check_file.write_text(f"{stamp}\n")
+
+    script = FreeDesktop(paths).create_launcher_script()
+    _run_launcher_script(script, tmp_path)
+
+    assert os.access(script, os.X_OK)
+    assert marker.read_text() == "linuxcord run\n"
+
+
+def test_launcher_script_hands_launch_options_to_linuxcord_run(
+    tmp_path: Path,
+) -> None:
+    paths = LinuxcordPaths(
+        MockPyXDG(xdg_data_home=tmp_path / "data", xdg_state_home=tmp_path / "state")
+    )
+    paths.ensure_base_dirs()
+    marker = _install_fake_discord(paths, tmp_path)
+    _ = paths.update_check_file.write_text(f"{int(time.time()) + 600}\n")
+
+    script = FreeDesktop(paths).create_launcher_script()
+    _run_launcher_script(script, tmp_path, {"LINUXCORD_PREWARM": "true"})
+    assert marker.read_text() == "linuxcord run\n"
+
+    _ = marker.write_text("")
+    _run_launcher_script(script, tmp_path, {"LINUXCORD_MIRROR": "1"})
+    assert marker.read_text() == "linuxcord run\n"
+
+    _ = marker.write_text("")
+    _run_launcher_script(script, tmp_path, {"LINUXCORD_LIMITS": "CPUWeight=50"})
+    assert marker.read_text() == "linuxcord run\n"
+
+
+def test_launcher_script_keeps_the_install_options(tmp_path: Path) -> None:
+    store = tmp_path / "shared store"
+    paths = LinuxcordPaths(
+        MockPyXDG(xdg_data_home=tmp_path / "data", xdg_state_home=tmp_path / "state"),
+        store_dir=store,
+    )
+    paths.ensure_base_dirs()
+    marker = _install_fake_discord(paths, tmp_path)
+
+    script = FreeDesktop(paths, durable=True).create_launcher_script()
+    _run_launcher_script(script, tmp_path)
+
+    assert marker.read_text() == f"linuxcord --store {store} --durable run\n"
+
+    root = tmp_path / "root"
+    paths = LinuxcordPaths(MockPyXDG(xdg_data_home=tmp_path), versions_root=root)
+    assert FreeDesktop(paths).run_command() == [
+        "linuxcord",
+        "--versions-root",
+        str(root),
+        "run",
+    ]
+
+
 def test_create_application_symlink_requires_desktop_entry(
     tmp_path: Path, mocker: MockerFixture
 ) -> None:
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+from typing import cast
+
+import pytest
+from pytest_mock import MockerFixture
+
+from linuxcord import fsutil
+
+
+def test_replace_symlink_creates_and_replaces_link(tmp_path: Path) -> None:
+    link = tmp_path / "current"
+    first = tmp_path / "a"
+    second = tmp_path / "b"
+
+    fsutil.replace_symlink(link, first)
+    assert link.readlink() == first
+
+    fsutil.replace_symlink(link, second)
+    assert link.readlink() == second
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["current"]
+
+
+def make_tree(path: Path, content: str) -> None:
+    path.mkdir()
+    _ = (path / "file.txt").write_text(content)
+
+
+def test_swap_in_directory_without_existing_destination(tmp_path: Path) -> None:
+    staged = tmp_path / "staged"
+    destination = tmp_path / "dest"
+    make_tree(staged, "new")
+
+    assert fsutil.swap_in_directory(staged, destination) is None
+    assert (destination / "file.txt").read_text() == "new"
+    assert not staged.exists()
+
+
+@pytest.mark.parametrize("exchange", [True, False])
+def test_swap_in_directory_returns_previous_tree(
+    tmp_path: Path, mocker: MockerFixture, exchange: bool
+) -> None:
+    staged = tmp_path / "staged"
+    destination = tmp_path / "dest"
+    make_tree(staged, "new")
+    make_tree(destination, "old")
+    if not exchange:
+        _ = mocker.patch.object(fsutil, "exchange_paths", return_value=False)
+
+    previous = fsutil.swap_in_directory(staged, destination)
+
+    assert previous is not None
+    assert (destination / "file.txt").read_text() == "new"
+    assert (previous / "file.txt").read_text() == "old"
+
+
+def test_delete_tree_does_not_follow_symlinks(tmp_path: Path) -> None:
+    outside = tmp_path / "outside"
+    make_tree(outside, "keep")
+    tree = tmp_path / "tree"
+    for depth in range(3):
+        level = tree.joinpath(*[f"d{i}" for i in range(depth + 1)])
+        level.mkdir(parents=True)
+        for index in range(5):
+            _ = (level / f"f{index}").write_text("x")
+    (tree / "d0" / "link").symlink_to(outside)
+
+    fsutil.delete_tree(tree, max_workers=3)
+
+    assert not tree.exists()
+    assert (outside / "file.txt").read_text() == "keep"
+
+
+def test_remove_tree_moves_aside_before_deleting(
+    tmp_path: Path, mocker: MockerFixture
+) -> None:
+    tree = tmp_path / "tree"
+    make_tree(tree, "old")
+    spawn = mocker.patch.object(fsutil, "spawn_deleter")
+
+    fsutil.remove_tree(tree, background=True)
+
+    assert not tree.exists()
+    (trashed,) = cast(list[Path], spawn.call_args.args[0])
+    assert trashed.parent == tmp_path
+    assert trashed.name.startswith(".tree.") and trashed.name.endswith(".deleting")
+    assert (trashed / "file.txt").exists()
+
+    fsutil.remove_tree(trashed, trash_dir=tmp_path / "trash")
+    assert list(tmp_path.iterdir()) == [tmp_path / "trash"]
+
+
+def test_spawn_deleter_deletes_in_a_detached_process(tmp_path: Path) -> None:
+    tree = tmp_path / "tree"
+    make_tree(tree, "old")
+
+    fsutil.spawn_deleter([tree])
+
+    # The deleter is nobody's child here, so there is nothing to reap.
+    with pytest.raises(ChildProcessError):
+        _ = os.waitpid(-1, os.WNOHANG)
+    deadline = time.monotonic() + 10
+    while tree.exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not tree.exists()
+
+
+def test_clone_tree_keeps_contents_modes_and_mtimes(tmp_path: Path) -> None:
+    source = tmp_path / "source"
+    (source / "resources").mkdir(parents=True)
+    executable = source / "Discord"
+    _ = executable.write_text("#!/bin/sh\n")
+    executable.chmod(0o755)
+    os.utime(executable, ns=(1_000_000_000, 1_000_000_000))
+    _ = (source / "resources" / "app.asar").write_bytes(b"asar")
+    (source / "link").symlink_to("Discord")
+
+    method = fsutil.clone_tree(source, tmp_path / "clone")
+
+    clone = tmp_path / "clone"
+    assert method in ("reflink", "hardlink", "copy")
+    assert (clone / "Discord").read_text() == "#!/bin/sh\n"
+    assert (clone / "Discord").stat().st_mode & 0o777 == 0o755
+    assert (clone / "Discord").stat().st_mtime_ns == 1_000_000_000
+    assert (clone / "resources" / "app.asar").read_bytes() == b"asar"
+    assert (clone / "link").readlink() == Path("Discord")
+
+
+def test_clone_file_falls_back_to_copy(tmp_path: Path, mocker: MockerFixture) -> None:
+    source = tmp_path / "source"
+    _ = source.write_bytes(b"data")
+    _ = mocker.patch("linuxcord.fsutil._reflink", return_value=False)
+    _ = mocker.patch("linuxcord.fsutil.os.link", side_effect=OSError("EXDEV"))
+
+    assert fsutil.clone_file(source, tmp_path / "copy") == "copy"
+    assert (tmp_path / "copy").read_bytes() == b"data"
+    assert (tmp_path / "copy").stat().st_ino != source.stat().st_ino
+
+
+def test_sync_filesystems_syncs_each_filesystem_once(
+    tmp_path: Path, mocker: MockerFixture
+) -> None:
+    syncfs = mocker.Mock(return_value=0)
+    _ = mocker.patch.object(fsutil, "_syncfs", return_value=syncfs)
+    (tmp_path / "tree").mkdir()
+    _ = (tmp_path / "tarball").write_bytes(b"")
+
+    fsutil.sync_filesystems(tmp_path / "tree", tmp_path / "tarball")
+    assert syncfs.call_count == 1
+
+    _ = mocker.patch.object(fsutil, "_syncfs", return_value=None)
+    sync = mocker.patch("os.sync")
+    fsutil.sync_filesystems(tmp_path / "tree")
+    sync.assert_called_once_with()
+
+    fsutil.fsync_directory(tmp_path / "tree")
+
+
+def test_deny_shared_writes_leaves_only_the_owner_writing(tmp_path: Path) -> None:
+    tree = tmp_path / "tree"
+    (tree / "sub").mkdir(parents=True)
+    _ = (tree / "sub" / "file").write_text("data")
+    (tree / "link").symlink_to("sub/file")
+    for path in (tree, tree / "sub", tree / "sub" / "file"):
+        path.chmod(0o2777 if path.is_dir() else 0o666)
+
+    fsutil.deny_shared_writes(tree)
+
+    assert tree.stat().st_mode & 0o7777 == 0o2755
+    assert (tree / "sub").stat().st_mode & 0o7777 == 0o2755
+    assert (tree / "sub" / "file").stat().st_mode & 0o777 == 0o644
+
+
+def test_chown_tree_does_not_follow_a_symlinked_top(
+    tmp_path: Path, mocker: MockerFixture
+) -> None:
+    victim = tmp_path / "victim"
+    make_tree(victim, "root")
+    link = tmp_path / "link"
+    link.symlink_to(victim)
+    lchown = mocker.patch("linuxcord.fsutil.os.lchown")
+    chown = mocker.patch("linuxcord.fsutil.os.chown")
+
+    fsutil.chown_tree(link, 1234, 1234)
+
+    lchown.assert_called_once_with(link, 1234, 1234)
+    chown.assert_not_called()
+
+
+def test_clone_file_copies_instead_of_hardlinking_when_asked(
+    tmp_path: Path, mocker: MockerFixture
+) -> None:
+    source = tmp_path / "source"
+    _ = source.write_bytes(b"data")
+    _ = mocker.patch("linuxcord.fsutil._reflink", return_value=False)
+
+    assert fsutil.clone_file(source, tmp_path / "linked") == "hardlink"
+    assert fsutil.clone_file(source, tmp_path / "copy", hardlink=False) == "copy"
+    assert (tmp_path / "copy").read_bytes() == b"data"
+    assert (tmp_path / "copy").stat().st_ino != source.stat().st_ino
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import gzip
+import io
+import random
+import tarfile
+from pathlib import Path
+
+import pytest
+
+from linuxcord.gzindex import GzipIndex, build_index
+
+
+def write_tarball(path: Path) -> dict[str, bytes]:
+    rng = random.Random(1234)
+    contents: dict[str, bytes] = {}
+    with tarfile.open(path, "w:gz") as tar:
+        for index in range(12):
+            # Mix incompressible and repetitive data so deflate blocks end at
+            # assorted bit offsets.
+            noise = rng.randbytes(rng.randint(0, 40_000))
+            text = f"discord file {index} ".encode() * rng.randint(0, 8_000)
+            data = noise + text
+            info = tarfile.TarInfo(f"Discord/file{index}")
+            info.size = len(data)
+            info.mode = 0o755 if index % 2 else 0o644
+            tar.addfile(info, io.BytesIO(data))
+            contents[info.name] = data
+    return contents
+
+
+@pytest.fixture()
+def tarball(tmp_path: Path) -> Path:
+    path = tmp_path / "discord.tar.gz"
+    _ = write_tarball(path)
+    return path
+
+
+def test_build_index_records_checkpoints_and_members(tarball: Path) -> None:
+    index = build_index(tarball, span=32 * 1024)
+
+    assert index.compressed_size == tarball.stat().st_size
+    assert len(index.checkpoints) > 3
+    assert index.checkpoints[0].out_offset == 0
+    assert {checkpoint.bits for checkpoint in index.checkpoints} != {0}
+    assert sorted(index.members) == sorted(f"Discord/file{i}" for i in range(12))
+
+
+def test_read_range_matches_full_decompression(tarball: Path) -> None:
+    index = build_index(tarball, span=32 * 1024)
+    raw = gzip.decompress(tarball.read_bytes())
+    rng = random.Random(99)
+    offsets = [0, 1, len(raw) - 1] + [rng.randrange(len(raw)) for _ in range(50)]
+
+    with tarball.open("rb") as source:
+        for offset in offsets:
+            end = min(offset + 4096, len(raw))
+            data = b"".join(index.read_range(source, offset, end - offset))
+            assert data == raw[offset:end]
+
+
+def test_index_round_trips_through_file(tarball: Path, tmp_path: Path) -> None:
+    index = build_index(tarball, span=32 * 1024)
+    index_path = tmp_path / "discord.tar.gz.idx"
+
+    index.save(index_path)
+
+    assert GzipIndex.load(index_path) == index
+
+
+def test_load_rejects_other_files(tmp_path: Path) -> None:
+    index_path = tmp_path / "not-an-index"
+    _ = index_path.write_bytes(b"garbage")
+
+    with pytest.raises(ValueError, match="not a linuxcord gzip index"):
+        _ = GzipIndex.load(index_path)
+
+
+def test_extract_member_restores_content_and_mode(tmp_path: Path) -> None:
+    tarball = tmp_path / "discord.tar.gz"
+    contents = write_tarball(tarball)
+    index = build_index(tarball, span=32 * 1024)
+    dest = tmp_path / "out" / "file7"
+    dest.parent.mkdir()
+    _ = dest.write_bytes(b"corrupted")
+
+    index.extract_member(tarball, "Discord/file7", dest)
+
+    assert dest.read_bytes() == contents["Discord/file7"]
+    assert dest.stat().st_mode & 0o777 == 0o755
+    assert list(dest.parent.iterdir()) == [dest]
+
+
+def test_extract_member_rejects_unknown_member(tarball: Path, tmp_path: Path) -> None:
+    index = build_index(tarball)
+
+    with pytest.raises(KeyError, match="not a file in the indexed tarball"):
+        index.extract_member(tarball, "Discord/missing", tmp_path / "missing")
@@ -1,20 +1,33 @@
 from __future__ import annotations
 
 import io
+import os
 import shutil
 import tarfile
-from collections.abc import Iterator
+import time
+from collections.abc import Iterator, Sequence
 from pathlib import Path
+from typing import cast
 
 import pytest
 from pytest_mock import MockerFixture
 import requests
 
-from linuxcord.installer import DiscordInstaller
+from linuxcord import installer as installer_module
+from linuxcord.installer import (
+    DiscordInstaller,
+    RetentionPolicy,
+    StoreInstallError,
+    locale_selection,
+    register_store_user,
+)
+from linuxcord.manifest import FileRecord, InstallRecord, ManifestStore
 from linuxcord.paths import LinuxcordPaths
 from linuxcord.types import DiscordVersion
 from tests.helpers import MockPyXDG
 
+DAY = 24 * 60 * 60
+
 
 def write_tarball(
     dest: Path,
@@ -22,6 +35,7 @@ def write_tarball(
     *,
     include_icon: bool = True,
     build_version: str | None = None,
+    locales: Sequence[str] = (),
 ) -> None:
     contents_dir = dest.parent / "archive-contents"
     if contents_dir.exists():
@@ -36,6 +50,10 @@ def write_tarball(
         f'{{"version": "{build_version or version}"}}'
     )
 
+    for locale in locales:
+        (discord_dir / "locales").mkdir(exist_ok=True)
+        _ = (discord_dir / "locales" / f"{locale}.pak").write_text(locale)
+
     with tarfile.open(dest, "w:gz") as tar:
         tar.add(discord_dir, arcname="Discord")
 
@@ -86,6 +104,76 @@ def test_install_extracts_and_validates_archive(
     assert result.icon.exists()
     assert result.build_info.read_text() == '{"version": "1.2.3"}'
     assert (paths.data_dir / "discord.png").exists()
+    assert paths.cached_tarball(version).exists()
+    assert paths.tarball_index(version).exists()
+    assert list(paths.tarball_cache_dir.glob(".*")) == []
+    record = ManifestStore(paths).load().install_record(version)
+    assert record is not None
+    assert sorted(record.files) == [
+        "Discord",
+        "discord.png",
+        "resources/build_info.json",
+    ]
+
+
+def test_durable_install_flushes_before_swapping_and_linking(
+    tmp_path: Path, mocker: MockerFixture, session: requests.Session
+) -> None:
+    paths = create_installer(tmp_path, session)[1]
+    installer = DiscordInstaller(paths, session, durable=True)
+    version = DiscordVersion("1.2.3")
+    events: list[str] = []
+    destination = paths.discord_paths(version).dir
+
+    def download_tarball(_url: str, dest: Path) -> None:
+        write_tarball(dest, version.string)
+
+    def sync(*synced: Path) -> None:
+        assert not destination.exists()
+        assert (synced[0] / "Discord" / "Discord").exists()
+        events.append("sync")
+
+    def fsync_directory(path: Path) -> None:
+        events.append(f"fsync {path.name}")
+
+    _ = mocker.patch.object(
+        installer, "_download_tarball", side_effect=download_tarball
+    )
+    _ = mocker.patch.object(installer_module, "sync_filesystems", side_effect=sync)
+    fsync = mocker.patch.object(
+        installer_module, "fsync_directory", side_effect=fsync_directory
+    )
+
+    _ = installer.install(version, "https://example.com/discord.tar.gz")
+    installer.link_current(version)
+
+    assert events == ["sync", "fsync versions", "fsync tarballs", "fsync versions"]
+    fsync.assert_called_with(paths.discord_current_version_dir_symlink.parent)
+
+
+def test_install_extracts_only_the_kept_locales(
+    tmp_path: Path, mocker: MockerFixture, session: requests.Session
+) -> None:
+    installer, paths = create_installer(tmp_path, session)
+    version = DiscordVersion("1.2.3")
+
+    def download_tarball(_url: str, dest: Path) -> None:
+        write_tarball(dest, version.string, locales=["de", "en-US", "fr", "pt-BR"])
+
+    _ = mocker.patch.object(
+        installer, "_download_tarball", side_effect=download_tarball
+    )
+    keep = locale_selection(["pt-br", " de", ""])
+    assert keep == ("de", "en-US", "pt-br")
+
+    result = installer.install(version, "https://example.com/dl", keep_locales=keep)
+
+    kept = sorted(path.name for path in (result.dir / "locales").iterdir())
+    assert kept == ["de.pak", "en-US.pak", "pt-BR.pak"]
+    record = ManifestStore(paths).load().install_record(version)
+    assert record is not None
+    assert record.locales == keep
+    assert "locales/fr.pak" not in record.files
 
 
 def test_install_overwrites_destination_when_forced(
@@ -114,6 +202,121 @@ def test_install_overwrites_destination_when_forced(
     assert result.executable.exists()
 
 
+def create_store_installer(
+    tmp_path: Path, session: requests.Session
+) -> tuple[DiscordInstaller, LinuxcordPaths]:
+    xdg = MockPyXDG(
+        xdg_data_home=tmp_path, xdg_cache_home=tmp_path, xdg_state_home=tmp_path
+    )
+    paths = LinuxcordPaths(xdg, store_dir=tmp_path / "store")
+    paths.ensure_base_dirs()
+    return DiscordInstaller(paths, session), paths
+
+
+def test_store_install_is_read_only_to_other_users(
+    tmp_path: Path, mocker: MockerFixture, session: requests.Session
+) -> None:
+    installer, _paths = create_store_installer(tmp_path, session)
+    version = DiscordVersion("2.1.0")
+
+    def download_tarball(_url: str, dest: Path) -> None:
+        # Without directory members, tar creates the parents itself.
+        with tarfile.open(dest, "w:gz") as tar:
+            for name, data in (
+                ("Discord/Discord", b"#!/bin/sh\n"),
+                ("Discord/discord.png", b"icon"),
+                ("Discord/resources/build_info.json", b'{"version": "2.1.0"}'),
+            ):
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+
+    _ = mocker.patch.object(
+        installer, "_download_tarball", side_effect=download_tarball
+    )
+    umask = os.umask(0o002)
+    try:
+        result = installer.install(version, "https://example.com/discord.tar.gz")
+    finally:
+        _ = os.umask(umask)
+
+    for path in (result.dir, *result.dir.rglob("*")):
+        assert path.stat().st_mode & 0o022 == 0, path
+
+
+def test_forced_store_install_refuses_another_users_install(
+    tmp_path: Path, mocker: MockerFixture, session: requests.Session
+) -> None:
+    installer, paths = create_store_installer(tmp_path, session)
+    version = DiscordVersion("2.1.0")
+    existing = paths.discord_paths(version).dir
+    existing.mkdir(parents=True)
+    _ = mocker.patch(
+        "linuxcord.installer.os.geteuid", return_value=existing.stat().st_uid + 1
+    )
+    download = mocker.patch.object(installer, "_download_tarball")
+
+    with pytest.raises(StoreInstallError, match="only they or root"):
+        _ = installer.install(version, "https://example.com/discord.tar.gz", force=True)
+
+    download.assert_not_called()
+    assert existing.exists()
+
+
+def test_forced_install_keeps_existing_tree_when_new_one_is_invalid(
+    tmp_path: Path, mocker: MockerFixture, session: requests.Session
+) -> None:
+    installer, paths = create_installer(tmp_path, session)
+    version = DiscordVersion("2.0.0")
+    existing = paths.discord_paths(version).dir
+    existing.mkdir(parents=True)
+    kept_file = existing / "kept.txt"
+    _ = kept_file.write_text("old")
+
+    def download_tarball(_url: str, dest: Path) -> None:
+        write_tarball(dest, version.string, build_version="2.0.1")
+
+    _ = mocker.patch.object(
+        installer, "_download_tarball", side_effect=download_tarball
+    )
+
+    with pytest.raises(ValueError):
+        _ = installer.install(version, "https://example.com/discord.tar.gz", force=True)
+
+    assert kept_file.read_text() == "old"
+    assert sorted(p.name for p in existing.parent.iterdir()) == [
+        ".staging",
+        version.string,
+    ]
+    assert list(paths.staging_dir.iterdir()) == []
+
+
+def test_install_stages_beside_versions_and_discards_orphans(
+    tmp_path: Path, mocker: MockerFixture, session: requests.Session
+) -> None:
+    installer, paths = create_installer(tmp_path, session)
+    version = DiscordVersion("2.1.0")
+    orphan = paths.staging_dir / "2.0.9.crashed"
+    (orphan / "Discord").mkdir(parents=True)
+
+    def download_tarball(_url: str, dest: Path) -> None:
+        write_tarball(dest, version.string)
+
+    _ = mocker.patch.object(
+        installer, "_download_tarball", side_effect=download_tarball
+    )
+    extract = mocker.spy(installer_module, "_extract_tarball")
+
+    result = installer.install(version, "https://example.com/discord.tar.gz")
+
+    assert result.executable.exists()
+    staged_in = cast(Path, extract.call_args.args[1])
+    assert staged_in.parent == paths.staging_dir
+    assert list(paths.staging_dir.iterdir()) == []
+    (trashed,) = paths.trash_dir.iterdir()
+    assert trashed.name.startswith(f"{orphan.name}.")
+
+
 def test_install_refuses_existing_destination_without_force(
     tmp_path: Path, mocker: MockerFixture, session: requests.Session
 ) -> None:
@@ -207,6 +410,77 @@ def test_install_rejects_unsafe_tar_entries(
 
     download.assert_called_once()
     assert not paths.discord_paths(version).dir.exists()
+    assert list(paths.tarball_cache_dir.iterdir()) == []
+
+
+@pytest.mark.parametrize(
+    ("kind", "linkname"),
+    [
+        (tarfile.SYMTYPE, "/etc/passwd"),
+        (tarfile.SYMTYPE, "../../.."),
+        (tarfile.LNKTYPE, "../outside"),
+        (tarfile.CHRTYPE, ""),
+    ],
+)
+def test_install_rejects_unsafe_member_after_extracting_others(
+    tmp_path: Path,
+    mocker: MockerFixture,
+    session: requests.Session,
+    kind: bytes,
+    linkname: str,
+) -> None:
+    installer, paths = create_installer(tmp_path, session)
+    version = DiscordVersion("8.1.0")
+
+    def download_tarball(_url: str, dest: Path) -> None:
+        with tarfile.open(dest, "w:gz") as tar:
+            data = b"fine"
+            good = tarfile.TarInfo("Discord/resources/good.txt")
+            good.size = len(data)
+            tar.addfile(good, io.BytesIO(data))
+            bad = tarfile.TarInfo("Discord/resources/bad")
+            bad.type = kind
+            bad.linkname = linkname
+            tar.addfile(bad)
+
+    _ = mocker.patch.object(
+        installer, "_download_tarball", side_effect=download_tarball
+    )
+
+    with pytest.raises(ValueError, match="not allowed|outside the archive"):
+        _ = installer.install(version, "https://example.com/discord.tar.gz")
+
+    assert not paths.discord_paths(version).dir.exists()
+    assert list(paths.staging_dir.iterdir()) == []
+
+
+def test_install_rejects_links_chained_outside_the_staging_dir(
+    tmp_path: Path, mocker: MockerFixture, session: requests.Session
+) -> None:
+    installer, paths = create_installer(tmp_path, session)
+    version = DiscordVersion("8.2.0")
+
+    def download_tarball(_url: str, dest: Path) -> None:
+        with tarfile.open(dest, "w:gz") as tar:
+            for name in ("Discord/a", "Discord/a/b"):
+                link = tarfile.TarInfo(name)
+                link.type = tarfile.SYMTYPE
+                link.linkname = ".."
+                tar.addfile(link)
+            data = b"escaped"
+            escaped = tarfile.TarInfo("Discord/a/b/escaped.txt")
+            escaped.size = len(data)
+            tar.addfile(escaped, io.BytesIO(data))
+
+    _ = mocker.patch.object(
+        installer, "_download_tarball", side_effect=download_tarball
+    )
+
+    with pytest.raises(ValueError, match="Unsafe member"):
+        _ = installer.install(version, "https://example.com/discord.tar.gz")
+
+    assert list(tmp_path.rglob("escaped.txt")) == []
+    assert not paths.discord_paths(version).dir.exists()
 
 
 def test_link_current_updates_symlink(
@@ -226,6 +500,10 @@ def test_link_current_updates_symlink(
 
     installer.link_current(version_b)
     assert paths.discord_current_version_dir_symlink.readlink() == target_b
+    assert sorted(p.name for p in paths.discord_versions_dir.iterdir()) == sorted(
+        ["current", version_a.string, version_b.string]
+    )
+    assert ManifestStore(paths).load().current == version_b
 
 
 def test_prune_removes_old_versions(tmp_path: Path, session: requests.Session) -> None:
@@ -239,12 +517,106 @@ def test_prune_removes_old_versions(tmp_path: Path, session: requests.Session) -
     current_dir.mkdir(parents=True)
     old_dir.mkdir(parents=True)
     paths.discord_current_version_dir_symlink.symlink_to(current_dir)
+    paths.tarball_cache_dir.mkdir(parents=True)
+    for version in (current_version, old_version):
+        _ = paths.cached_tarball(version).write_bytes(b"tarball")
+        _ = paths.tarball_index(version).write_bytes(b"index")
 
-    installer.prune_old_versions(current_version)
+    pruned = installer.prune_old_versions(current_version, RetentionPolicy(keep=0))
 
+    assert pruned == [old_version]
     assert current_dir.exists()
     assert not old_dir.exists()
+    assert len(list(paths.trash_dir.iterdir())) == 1
     assert paths.discord_current_version_dir_symlink.exists()
+    assert paths.cached_tarball(current_version).exists()
+    assert not paths.cached_tarball(old_version).exists()
+    assert not paths.tarball_index(old_version).exists()
+
+
+def test_prune_in_the_store_keeps_what_any_user_runs(
+    tmp_path: Path, session: requests.Session
+) -> None:
+    installer, paths = create_store_installer(tmp_path, session)
+    versions = [DiscordVersion(f"14.0.{n}") for n in range(4)]
+    store_manifest = ManifestStore(paths, paths.store_manifest_file)
+    for version in versions:
+        paths.discord_paths(version).dir.mkdir()
+        _ = paths.cached_tarball(version).write_bytes(b"tarball")
+        _ = paths.tarball_index(version).write_bytes(b"index")
+        store_manifest.add_install(
+            InstallRecord(version, 1.0, {"Discord": FileRecord(1, 2, "00")})
+        )
+    current = versions[3]
+    paths.discord_current_version_dir_symlink.symlink_to(
+        paths.discord_paths(current).dir
+    )
+    ManifestStore(paths).record_current(current)
+    users_dir = paths.store_users_dir
+    assert users_dir is not None
+    # Another user still on 14.0.1, and this user's own registration.
+    _ = (users_dir / "60001").write_text("14.0.1\n")
+    register_store_user(paths)
+    assert paths.store_user_file is not None
+    assert paths.store_user_file.read_text() == "14.0.3\n"
+
+    pruned = installer.prune_old_versions(current, RetentionPolicy(keep=0))
+
+    assert pruned == [versions[2], versions[0]]
+    for version in versions:
+        kept = version in (versions[1], current)
+        assert paths.discord_paths(version).dir.exists() == kept
+        assert paths.cached_tarball(version).exists() == kept
+        assert paths.tarball_index(version).exists() == kept
+    assert sorted(store_manifest.load().installs) == ["14.0.1", "14.0.3"]
+
+
+def test_prune_in_the_store_stops_at_an_unreadable_user_file(
+    tmp_path: Path, mocker: MockerFixture, session: requests.Session
+) -> None:
+    installer, paths = create_store_installer(tmp_path, session)
+    old, current = DiscordVersion("14.1.0"), DiscordVersion("14.1.1")
+    for version in (old, current):
+        paths.discord_paths(version).dir.mkdir()
+    assert paths.store_users_dir is not None
+    _ = (paths.store_users_dir / "60001").write_text("14.1.0\n")
+    _ = mocker.patch.object(Path, "read_text", side_effect=PermissionError)
+
+    assert installer.prune_old_versions(current, RetentionPolicy(keep=0)) == []
+    assert paths.discord_paths(old).dir.exists()
+
+
+def test_prune_keeps_recent_versions_by_policy(
+    tmp_path: Path, session: requests.Session
+) -> None:
+    installer, paths = create_installer(tmp_path, session)
+    paths.ensure_base_dirs()
+    now = time.time()
+    ages = {"1.0.0": 30 * DAY, "1.0.1": 20 * DAY, "1.0.2": 2 * DAY, "1.0.3": DAY}
+
+    def create_old_installs() -> None:
+        for version, age in ages.items():
+            install_dir = paths.discord_paths(DiscordVersion(version)).dir
+            install_dir.mkdir(parents=True, exist_ok=True)
+            os.utime(install_dir, (now - age, now - age))
+
+    create_old_installs()
+    current_version = DiscordVersion("1.0.4")
+    paths.discord_paths(current_version).dir.mkdir(parents=True)
+    (paths.discord_versions_dir / ".other").mkdir()
+
+    assert installer.prune_old_versions(current_version) == [
+        DiscordVersion("1.0.2"),
+        DiscordVersion("1.0.1"),
+        DiscordVersion("1.0.0"),
+    ]
+    assert paths.discord_paths(DiscordVersion("1.0.3")).dir.exists()
+
+    create_old_installs()
+    policy = RetentionPolicy(keep=0, keep_within=7 * DAY)
+    pruned = installer.prune_old_versions(current_version, policy)
+    assert sorted(pruned) == [DiscordVersion("1.0.0"), DiscordVersion("1.0.1")]
+    assert (paths.discord_versions_dir / ".other").exists()
 
 
 def test_prune_respects_no_pruning_flag(
@@ -263,8 +635,41 @@ def test_prune_respects_no_pruning_flag(
     no_pruning_flag = paths.discord_versions_dir / "NO_PRUNING"
     _ = no_pruning_flag.write_text("")
 
-    installer.prune_old_versions(current_version)
+    _ = installer.prune_old_versions(current_version)
 
     assert current_dir.exists()
     assert old_dir.exists()
     assert no_pruning_flag.exists()
+
+
+def test_prune_finds_no_pruning_flag_under_versions_root(
+    tmp_path: Path, session: requests.Session
+) -> None:
+    xdg = MockPyXDG(xdg_data_home=tmp_path / "data", xdg_state_home=tmp_path)
+    paths = LinuxcordPaths(xdg, versions_root=tmp_path / "local")
+    paths.ensure_base_dirs()
+    installer = DiscordInstaller(paths, session)
+    for name in ("13.0.0", "13.0.1", "13.0.2"):
+        paths.discord_paths(DiscordVersion(name)).dir.mkdir(parents=True)
+    _ = (paths.install_dir / "NO_PRUNING").write_text("")
+
+    pruned = installer.prune_old_versions(DiscordVersion("13.0.2"))
+
+    assert pruned == []
+    assert paths.discord_paths(DiscordVersion("13.0.0")).dir.exists()
+
+
+def test_prune_keeps_pinned_version(tmp_path: Path, session: requests.Session) -> None:
+    installer, paths = create_installer(tmp_path, session)
+    paths.ensure_base_dirs()
+    pinned_version = DiscordVersion("1.0.0")
+    for name in ("1.0.0", "1.0.1", "1.0.2"):
+        paths.discord_paths(DiscordVersion(name)).dir.mkdir(parents=True)
+    ManifestStore(paths).record_pin(pinned_version)
+
+    pruned = installer.prune_old_versions(
+        DiscordVersion("1.0.2"), RetentionPolicy(keep=0)
+    )
+
+    assert pruned == [DiscordVersion("1.0.1")]
+    assert paths.discord_paths(pinned_version).dir.exists()
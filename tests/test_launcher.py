@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 from typing import cast
 
@@ -7,6 +8,8 @@ import pytest
 from pytest_mock import MockerFixture
 
 from linuxcord.launcher import DiscordLauncher
+from linuxcord.limits import ResourceLimits
+from linuxcord.mirror import MirrorResult
 from linuxcord.paths import DiscordPaths, LinuxcordPaths
 from linuxcord.types import DiscordVersion
 
@@ -68,3 +71,127 @@ def test_launch_invokes_popen_with_expected_values(
     assert call.kwargs["cwd"] == str(install_dir)
     env = cast(dict[str, str], call.kwargs["env"])
     assert "PATH" in env
+
+
+def test_launch_exec_mode_replaces_process(
+    tmp_path: Path, mocker: MockerFixture
+) -> None:
+    install_dir = tmp_path / "install"
+    install_dir.mkdir(parents=True)
+    executable = install_dir / "Discord"
+    _ = executable.write_text("")
+
+    discord_paths = DiscordPaths(install_dir)
+
+    paths = mocker.create_autospec(LinuxcordPaths, instance=True)
+    paths.discord_paths.return_value = discord_paths  # pyright: ignore[reportAny]
+    popen = mocker.Mock()
+    execve = mocker.Mock()
+    launcher = DiscordLauncher(cast(LinuxcordPaths, paths), popen=popen, execve=execve)
+    _ = mocker.patch("os.geteuid", return_value=1000)
+    chdir = mocker.patch("os.chdir")
+
+    launcher.launch(DiscordVersion("2.3.4"), mode="exec")
+
+    popen.assert_not_called()
+    chdir.assert_called_once_with(install_dir)
+    execve.assert_called_once()
+    path, argv, env = cast(tuple[str, list[str], object], execve.call_args.args)
+    assert path == str(executable)
+    assert argv == [str(executable)]
+    assert env is os.environ
+
+
+def test_launch_wraps_discord_in_its_resource_limits(
+    tmp_path: Path, mocker: MockerFixture
+) -> None:
+    install_dir = tmp_path / "install"
+    install_dir.mkdir(parents=True)
+    executable = install_dir / "Discord"
+    _ = executable.write_text("")
+    paths = mocker.create_autospec(LinuxcordPaths, instance=True)
+    discord_paths = DiscordPaths(install_dir)
+    paths.discord_paths.return_value = discord_paths  # pyright: ignore[reportAny]
+    paths.runtime_dir = tmp_path / "runtime"
+    _ = mocker.patch("os.geteuid", return_value=1000)
+    _ = mocker.patch("os.chdir")
+    wrapped = ["/usr/bin/systemd-run", "--user", "--scope", "--", str(executable)]
+    limit_command = mocker.patch(
+        "linuxcord.launcher.limit_command", return_value=wrapped
+    )
+    popen = mocker.Mock()
+    execve = mocker.Mock()
+    limits = ResourceLimits(cpu_weight=50)
+    launcher = DiscordLauncher(
+        cast(LinuxcordPaths, paths), popen=popen, execve=execve, limits=limits
+    )
+
+    launcher.launch(DiscordVersion("2.3.4"), mode="popen")
+    launcher.launch(DiscordVersion("2.3.4"), mode="exec")
+
+    limit_command.assert_called_with([str(executable)], limits, tmp_path / "runtime")
+    assert popen.call_args.args[0] == wrapped
+    execve.assert_called_once_with(wrapped[0], wrapped, os.environ)
+
+
+def test_launch_prewarms_before_exec_and_alongside_popen(
+    tmp_path: Path, mocker: MockerFixture
+) -> None:
+    install_dir = tmp_path / "install"
+    install_dir.mkdir(parents=True)
+    _ = (install_dir / "Discord").write_text("")
+    discord_paths = DiscordPaths(install_dir)
+    paths = mocker.create_autospec(LinuxcordPaths, instance=True)
+    paths.discord_paths.return_value = discord_paths  # pyright: ignore[reportAny]
+    _ = mocker.patch("os.geteuid", return_value=1000)
+    _ = mocker.patch("os.chdir")
+    prewarm = mocker.patch("linuxcord.launcher.prewarm_install")
+    background = mocker.patch("linuxcord.launcher.prewarm_in_background")
+    launcher = DiscordLauncher(
+        cast(LinuxcordPaths, paths),
+        popen=mocker.Mock(),
+        execve=mocker.Mock(),
+        prewarm_patterns=["*.pak"],
+    )
+
+    launcher.launch(DiscordVersion("2.3.4"), mode="exec")
+    prewarm.assert_called_once_with(install_dir, ["*.pak"])
+
+    launcher.launch(DiscordVersion("2.3.4"), mode="popen")
+    background.assert_called_once_with(install_dir, ["*.pak"])
+
+
+def test_launch_from_mirror_falls_back_to_the_install(
+    tmp_path: Path, mocker: MockerFixture
+) -> None:
+    install_dir = tmp_path / "install"
+    install_dir.mkdir(parents=True)
+    _ = (install_dir / "Discord").write_text("")
+    mirrored = tmp_path / "mirror"
+    mirrored.mkdir()
+    _ = (mirrored / "Discord").write_text("")
+    paths = mocker.create_autospec(LinuxcordPaths, instance=True)
+    paths.discord_paths.return_value = DiscordPaths(  # pyright: ignore[reportAny]
+        install_dir
+    )
+    _ = mocker.patch("os.geteuid", return_value=1000)
+    install_mirror = mocker.patch("linuxcord.launcher.InstallMirror")
+    mirror = install_mirror.return_value.mirror  # pyright: ignore[reportAny]
+    mirror.return_value = MirrorResult(mirrored)
+    background = mocker.patch("linuxcord.launcher.prewarm_in_background")
+    popen = mocker.Mock()
+    launcher = DiscordLauncher(
+        cast(LinuxcordPaths, paths),
+        popen=popen,
+        prewarm_patterns=["*.pak"],
+        mirror=True,
+    )
+
+    launcher.launch(DiscordVersion("2.3.4"))
+    assert popen.call_args.kwargs["cwd"] == str(mirrored)
+    background.assert_not_called()
+
+    mirror.side_effect = OSError("no space")
+    launcher.launch(DiscordVersion("2.3.4"))
+    assert popen.call_args.kwargs["cwd"] == str(install_dir)
+    background.assert_called_once_with(install_dir, ["*.pak"])
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import os
+import subprocess
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+from linuxcord import limits as limits_module
+from linuxcord.limits import ResourceLimits, limit_command
+
+
+def fake_which(name: str) -> str:
+    return f"/usr/bin/{name}"
+
+
+def test_parse_reads_systemd_style_settings() -> None:
+    limits = ResourceLimits.parse(
+        [
+            "MemoryHigh=3G",
+            "MemoryMax = 4096M",
+            "CPUWeight=50",
+            "IOWeight=20",
+            "Nice=10",
+            "IOSchedulingClass=idle",
+            "CPUWeight=40",
+        ]
+    )
+
+    assert limits == ResourceLimits(
+        memory_high=3 << 30,
+        memory_max=4 << 30,
+        cpu_weight=40,
+        io_weight=20,
+        nice=10,
+        io_scheduling_class="idle",
+    )
+    assert limits.cgroup_files() == {
+        "memory.high": str(3 << 30),
+        "memory.max": str(4 << 30),
+        "cpu.weight": "40",
+        "io.weight": "default 20",
+    }
+
+
+@pytest.mark.parametrize(
+    "setting",
+    ["MemoryMax", "MemoryMax=lots", "CPUWeight=0", "Nice=20", "Swappiness=1"],
+)
+def test_parse_rejects_invalid_settings(setting: str) -> None:
+    with pytest.raises(ValueError):
+        _ = ResourceLimits.parse([setting])
+
+
+def test_limit_command_uses_a_systemd_scope(
+    mocker: MockerFixture, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    _ = mocker.patch("linuxcord.limits.shutil.which", side_effect=fake_which)
+    monkeypatch.delenv("DBUS_SESSION_BUS_ADDRESS", raising=False)
+    (tmp_path / "bus").touch()
+    limits = ResourceLimits(memory_max=1 << 30, cpu_weight=50, nice=5)
+
+    command = limit_command(["/opt/Discord"], limits, tmp_path)
+
+    assert command == [
+        "/usr/bin/systemd-run",
+        "--user",
+        "--scope",
+        "--quiet",
+        "--collect",
+        f"--property=MemoryMax={1 << 30}",
+        "--property=CPUWeight=50",
+        "--",
+        "/usr/bin/nice",
+        "-n",
+        "5",
+        "/opt/Discord",
+    ]
+
+
+def test_limit_command_only_prefixes_priorities_without_cgroup_settings(
+    mocker: MockerFixture,
+) -> None:
+    _ = mocker.patch("linuxcord.limits.shutil.which", side_effect=fake_which)
+    limits = ResourceLimits(io_scheduling_priority=6)
+
+    command = limit_command(["/opt/Discord"], limits, None)
+
+    assert command == ["/usr/bin/ionice", "-t", "-c", "2", "-n", "6", "/opt/Discord"]
+
+
+def test_limit_command_falls_back_to_a_cgroup_leaf(
+    mocker: MockerFixture, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.delenv("DBUS_SESSION_BUS_ADDRESS", raising=False)
+    _ = mocker.patch("linuxcord.limits.shutil.which", return_value=None)
+    parent = tmp_path / "user.slice"
+    own = parent / "session"
+    own.mkdir(parents=True)
+    _ = (parent / "cgroup.subtree_control").write_text("cpu\n")
+    stale = parent / f"{limits_module.CGROUP_PREFIX}1"
+    stale.mkdir()
+    _ = mocker.patch("linuxcord.limits.CGROUP_ROOT", tmp_path)
+    _ = mocker.patch("linuxcord.limits.own_cgroup", return_value=own)
+    limits = ResourceLimits(memory_high=512 << 20, cpu_weight=25)
+
+    command = limit_command(["/opt/Discord"], limits, tmp_path / "runtime")
+
+    leaf = parent / f"{limits_module.CGROUP_PREFIX}{os.getpid()}"
+    assert not stale.exists()
+    assert (parent / "cgroup.subtree_control").read_text() == "+memory"
+    assert (leaf / "memory.high").read_text() == str(512 << 20)
+    assert (leaf / "cpu.weight").read_text() == "25"
+    assert command[:2] == ["/bin/sh", "-c"]
+    assert command[3:] == [str(leaf / "cgroup.procs"), "/opt/Discord"]
+
+    # The shim enters the cgroup, then becomes the command.
+    shim = command[:4] + ["sh", "-c", 'echo $$ > "$0"', str(tmp_path / "out")]
+    _ = subprocess.run(shim, check=True)
+    entered = (leaf / "cgroup.procs").read_text().strip()
+    assert (tmp_path / "out").read_text().strip() == entered
+
+
+def test_limit_command_launches_unlimited_without_a_cgroup(
+    mocker: MockerFixture,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.delenv("DBUS_SESSION_BUS_ADDRESS", raising=False)
+    _ = mocker.patch("linuxcord.limits.shutil.which", return_value=None)
+    _ = mocker.patch("linuxcord.limits.own_cgroup", return_value=None)
+
+    command = limit_command(["/opt/Discord"], ResourceLimits(io_weight=10), None)
+
+    assert command == ["/opt/Discord"]
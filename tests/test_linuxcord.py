@@ -1,11 +1,18 @@
+import time
 from pathlib import Path
+from typing import cast
 from types import SimpleNamespace
 
+import pytest
 import requests
 from pytest_mock import MockerFixture
 
 from linuxcord import linuxcord
-from linuxcord.paths import LinuxcordPaths
+from linuxcord.freedesktop import FreeDesktop
+from linuxcord.installer import RetentionPolicy
+from linuxcord.locking import InstallLock
+from linuxcord.manifest import ManifestStore
+from linuxcord.paths import HomeXDG, LinuxcordPaths
 from linuxcord.types import DiscordVersion
 from tests.helpers import MockPyXDG
 
@@ -43,17 +50,23 @@ def test_update_prunes_after_install(mocker: MockerFixture, tmp_path: Path) -> N
             download_url: str,
             *,
             force: bool = False,
+            keep_locales: tuple[str, ...] | None = None,
         ) -> SimpleNamespace:
             _ = version
             _ = download_url
             _ = force
+            _ = keep_locales
             return mock_install_result
 
         def link_current(self, version: DiscordVersion) -> None:
             _ = version
 
-        def prune_old_versions(self, version: DiscordVersion) -> None:
+        def prune_old_versions(
+            self, version: DiscordVersion, retention: RetentionPolicy | None
+        ) -> list[DiscordVersion]:
+            _ = retention
             self.pruned_versions.append(version)
+            return []
 
     class DesktopStub:
         def create_desktop_entry(self) -> Path:
@@ -84,3 +97,429 @@ def test_update_prunes_after_install(mocker: MockerFixture, tmp_path: Path) -> N
         )
 
     assert installer_stub.pruned_versions == [latest_version]
+    assert int(paths.update_check_file.read_text()) > time.time()
+
+
+def test_update_rechecks_after_upgrading_lock(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    xdg = MockPyXDG(
+        xdg_data_home=tmp_path / "data",
+        xdg_cache_home=tmp_path / "cache",
+        xdg_state_home=tmp_path / "state",
+    )
+    latest_version = DiscordVersion("13.0.0")
+    # Outdated when first checked, then installed by another process while
+    # this one waited for the exclusive lock.
+    local_versioner = mocker.Mock(
+        get_current_version=mocker.Mock(
+            side_effect=[DiscordVersion("12.9.9"), latest_version]
+        )
+    )
+    online_versioner = mocker.Mock(
+        get_latest_version=mocker.Mock(return_value=latest_version)
+    )
+    _ = mocker.patch("linuxcord.linuxcord.LocalVersioner", return_value=local_versioner)
+    _ = mocker.patch(
+        "linuxcord.linuxcord.OnlineVersioner", return_value=online_versioner
+    )
+    installer = mocker.patch("linuxcord.linuxcord.DiscordInstaller")
+    upgrade = mocker.spy(InstallLock, "upgrade")
+
+    with requests.Session() as session:
+        result = linuxcord.update(xdg=xdg, session=session)
+
+    upgrade.assert_called_once()
+    installer.assert_not_called()
+    assert not result.updated
+    assert result.installed_version == latest_version
+
+
+def test_update_without_changes_keeps_lock_shared(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    xdg = MockPyXDG(
+        xdg_data_home=tmp_path / "data",
+        xdg_cache_home=tmp_path / "cache",
+        xdg_state_home=tmp_path / "state",
+    )
+    version = DiscordVersion("13.0.0")
+    local_versioner = mocker.Mock(get_current_version=mocker.Mock(return_value=version))
+    online_versioner = mocker.Mock(get_latest_version=mocker.Mock(return_value=version))
+    _ = mocker.patch("linuxcord.linuxcord.LocalVersioner", return_value=local_versioner)
+    _ = mocker.patch(
+        "linuxcord.linuxcord.OnlineVersioner", return_value=online_versioner
+    )
+    upgrade = mocker.spy(InstallLock, "upgrade")
+
+    with requests.Session() as session:
+        result = linuxcord.update(xdg=xdg, session=session)
+
+    upgrade.assert_not_called()
+    assert not result.updated
+
+
+def test_run_launches_installed_version_when_lock_is_busy(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    xdg = MockPyXDG(
+        xdg_data_home=tmp_path / "data",
+        xdg_cache_home=tmp_path / "cache",
+        xdg_state_home=tmp_path / "state",
+    )
+    paths = LinuxcordPaths(xdg)
+    version = DiscordVersion("13.0.0")
+    local_versioner = mocker.Mock(get_current_version=mocker.Mock(return_value=version))
+    _ = mocker.patch("linuxcord.linuxcord.LocalVersioner", return_value=local_versioner)
+    online_versioner = mocker.patch("linuxcord.linuxcord.OnlineVersioner")
+    launch = mocker.Mock()
+    _ = mocker.patch(
+        "linuxcord.linuxcord.DiscordLauncher", return_value=mocker.Mock(launch=launch)
+    )
+
+    with InstallLock(paths.lock_file).acquire("exclusive"):
+        linuxcord.run(xdg=xdg, lock_timeout=0.1)
+
+    online_versioner.assert_not_called()
+    launch.assert_called_once_with(version, mode="popen")
+
+
+def test_run_leaves_the_update_check_to_a_running_daemon(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    xdg = MockPyXDG(
+        xdg_data_home=tmp_path / "data",
+        xdg_cache_home=tmp_path / "cache",
+        xdg_state_home=tmp_path / "state",
+        runtime_dir=tmp_path / "runtime",
+    )
+    paths = LinuxcordPaths(xdg)
+    socket_path = paths.daemon_socket
+    assert socket_path is not None
+    socket_path.parent.mkdir(parents=True)
+    socket_path.touch()
+    version = DiscordVersion("13.0.0")
+    ask_daemon = mocker.patch(
+        "linuxcord.linuxcord.ask_daemon", return_value={"version": version.string}
+    )
+    local_versioner = mocker.Mock(get_current_version=mocker.Mock(return_value=version))
+    _ = mocker.patch("linuxcord.linuxcord.LocalVersioner", return_value=local_versioner)
+    online_versioner = mocker.patch("linuxcord.linuxcord.OnlineVersioner")
+    online_versioner.return_value.get_latest_version.return_value = (  # pyright: ignore[reportAny]
+        version
+    )
+    launch = mocker.Mock()
+    _ = mocker.patch(
+        "linuxcord.linuxcord.DiscordLauncher", return_value=mocker.Mock(launch=launch)
+    )
+
+    linuxcord.run(xdg=xdg, lock_timeout=5)
+
+    request = {"command": "ready", "install_dir": str(paths.install_dir)}
+    ask_daemon.assert_called_once_with(socket_path, request, 5)
+    online_versioner.assert_not_called()
+    launch.assert_called_once_with(version, mode="popen")
+
+    # Without an answer, run checks for itself.
+    ask_daemon.return_value = None
+    linuxcord.run(xdg=xdg, lock_timeout=5)
+    online_versioner.assert_called_once()
+
+
+def create_installs(paths: LinuxcordPaths, *versions: str) -> None:
+    for version in versions:
+        discord_paths = paths.discord_paths(DiscordVersion(version))
+        discord_paths.build_info.parent.mkdir(parents=True)
+        _ = discord_paths.build_info.write_text(f'{{"version": "{version}"}}')
+        _ = discord_paths.executable.write_text("#!/bin/sh\n")
+
+
+def test_rollback_relinks_previous_install_and_pins_it(tmp_path: Path) -> None:
+    xdg = MockPyXDG(
+        xdg_data_home=tmp_path / "data",
+        xdg_cache_home=tmp_path / "cache",
+        xdg_state_home=tmp_path / "state",
+    )
+    paths = LinuxcordPaths(xdg)
+    create_installs(paths, "1.0.8", "1.0.9", "1.0.10")
+    paths.discord_current_version_dir_symlink.symlink_to(
+        paths.discord_paths(DiscordVersion("1.0.10")).dir
+    )
+
+    version = linuxcord.rollback(xdg=xdg)
+
+    assert version == DiscordVersion("1.0.9")
+    current = paths.discord_current_version_dir_symlink.resolve(strict=True)
+    assert current == paths.discord_paths(version).dir
+    installs = linuxcord.list_versions(xdg=xdg)
+    assert [install.version.string for install in installs] == [
+        "1.0.8",
+        "1.0.9",
+        "1.0.10",
+    ]
+    assert [install.current for install in installs] == [False, True, False]
+    assert [install.pinned for install in installs] == [False, True, False]
+
+    assert linuxcord.unpin(xdg=xdg) == version
+    assert not any(install.pinned for install in linuxcord.list_versions(xdg=xdg))
+
+
+def test_rollback_rejects_missing_version(tmp_path: Path) -> None:
+    xdg = MockPyXDG(
+        xdg_data_home=tmp_path / "data",
+        xdg_cache_home=tmp_path / "cache",
+        xdg_state_home=tmp_path / "state",
+    )
+    paths = LinuxcordPaths(xdg)
+    create_installs(paths, "1.0.0")
+    paths.discord_current_version_dir_symlink.symlink_to(
+        paths.discord_paths(DiscordVersion("1.0.0")).dir
+    )
+
+    with pytest.raises(LookupError, match="not installed"):
+        _ = linuxcord.rollback(xdg=xdg, version=DiscordVersion("0.9.0"))
+    with pytest.raises(LookupError, match="No earlier"):
+        _ = linuxcord.rollback(xdg=xdg)
+
+
+def test_update_does_not_go_online_while_pinned(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    xdg = MockPyXDG(
+        xdg_data_home=tmp_path / "data",
+        xdg_cache_home=tmp_path / "cache",
+        xdg_state_home=tmp_path / "state",
+    )
+    paths = LinuxcordPaths(xdg)
+    create_installs(paths, "1.0.0")
+    _ = linuxcord.pin(xdg=xdg, version=DiscordVersion("1.0.0"))
+    online_versioner = mocker.patch("linuxcord.linuxcord.OnlineVersioner")
+    installer = mocker.patch("linuxcord.linuxcord.DiscordInstaller")
+
+    result = linuxcord.update(xdg=xdg)
+
+    online_versioner.assert_not_called()
+    installer.assert_not_called()
+    assert not result.updated
+    assert int(paths.update_check_file.read_text()) > time.time()
+
+
+def test_update_without_installing_rewrites_a_stale_launcher(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    xdg = MockPyXDG(
+        xdg_data_home=tmp_path / "data",
+        xdg_cache_home=tmp_path / "cache",
+        xdg_state_home=tmp_path / "state",
+    )
+    paths = LinuxcordPaths(xdg)
+    create_installs(paths, "1.0.0")
+    paths.discord_current_version_dir_symlink.symlink_to(
+        paths.discord_paths(DiscordVersion("1.0.0")).dir
+    )
+    _ = linuxcord.pin(xdg=xdg, version=DiscordVersion("1.0.0"))
+    _ = mocker.patch("linuxcord.linuxcord.OnlineVersioner")
+    desktop = FreeDesktop(paths)
+
+    _ = linuxcord.update(xdg=xdg)
+    assert desktop.is_current()
+    desktop.launcher_script.unlink()
+    _ = linuxcord.update(xdg=xdg)
+    assert desktop.is_current()
+    _ = linuxcord.update(xdg=xdg, durable=True)
+
+    assert "--durable" in desktop.launcher_script.read_text()
+    assert FreeDesktop(paths, durable=True).is_current()
+
+
+def test_run_skips_update_checks_for_a_while_after_going_offline(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    xdg = MockPyXDG(
+        xdg_data_home=tmp_path / "data",
+        xdg_cache_home=tmp_path / "cache",
+        xdg_state_home=tmp_path / "state",
+    )
+    paths = LinuxcordPaths(xdg)
+    version = DiscordVersion("13.0.0")
+    local_versioner = mocker.Mock(get_current_version=mocker.Mock(return_value=version))
+    _ = mocker.patch("linuxcord.linuxcord.LocalVersioner", return_value=local_versioner)
+    check = mocker.Mock(return_value=None)
+    _ = mocker.patch(
+        "linuxcord.linuxcord.OnlineVersioner",
+        return_value=mocker.Mock(get_latest_version_within=check),
+    )
+    launch = mocker.Mock()
+    _ = mocker.patch(
+        "linuxcord.linuxcord.DiscordLauncher", return_value=mocker.Mock(launch=launch)
+    )
+
+    linuxcord.run(xdg=xdg, check_timeout=2)
+    linuxcord.run(xdg=xdg, check_timeout=2)
+
+    check.assert_called_once_with(2)
+    assert launch.call_count == 2
+    offline = ManifestStore(paths).load().last_offline_check
+    assert offline is not None
+    due = int(paths.update_check_file.read_text())
+    assert due == int(offline + linuxcord.OFFLINE_RETRY_INTERVAL)
+
+    # Once the retry interval has passed, the next launch checks again.
+    ManifestStore(paths).record_offline_check(
+        offline - linuxcord.OFFLINE_RETRY_INTERVAL
+    )
+    check.return_value = version
+    linuxcord.run(xdg=xdg, check_timeout=2)
+    assert check.call_count == 2
+    assert ManifestStore(paths).load().last_offline_check is None
+
+
+def test_hand_over_gives_the_runtime_lock_file_back(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    home = tmp_path / "home"
+    home.mkdir()
+    runtime_dir = tmp_path / "run"
+    runtime_dir.mkdir()
+    xdg = HomeXDG(home)
+    _ = mocker.patch.object(xdg, "get_runtime_dir", return_value=str(runtime_dir))
+    paths = LinuxcordPaths(xdg)
+    paths.ensure_base_dirs()
+    with paths.acquire_lock("exclusive"):
+        pass
+    assert paths.lock_file.parent == runtime_dir
+    _ = mocker.patch("linuxcord.linuxcord.os.geteuid", return_value=0)
+    _ = mocker.patch("linuxcord.linuxcord.chown_tree")
+    lchown = mocker.patch("linuxcord.linuxcord.os.lchown")
+
+    linuxcord._hand_over(home, paths)  # pyright: ignore[reportPrivateUsage]
+
+    stat = home.stat()
+    lchown.assert_any_call(paths.lock_file, stat.st_uid, stat.st_gid)
+
+
+def test_fleet_update_only_hardlinks_between_profiles_of_one_owner(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    homes = [HomeXDG(tmp_path / user) for user in ("ann", "ben", "cat")]
+    for xdg in homes:
+        xdg.home.mkdir()
+    owners = {"ann": 1001, "ben": 1001, "cat": 1002}
+
+    def owner(xdg: HomeXDG) -> int:
+        return owners[xdg.home.name]
+
+    _ = mocker.patch("linuxcord.linuxcord._owner", side_effect=owner)
+    version = DiscordVersion("13.0.0")
+    _ = mocker.patch(
+        "linuxcord.linuxcord.OnlineVersioner",
+        return_value=mocker.Mock(get_version_download_url=mocker.Mock(return_value="")),
+    )
+
+    def update_profile(
+        paths: LinuxcordPaths, *_args: object, **_kwargs: object
+    ) -> None:
+        create_installs(paths, version.string)
+
+    fake = mocker.patch(
+        "linuxcord.linuxcord._update_profile", side_effect=update_profile
+    )
+    _ = mocker.patch("linuxcord.linuxcord._hand_over")
+
+    results = linuxcord.fleet_update(homes, version=version, max_workers=1)
+
+    assert all(result.ok for result in results)
+    hardlinks: dict[str, object] = {}
+    for call in fake.call_args_list:
+        paths = cast(LinuxcordPaths, call.args[0])
+        hardlinks[paths.data_dir.parts[-4]] = call.kwargs["hardlink"]
+    assert hardlinks == {"ann": True, "ben": True, "cat": False}
+
+
+def test_fleet_update_refuses_a_symlinked_profile_dir(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    ann, mallory = HomeXDG(tmp_path / "ann"), HomeXDG(tmp_path / "mallory")
+    ann.home.mkdir()
+    victim = tmp_path / "victim"
+    victim.mkdir()
+    _ = (victim / "passwd").write_text("root")
+    (mallory.home / ".local" / "share").mkdir(parents=True)
+    (mallory.home / ".local" / "share" / "linuxcord").symlink_to(victim)
+    version = DiscordVersion("13.0.0")
+    _ = mocker.patch(
+        "linuxcord.linuxcord.OnlineVersioner",
+        return_value=mocker.Mock(get_version_download_url=mocker.Mock(return_value="")),
+    )
+
+    def update_profile(
+        paths: LinuxcordPaths, *_args: object, **_kwargs: object
+    ) -> None:
+        create_installs(paths, version.string)
+
+    fake = mocker.patch(
+        "linuxcord.linuxcord._update_profile", side_effect=update_profile
+    )
+
+    results = linuxcord.fleet_update([ann, mallory], version=version)
+
+    assert results[0].ok
+    assert isinstance(results[1].error, PermissionError)
+    assert fake.call_count == 1
+    assert [path.name for path in victim.iterdir()] == ["passwd"]
+
+
+def test_uninstall_leaves_a_trashed_versions_root_to_the_next_sweep(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    xdg = MockPyXDG(
+        xdg_data_home=tmp_path / "data",
+        xdg_cache_home=tmp_path / "cache",
+        xdg_state_home=tmp_path / "state",
+    )
+    root = tmp_path / "root"
+    paths = LinuxcordPaths(xdg, versions_root=root)
+    paths.ensure_base_dirs()
+    create_installs(paths, "1.0.0")
+    paths.discord_versions_dir.mkdir(parents=True, exist_ok=True)
+    spawn_deleter = mocker.patch("linuxcord.linuxcord.spawn_deleter")
+
+    linuxcord.uninstall(xdg=xdg, versions_root=root)
+
+    trashed = cast(list[Path], spawn_deleter.call_args.args[0])
+    assert len(trashed) == 4
+    assert all(path.exists() for path in trashed)
+    assert not root.exists()
+    assert sorted(paths.pending_deletions()) == sorted(trashed)
+
+
+def test_update_sweeps_staging_only_while_no_install_runs(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    xdg = MockPyXDG(
+        xdg_data_home=tmp_path / "data",
+        xdg_cache_home=tmp_path / "cache",
+        xdg_state_home=tmp_path / "state",
+    )
+    paths = LinuxcordPaths(xdg)
+    create_installs(paths, "1.0.0")
+    paths.discord_current_version_dir_symlink.symlink_to(
+        paths.discord_paths(DiscordVersion("1.0.0")).dir
+    )
+    _ = linuxcord.pin(xdg=xdg, version=DiscordVersion("1.0.0"))
+    _ = mocker.patch("linuxcord.linuxcord.OnlineVersioner")
+    spawn_deleter = mocker.patch("linuxcord.linuxcord.spawn_deleter")
+    unfinished = paths.staging_dir / "2.0.0.abc"
+    unfinished.mkdir(parents=True)
+
+    # A separate descriptor, as another process's install would hold it.
+    with InstallLock(paths.lock_file).acquire("shared"):
+        _ = linuxcord.update(xdg=xdg)
+    assert unfinished.exists()
+    spawn_deleter.assert_not_called()
+
+    _ = linuxcord.update(xdg=xdg)
+
+    assert not unfinished.exists()
+    (trashed,) = cast(list[Path], spawn_deleter.call_args.args[0])
+    assert trashed.parent == paths.trash_dir
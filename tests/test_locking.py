@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import fcntl
+import os
+from pathlib import Path
+
+import pytest
+
+from linuxcord.locking import InstallLock, LockTimeout
+
+
+def can_lock(path: Path, operation: int) -> bool:
+    fd = os.open(path, os.O_RDWR)
+    try:
+        fcntl.flock(fd, operation | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    finally:
+        os.close(fd)
+    return True
+
+
+def test_shared_locks_do_not_exclude_each_other(tmp_path: Path) -> None:
+    lock_file = tmp_path / "run" / "linuxcord.lock"
+
+    with InstallLock(lock_file).acquire("shared") as lock:
+        assert lock.mode == "shared"
+        assert can_lock(lock_file, fcntl.LOCK_SH)
+        assert not can_lock(lock_file, fcntl.LOCK_EX)
+
+
+def test_upgrade_and_downgrade(tmp_path: Path) -> None:
+    lock_file = tmp_path / "linuxcord.lock"
+
+    with InstallLock(lock_file).acquire("shared") as lock:
+        lock.upgrade()
+        assert lock.mode == "exclusive"
+        assert not can_lock(lock_file, fcntl.LOCK_SH)
+
+        lock.downgrade()
+        assert lock.mode == "shared"
+        assert can_lock(lock_file, fcntl.LOCK_SH)
+
+    assert not lock.is_locked
+    assert can_lock(lock_file, fcntl.LOCK_EX)
+
+
+def test_timeout_releases_lock(tmp_path: Path) -> None:
+    lock_file = tmp_path / "linuxcord.lock"
+
+    with InstallLock(lock_file).acquire("shared"):
+        lock = InstallLock(lock_file, timeout=0.1).acquire("shared")
+        with pytest.raises(LockTimeout):
+            lock.upgrade()
+        assert not lock.is_locked
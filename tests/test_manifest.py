@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from linuxcord.manifest import (
+    FileRecord,
+    InstallRecord,
+    Manifest,
+    ManifestStore,
+    scan_install,
+)
+from linuxcord.paths import LinuxcordPaths
+from linuxcord.types import DiscordVersion
+from tests.helpers import MockPyXDG
+
+
+def create_store(tmp_path: Path) -> tuple[ManifestStore, LinuxcordPaths]:
+    paths = LinuxcordPaths(MockPyXDG(xdg_state_home=tmp_path / "state"))
+    return ManifestStore(paths), paths
+
+
+def test_load_returns_empty_manifest_when_missing(tmp_path: Path) -> None:
+    store, _paths = create_store(tmp_path)
+
+    manifest = store.load()
+
+    assert manifest == Manifest()
+
+
+def test_load_ignores_corrupt_manifest(tmp_path: Path) -> None:
+    store, paths = create_store(tmp_path)
+    paths.manifest_file.parent.mkdir(parents=True)
+    _ = paths.manifest_file.write_text("{not json")
+
+    assert store.load() == Manifest()
+
+
+def test_load_ignores_unknown_format(tmp_path: Path) -> None:
+    store, paths = create_store(tmp_path)
+    paths.manifest_file.parent.mkdir(parents=True)
+    _ = paths.manifest_file.write_text(json.dumps({"format": 999}))
+
+    assert store.load() == Manifest()
+
+
+def test_scan_install_hashes_regular_files(tmp_path: Path) -> None:
+    install_dir = tmp_path / "install"
+    (install_dir / "resources").mkdir(parents=True)
+    _ = (install_dir / "Discord").write_bytes(b"binary")
+    _ = (install_dir / "resources" / "app.asar").write_bytes(b"asar")
+    (install_dir / "link").symlink_to(install_dir / "Discord")
+
+    files = scan_install(install_dir)
+
+    assert sorted(files) == ["Discord", "resources/app.asar"]
+    assert files["Discord"].size == len(b"binary")
+    assert files["Discord"].sha256 == hashlib.sha256(b"binary").hexdigest()
+    assert files["Discord"].mtime_ns == (install_dir / "Discord").stat().st_mtime_ns
+
+
+def test_record_install_round_trips(tmp_path: Path) -> None:
+    store, paths = create_store(tmp_path)
+    install_dir = tmp_path / "install"
+    install_dir.mkdir()
+    _ = (install_dir / "Discord").write_bytes(b"12345")
+    version = DiscordVersion("1.2.3")
+
+    _ = store.record_install(version, install_dir, locales=("de", "en-US"))
+    store.record_current(version)
+    store.record_online_check(1234.5)
+    store.record_pin(version)
+    store.record_keep_locales(("de", "en-US"))
+    store.record_offline_check(1000.0)
+
+    manifest = store.load()
+    record = manifest.install_record(version)
+    assert record is not None
+    assert record.file_count == 1
+    assert record.total_bytes == 5
+    assert record.installed_at > 0
+    assert manifest.current == version
+    assert manifest.last_online_check == 1234.5
+    assert manifest.pinned == version
+    assert record.locales == ("de", "en-US")
+    assert manifest.keep_locales == ("de", "en-US")
+    assert manifest.last_offline_check == 1000.0
+    store.record_online_check(2000.0)
+    assert store.load().last_offline_check is None
+    assert sorted(paths.manifest_file.parent.iterdir()) == sorted(
+        [paths.manifest_file, store.files_path, store.lock_file]
+    )
+    assert "files" not in paths.manifest_file.read_text()
+    assert store.load(files=False).install_record(version) == InstallRecord(
+        version, record.installed_at, {}, ("de", "en-US")
+    )
+
+
+def test_state_changes_leave_the_file_records_alone(tmp_path: Path) -> None:
+    store, _paths = create_store(tmp_path)
+    version = DiscordVersion("1.2.3")
+    record = InstallRecord(version, 1.0, {"Discord": FileRecord(1, 2, "00")})
+    store.add_install(record)
+    before = store.files_path.stat().st_mtime_ns
+
+    store.record_current(version)
+
+    assert store.files_path.stat().st_mtime_ns == before
+    assert store.load().install_record(version) == record
+
+
+def test_format_1_records_are_split_out_on_the_next_change(tmp_path: Path) -> None:
+    store, paths = create_store(tmp_path)
+    paths.manifest_file.parent.mkdir(parents=True)
+    files = {"Discord": [1, 2, "00"]}
+    raw = {
+        "format": 1,
+        "current": None,
+        "installs": {
+            "1.2.3": {
+                "installed_at": 1.0,
+                "file_count": 1,
+                "total_bytes": 1,
+                "files": files,
+            }
+        },
+    }
+    _ = paths.manifest_file.write_text(json.dumps(raw))
+    version = DiscordVersion("1.2.3")
+    record = InstallRecord(version, 1.0, {"Discord": FileRecord(1, 2, "00")})
+    assert store.load().install_record(version) == record
+
+    store.record_current(version)
+
+    assert "files" not in paths.manifest_file.read_text()
+    assert store.load().install_record(version) == record
+
+
+def test_forget_install_clears_current(tmp_path: Path) -> None:
+    store, _paths = create_store(tmp_path)
+    version = DiscordVersion("1.2.3")
+    record = InstallRecord(version, 1.0, {"Discord": FileRecord(1, 2, "00")})
+    store.save(Manifest(current=version, installs={version.string: record}))
+
+    store.forget_install(version)
+
+    manifest = store.load()
+    assert manifest.installs == {}
+    assert manifest.current is None
+
+
+def test_concurrent_records_do_not_lose_each_other(tmp_path: Path) -> None:
+    _store, paths = create_store(tmp_path)
+    versions = [DiscordVersion(f"1.0.{n}") for n in range(16)]
+
+    def add(version: DiscordVersion) -> None:
+        record = InstallRecord(version, 1.0, {"Discord": FileRecord(1, 2, "00")})
+        # A store per thread, like separate processes sharing the manifest.
+        ManifestStore(paths).add_install(record)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        _ = list(pool.map(add, versions))
+
+    assert sorted(ManifestStore(paths).load().installs) == sorted(
+        version.string for version in versions
+    )
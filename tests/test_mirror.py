@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from linuxcord.manifest import ManifestStore
+from linuxcord.mirror import InstallMirror
+from linuxcord.paths import LinuxcordPaths
+from linuxcord.types import DiscordVersion
+from tests.helpers import MockPyXDG
+
+OLD = DiscordVersion("0.0.1")
+NEW = DiscordVersion("0.0.2")
+
+
+def make_paths(tmp_path: Path) -> LinuxcordPaths:
+    paths = LinuxcordPaths(
+        MockPyXDG(
+            xdg_data_home=tmp_path / "data",
+            xdg_state_home=tmp_path / "state",
+            runtime_dir=tmp_path / "run",
+        )
+    )
+    paths.ensure_base_dirs()
+    return paths
+
+
+def make_install(
+    paths: LinuxcordPaths, version: DiscordVersion, files: dict[str, bytes]
+) -> Path:
+    install_dir = paths.discord_paths(version).dir
+    for name, data in files.items():
+        (install_dir / name).parent.mkdir(parents=True, exist_ok=True)
+        _ = (install_dir / name).write_bytes(data)
+    _ = ManifestStore(paths).record_install(version, install_dir)
+    return install_dir
+
+
+def test_mirror_copies_only_what_changed(tmp_path: Path) -> None:
+    paths = make_paths(tmp_path)
+    install_dir = make_install(
+        paths, OLD, {"Discord": b"binary", "resources/app.asar": b"app"}
+    )
+    (install_dir / "libfake.so").symlink_to("Discord")
+    mirror = InstallMirror(paths)
+
+    first = mirror.mirror(OLD)
+    assert first is not None
+    assert first.path == tmp_path / "run" / "linuxcord" / "mirror" / "0.0.1"
+    assert (first.copied, first.unchanged) == (2, 0)
+    assert (first.path / "resources" / "app.asar").read_bytes() == b"app"
+    assert os.readlink(first.path / "libfake.so") == "Discord"
+
+    _ = (install_dir / "resources" / "app.asar").write_bytes(b"patched")
+    (install_dir / "libfake.so").unlink()
+    _ = (first.path / "stray").write_bytes(b"")
+    second = mirror.mirror(OLD)
+    assert second is not None
+    assert (second.copied, second.unchanged, second.removed) == (1, 1, 2)
+    assert (second.path / "resources" / "app.asar").read_bytes() == b"patched"
+    assert sorted(p.name for p in second.path.iterdir()) == ["Discord", "resources"]
+
+
+def test_mirror_links_files_unchanged_since_the_previous_version(
+    tmp_path: Path,
+) -> None:
+    paths = make_paths(tmp_path)
+    _ = make_install(paths, OLD, {"Discord": b"binary", "app.asar": b"old"})
+    mirror = InstallMirror(paths)
+    old = mirror.mirror(OLD)
+    assert old is not None
+    old_inode = (old.path / "Discord").stat().st_ino
+
+    _ = make_install(paths, NEW, {"Discord": b"binary", "app.asar": b"new"})
+    new = mirror.mirror(NEW)
+
+    assert new is not None
+    assert (new.linked, new.copied) == (1, 1)
+    assert (new.path / "Discord").stat().st_ino == old_inode
+    assert (new.path / "app.asar").read_bytes() == b"new"
+    assert not old.path.exists()
+    # The linked file looks unchanged to the next pass.
+    again = mirror.mirror(NEW)
+    assert again is not None
+    assert again.unchanged == 2
+
+
+def test_mirror_needs_a_runtime_dir(tmp_path: Path) -> None:
+    paths = LinuxcordPaths(MockPyXDG(xdg_data_home=tmp_path / "data"))
+    _ = make_install(paths, OLD, {"Discord": b"binary"})
+
+    assert InstallMirror(paths).mirror(OLD) is None
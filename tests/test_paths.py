@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from pathlib import Path
 
+import pytest
+
 from linuxcord.paths import APP_NAME, LinuxcordPaths
 from linuxcord.types import DiscordVersion
 
@@ -94,3 +96,94 @@ def test_ensure_base_dirs_create_directories(tmp_path: Path) -> None:
     assert paths.cache_dir.exists()
     assert paths.state_dir.exists()
     assert paths.discord_versions_dir.exists()
+
+
+def test_pending_deletions_finds_trash_and_renamed_dirs(tmp_path: Path) -> None:
+    xdg = MockPyXDG(
+        xdg_data_home=tmp_path / "data",
+        xdg_cache_home=tmp_path / "cache",
+        xdg_state_home=tmp_path / "state",
+    )
+    paths = LinuxcordPaths(xdg)
+    paths.ensure_base_dirs()
+    paths.trash_dir.mkdir()
+    trashed_install = paths.trash_dir / "1.0.0.abc"
+    trashed_install.mkdir()
+    renamed_cache = tmp_path / "cache" / f".{APP_NAME}.abc.deleting"
+    renamed_cache.mkdir()
+    (tmp_path / "cache" / ".unrelated").mkdir()
+
+    assert sorted(paths.pending_deletions()) == sorted([trashed_install, renamed_cache])
+
+
+def test_pending_deletions_skips_what_cannot_be_deleted(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    paths = LinuxcordPaths(MockPyXDG(xdg_data_home=tmp_path / "data"))
+    paths.trash_dir.mkdir(parents=True)
+    own = paths.trash_dir / "1.0.0.abc"
+    own.mkdir()
+    foreign = paths.trash_dir / "1.0.1.def"
+    foreign.mkdir()
+
+    def access(path: Path, _mode: int) -> bool:
+        return path != foreign
+
+    monkeypatch.setattr("linuxcord.paths.os.access", access)
+
+    assert paths.pending_deletions() == [own]
+
+
+def test_shared_store_holds_installs_and_lock(tmp_path: Path) -> None:
+    xdg = MockPyXDG(
+        xdg_data_home=tmp_path / "data",
+        xdg_cache_home=tmp_path / "cache",
+        xdg_state_home=tmp_path / "state",
+        runtime_dir=tmp_path / "runtime",
+    )
+    store = tmp_path / "store"
+    store.mkdir()
+    store.chmod(0o2775)
+    paths = LinuxcordPaths(xdg, store)
+
+    paths.ensure_base_dirs()
+
+    version_dir = paths.discord_paths(DiscordVersion("1.2.3")).dir
+    assert version_dir == store / "versions" / "1.2.3"
+    assert paths.cached_tarball(DiscordVersion("1.2.3")).parent == store / "tarballs"
+    assert paths.lock_file == store / "lock"
+    # Per-user state stays in the user's own directories.
+    current = paths.discord_current_version_dir_symlink
+    assert current == tmp_path / "data" / APP_NAME / "versions" / "current"
+    assert paths.manifest_file.parent == tmp_path / "state" / APP_NAME
+    for directory in (paths.install_dir, paths.staging_dir, paths.tarball_cache_dir):
+        assert directory.stat().st_mode & 0o7777 == 0o2775
+    with paths.acquire_lock("shared"):
+        assert paths.lock_file.stat().st_mode & 0o777 == 0o644
+
+
+def test_versions_root_holds_installs_but_not_the_lock(tmp_path: Path) -> None:
+    xdg = MockPyXDG(
+        xdg_data_home=tmp_path / "data",
+        xdg_cache_home=tmp_path / "cache",
+        xdg_state_home=tmp_path / "state",
+        runtime_dir=tmp_path / "runtime",
+    )
+    root = tmp_path / "local" / "linuxcord-1000"
+    paths = LinuxcordPaths(xdg, versions_root=root)
+
+    paths.ensure_base_dirs()
+
+    assert root.stat().st_mode & 0o777 == 0o700
+    assert paths.discord_paths(DiscordVersion("1.2.3")).dir == (
+        root / "versions" / "1.2.3"
+    )
+    assert paths.cached_tarball(DiscordVersion("1.2.3")).parent == root / "tarballs"
+    assert paths.staging_dir.parent == root / "versions"
+    assert paths.lock_file == tmp_path / "runtime" / f"{APP_NAME}.lock"
+
+    root.chmod(0o777)
+    with pytest.raises(PermissionError, match="only writable by this user"):
+        paths.ensure_base_dirs()
+    with pytest.raises(ValueError):
+        _ = LinuxcordPaths(xdg, tmp_path / "store", root)
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from pytest_mock import MockerFixture
+
+from linuxcord.prewarm import (
+    DEFAULT_PREWARM_PATTERNS,
+    hot_files,
+    prewarm_in_background,
+    prewarm_install,
+)
+
+
+def make_install(install_dir: Path) -> None:
+    (install_dir / "locales").mkdir(parents=True)
+    (install_dir / "resources").mkdir()
+    for name, size in {
+        "Discord": 300,
+        "libffmpeg.so": 200,
+        "resources.pak": 100,
+        "locales/en-US.pak": 10,
+        "locales/de.pak": 10,
+        "resources/app.asar": 50,
+        "LICENSE": 5,
+    }.items():
+        _ = (install_dir / name).write_bytes(b"x" * size)
+    (install_dir / "libfake.so").symlink_to("libffmpeg.so")
+
+
+def test_hot_files_follow_pattern_order(tmp_path: Path) -> None:
+    make_install(tmp_path)
+
+    files = hot_files(tmp_path, DEFAULT_PREWARM_PATTERNS)
+
+    assert [path.relative_to(tmp_path).as_posix() for path in files] == [
+        "Discord",
+        "libffmpeg.so",
+        "resources.pak",
+        "locales/en-US.pak",
+        "resources/app.asar",
+    ]
+
+
+def test_prewarm_install_advises_each_hot_file(
+    tmp_path: Path, mocker: MockerFixture
+) -> None:
+    make_install(tmp_path)
+    fadvise = mocker.spy(os, "posix_fadvise")
+
+    result = prewarm_install(tmp_path, ["Discord", "*.pak", "missing.bin"])
+
+    assert result.files == 2
+    assert result.bytes == 400
+    assert fadvise.call_count == 2
+    advice = {call.args[3] for call in fadvise.call_args_list}
+    assert advice == {os.POSIX_FADV_WILLNEED}
+
+
+def test_prewarm_in_background_runs_in_a_thread(tmp_path: Path) -> None:
+    make_install(tmp_path)
+
+    thread = prewarm_in_background(tmp_path)
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
+    assert not thread.daemon
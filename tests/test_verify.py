@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+
+import pytest
+import requests
+from pytest_mock import MockerFixture
+
+from linuxcord import manifest
+from linuxcord.installer import DiscordInstaller
+from linuxcord.manifest import ManifestStore, hash_files
+from linuxcord.paths import LinuxcordPaths
+from linuxcord.types import DiscordVersion
+from linuxcord.verify import InstallVerifier
+from tests.helpers import MockPyXDG
+from tests.test_installer import write_tarball
+
+VERSION = DiscordVersion("1.2.3")
+
+
+def create_install(tmp_path: Path) -> tuple[LinuxcordPaths, Path]:
+    paths = LinuxcordPaths(
+        MockPyXDG(xdg_data_home=tmp_path / "data", xdg_state_home=tmp_path / "state")
+    )
+    install_dir = paths.discord_paths(VERSION).dir
+    (install_dir / "resources").mkdir(parents=True)
+    _ = (install_dir / "Discord").write_bytes(b"discord binary")
+    _ = (install_dir / "resources" / "app.asar").write_bytes(b"asar archive")
+    _ = ManifestStore(paths).record_install(VERSION, install_dir)
+    return paths, install_dir
+
+
+def bump_mtime(path: Path) -> None:
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_verify_trusts_unchanged_files_without_hashing(tmp_path: Path) -> None:
+    paths, _install_dir = create_install(tmp_path)
+
+    result = InstallVerifier(paths).verify(VERSION)
+
+    assert result.ok
+    assert result.checked == 2
+    assert result.rehashed == 0
+
+
+def test_verify_rehashes_files_with_new_mtime_and_remembers_them(
+    tmp_path: Path,
+) -> None:
+    paths, install_dir = create_install(tmp_path)
+    bump_mtime(install_dir / "Discord")
+    verifier = InstallVerifier(paths)
+
+    first = verifier.verify(VERSION)
+    second = verifier.verify(VERSION)
+
+    assert first.ok
+    assert first.rehashed == 1
+    assert second.rehashed == 0
+
+
+def test_verify_reports_corrupted_and_missing_files(tmp_path: Path) -> None:
+    paths, install_dir = create_install(tmp_path)
+    _ = (install_dir / "Discord").write_bytes(b"discord BINARY")
+    bump_mtime(install_dir / "Discord")
+    (install_dir / "resources" / "app.asar").unlink()
+
+    result = InstallVerifier(paths).verify(VERSION)
+
+    assert not result.ok
+    assert result.corrupted == ["Discord"]
+    assert result.missing == ["resources/app.asar"]
+    assert result.damaged == ["Discord", "resources/app.asar"]
+
+
+def test_verify_flags_size_change_without_rehashing(tmp_path: Path) -> None:
+    paths, install_dir = create_install(tmp_path)
+    _ = (install_dir / "Discord").write_bytes(b"")
+
+    result = InstallVerifier(paths).verify(VERSION)
+
+    assert result.corrupted == ["Discord"]
+    assert result.rehashed == 0
+
+
+def test_verify_full_rehashes_everything(tmp_path: Path) -> None:
+    paths, _install_dir = create_install(tmp_path)
+
+    result = InstallVerifier(paths).verify(VERSION, full=True)
+
+    assert result.ok
+    assert result.rehashed == 2
+
+
+def test_verify_requires_recorded_install(tmp_path: Path) -> None:
+    paths = LinuxcordPaths(MockPyXDG(xdg_state_home=tmp_path / "state"))
+
+    with pytest.raises(LookupError, match="No recorded hashes"):
+        _ = InstallVerifier(paths).verify(VERSION)
+
+
+def test_hash_files_uses_thread_pool_for_large_batches(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(manifest, "POOL_THRESHOLD_BYTES", 0)
+    files: list[Path] = []
+    for index, size in enumerate((10, 3000, 200)):
+        path = tmp_path / f"file{index}"
+        _ = path.write_bytes(bytes([index]) * size)
+        files.append(path)
+
+    digests = hash_files(files, max_workers=2)
+
+    assert digests == [hashlib.sha256(path.read_bytes()).hexdigest() for path in files]
+
+
+def test_repair_restores_damaged_files_from_cached_tarball(
+    tmp_path: Path, mocker: MockerFixture
+) -> None:
+    paths = LinuxcordPaths(
+        MockPyXDG(
+            xdg_data_home=tmp_path / "data",
+            xdg_cache_home=tmp_path / "cache",
+            xdg_state_home=tmp_path / "state",
+        )
+    )
+
+    def download_tarball(_url: str, dest: Path) -> None:
+        write_tarball(dest, VERSION.string)
+
+    with requests.Session() as session:
+        installer = DiscordInstaller(paths, session)
+        _ = mocker.patch.object(
+            installer, "_download_tarball", side_effect=download_tarball
+        )
+        discord_paths = installer.install(VERSION, "https://example.com/discord")
+    _ = discord_paths.executable.write_text("truncated")
+    discord_paths.build_info.unlink()
+    verifier = InstallVerifier(paths)
+
+    result = verifier.repair(verifier.verify(VERSION))
+
+    assert result.ok
+    assert discord_paths.executable.read_text() == "#!/bin/sh\necho discord"
+    assert discord_paths.build_info.exists()
+    assert verifier.verify(VERSION).rehashed == 0
+
+
+def test_repair_requires_cached_tarball(tmp_path: Path) -> None:
+    paths, install_dir = create_install(tmp_path)
+    (install_dir / "Discord").unlink()
+    verifier = InstallVerifier(paths)
+
+    with pytest.raises(LookupError, match="No indexed tarball"):
+        _ = verifier.repair(verifier.verify(VERSION))
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from pathlib import Path
 
+from linuxcord.manifest import ManifestStore
 from linuxcord.paths import LinuxcordPaths
 from linuxcord.types import DiscordVersion
 from linuxcord.versions import LocalVersioner
@@ -68,3 +69,49 @@ def test_get_current_version_handles_broken_symlink(tmp_path: Path) -> None:
     versioner = LocalVersioner(paths)
 
     assert versioner.get_current_version() is None
+
+
+def test_get_current_version_prefers_manifest_record(tmp_path: Path) -> None:
+    xdg = MockPyXDG(xdg_data_home=tmp_path, xdg_state_home=tmp_path / "state")
+    paths = LinuxcordPaths(xdg)
+    paths.ensure_base_dirs()
+    version = DiscordVersion("4.0.0")
+    version_dir = paths.discord_paths(version).dir
+    version_dir.mkdir(parents=True)
+    paths.discord_current_version_dir_symlink.symlink_to(version_dir)
+    ManifestStore(paths).record_current(version)
+
+    versioner = LocalVersioner(paths)
+
+    # No build_info.json exists, so this can only come from the manifest.
+    assert versioner.get_current_version() == version
+
+
+def test_get_current_version_ignores_stale_manifest_record(tmp_path: Path) -> None:
+    xdg = MockPyXDG(xdg_data_home=tmp_path, xdg_state_home=tmp_path / "state")
+    paths = LinuxcordPaths(xdg)
+    paths.ensure_base_dirs()
+    version_dir = paths.discord_paths(DiscordVersion("5.0.0")).dir
+    write_build_info(version_dir, "5.0.0")
+    paths.discord_current_version_dir_symlink.symlink_to(version_dir)
+    ManifestStore(paths).record_current(DiscordVersion("4.0.0"))
+
+    versioner = LocalVersioner(paths)
+
+    assert versioner.get_current_version() == DiscordVersion("5.0.0")
+
+
+def test_installed_versions_lists_version_directories(tmp_path: Path) -> None:
+    paths = LinuxcordPaths(MockPyXDG(xdg_data_home=tmp_path))
+    for name in ("1.0.10", "1.0.9", ".staging", "not-a-version"):
+        (paths.discord_versions_dir / name).mkdir(parents=True)
+    paths.discord_current_version_dir_symlink.symlink_to(
+        paths.discord_versions_dir / "1.0.10"
+    )
+
+    versioner = LocalVersioner(paths)
+
+    assert versioner.installed_versions() == [
+        DiscordVersion("1.0.9"),
+        DiscordVersion("1.0.10"),
+    ]
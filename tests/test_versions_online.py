@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import socket
+import time
 from typing import cast
 
 import requests
@@ -8,7 +10,7 @@ from unittest.mock import MagicMock
 from pytest_mock import MockerFixture
 
 from linuxcord.types import DiscordVersion
-from linuxcord.versions import OnlineVersioner
+from linuxcord.versions import OnlineVersioner, has_route
 
 
 def test_get_latest_version_from_updates_api(mocker: MockerFixture) -> None:
@@ -86,3 +88,46 @@ def test_get_latest_download_url_returns_final_url(mocker: MockerFixture) -> Non
     )
     head_raise_for_status.assert_called_once_with()
     head_close.assert_called_once_with()
+
+
+def test_get_latest_version_within_gives_up_after_budget(
+    mocker: MockerFixture,
+) -> None:
+    _ = mocker.patch("linuxcord.versions.has_route", return_value=True)
+    session: MagicMock = mocker.MagicMock(spec=requests.Session)
+    get = cast(MagicMock, session.get)
+
+    def stall(*_args: object, **_kwargs: object) -> None:
+        time.sleep(2)
+
+    get.side_effect = stall
+    versioner = OnlineVersioner("tgz-url", "updates-url", session)
+
+    started = time.monotonic()
+    assert versioner.get_latest_version_within(0.2) is None
+    assert time.monotonic() - started < 1
+    timeout = cast(float, get.call_args.kwargs["timeout"])
+    assert 0 < timeout <= 0.2
+
+
+def test_get_latest_version_within_skips_requests_without_route(
+    mocker: MockerFixture,
+) -> None:
+    _ = mocker.patch("linuxcord.versions.has_route", return_value=False)
+    session: MagicMock = mocker.MagicMock(spec=requests.Session)
+
+    versioner = OnlineVersioner("tgz-url", "updates-url", session)
+
+    assert versioner.get_latest_version_within(5) is None
+    cast(MagicMock, session.get).assert_not_called()
+    cast(MagicMock, session.head).assert_not_called()
+
+
+def test_has_route(mocker: MockerFixture) -> None:
+    assert has_route("http://127.0.0.1:8080/update")
+
+    _ = mocker.patch(
+        "linuxcord.versions.socket.getaddrinfo",
+        side_effect=socket.gaierror("Temporary failure in name resolution"),
+    )
+    assert not has_route("https://discord.com/api/updates")